@@ -1,45 +1,176 @@
-
 import os
+import time
 from flask import Flask
-from flask_cors import CORS
-from extensions import db 
-from routes.usuario_routes import usuario_bp
-from routes.dispositivo_routes import dispositivo_bp
-from flask_migrate import Migrate 
+from extensions import db, aplicar_perfil_sqlite
+
+def preparar_esquema(app):
+    """Crea las tablas que falten. En producción se llama una sola vez desde el master de gunicorn"""
+    inicio = time.perf_counter()
+    with app.app_context():
+        # Registramos todos los modelos antes de create_all
+        from models import Usuario, Dispositivo, Consumo, SugerencIA, ConsumoDiario, ConsumoMensual
+        db.create_all()
+    print(f"✅ Esquema verificado en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+def create_app(config=None):
+    inicio = time.perf_counter()
+    # Rutas y servicios se importan aquí: importar `app` (p. ej. desde la
+    # telemetría o los scripts) no carga toda la API
+    from flask_cors import CORS
+    from routes.usuario_routes import usuario_bp
+    from routes.dispositivo_routes import dispositivo_bp
+    from routes.consumo_routes import consumo_bp
+    from routes.metricas_routes import metricas_bp
+    from routes.eventos_routes import eventos_bp
+    from services.resumenes import registrar_eventos, escuchar_deltas
+    from comandos import registrar_comandos
+    from respuestas import configurar_json, registrar_compresion
+    from routes.auth_middleware import cache_identidad
+    from services.dashboard import cache_dashboard
+    from services.cache_pronostico import cache_pronostico
+    from services.eventos import relay_eventos, configurar_relay_eventos
+    from services.cache_estimaciones import configurar_cache_estimaciones
+    from services.trabajos import configurar_cola_sugerencias
+    from services.purga_usuarios import configurar_purga_usuarios
+    from services.groq_cliente import configurar_concurrencia
+    from services.metricas import registrar_metricas, metricas
+    from services.hashing import configurar_pool_hash
 
-def create_app():
     app = Flask(__name__)
 
-    # Ruta absoluta al archivo de base de datos SQLite
+    # Ruta absoluta al archivo de base de datos SQLite (si no se indica DATABASE_URL)
     basedir = os.path.abspath(os.path.dirname(__file__))
     db_path = os.path.join(basedir, '..', 'database', 'powerflow.db')
-    db_uri = 'sqlite:///' + db_path
+    db_uri = os.getenv('DATABASE_URL', 'sqlite:///' + db_path)
 
     # Configuración básica de Flask + SQLAlchemy
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SECRET_KEY'] = 'clave-super-secreta-powerflow'  # luego la pasamos a .env
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'clave-super-secreta-powerflow')
+    # Clave con la que se firman y verifican los JWT (única para login y token_required)
+    app.config['JWT_SECRET'] = os.getenv('JWT_SECRET', 'powerflow_secret_key_2025')
+
+    # Arranque: crear tablas en cada create_app (desarrollo) y registrar `flask db`
+    app.config['ESQUEMA_AL_INICIAR'] = os.getenv('ESQUEMA_AL_INICIAR', '1') == '1'
+    app.config['REGISTRAR_MIGRACIONES'] = os.getenv('REGISTRAR_MIGRACIONES', '1') == '1'
+
+    # Cache de identidad de token_required (tamaño y TTL en segundos)
+    app.config['IDENTIDAD_CACHE_MAX'] = int(os.getenv('IDENTIDAD_CACHE_MAX', 10000))
+    app.config['IDENTIDAD_CACHE_TTL'] = int(os.getenv('IDENTIDAD_CACHE_TTL', 60))
+
+    # Cache de agregados del dashboard por usuario (tamaño y TTL en segundos)
+    app.config['DASHBOARD_CACHE_MAX'] = int(os.getenv('DASHBOARD_CACHE_MAX', 5000))
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.getenv('DASHBOARD_CACHE_TTL', 300))
+
+    # Series de consumo en memoria para el pronóstico (tamaño y TTL en segundos)
+    app.config['PRONOSTICO_CACHE_MAX'] = int(os.getenv('PRONOSTICO_CACHE_MAX', 5000))
+    app.config['PRONOSTICO_CACHE_TTL'] = int(os.getenv('PRONOSTICO_CACHE_TTL', 3600))
+
+    # Cache persistente de estimaciones del LLM (vacío = solo en memoria)
+    app.config['ESTIMACIONES_CACHE_RUTA'] = os.getenv(
+        'ESTIMACIONES_CACHE_RUTA', os.path.join(basedir, '..', 'database', 'estimaciones_cache.db')
+    )
+    app.config['ESTIMACIONES_CACHE_TTL'] = int(os.getenv('ESTIMACIONES_CACHE_TTL', 7 * 24 * 3600))
+    app.config['ESTIMACIONES_CACHE_MAX'] = int(os.getenv('ESTIMACIONES_CACHE_MAX', 50000))
+    app.config['ESTIMACIONES_ESPERA_COMPARTIDA'] = float(os.getenv('ESTIMACIONES_ESPERA_COMPARTIDA', 15))
+
+    # Trabajos de sugerencia en segundo plano y límite de llamadas simultáneas al LLM
+    app.config['SUGERENCIAS_HILOS'] = int(os.getenv('SUGERENCIAS_HILOS', 4))
+    app.config['SUGERENCIAS_MAX_PENDIENTES'] = int(os.getenv('SUGERENCIAS_MAX_PENDIENTES', 200))
+    app.config['GROQ_CONCURRENCIA'] = int(os.getenv('GROQ_CONCURRENCIA', 4))
+
+    # Eliminación de cuentas: lecturas a partir de las cuales se purga en segundo plano,
+    # filas de consumo por transacción y pausa entre bloques
+    app.config['PURGA_UMBRAL_LECTURAS'] = int(os.getenv('PURGA_UMBRAL_LECTURAS', 20000))
+    app.config['PURGA_TAMANO_BLOQUE'] = int(os.getenv('PURGA_TAMANO_BLOQUE', 5000))
+    app.config['PURGA_PAUSA_MS'] = int(os.getenv('PURGA_PAUSA_MS', 20))
+
+    # Hash de contraseñas: procesos del pool (0 = en línea), cola máxima y método/factor de trabajo
+    app.config['HASH_PROCESOS'] = int(os.getenv('HASH_PROCESOS', 2))
+    app.config['HASH_MAX_PENDIENTES'] = int(os.getenv('HASH_MAX_PENDIENTES', 64))
+    app.config['HASH_METODO'] = os.getenv('HASH_METODO', 'scrypt:32768:8:1')
+
+    # Instrumentación: aviso de N+1 (0 = desactivado) y perfilador de peticiones lentas (0 = desactivado)
+    app.config['METRICAS_UMBRAL_N_MAS_1'] = int(os.getenv('METRICAS_UMBRAL_N_MAS_1', 0))
+    app.config['PERFILADOR_LENTO_MS'] = int(os.getenv('PERFILADOR_LENTO_MS', 0))
+    app.config['PERFILADOR_INTERVALO_MS'] = int(os.getenv('PERFILADOR_INTERVALO_MS', 5))
+
+    # Eventos en vivo (SSE): los flujos los sirve eventos/servidor.py, no gunicorn. Aquí: a dónde
+    # se publican (host:puerto del relay, vacío = no publicar), la URL que usa el navegador
+    # y la vida en segundos de los tickets
+    app.config['EVENTOS_RELAY'] = os.getenv('EVENTOS_RELAY', '127.0.0.1:5002')
+    app.config['EVENTOS_URL'] = os.getenv('EVENTOS_URL', '/api/eventos')
+    app.config['EVENTOS_TICKET_TTL'] = int(os.getenv('EVENTOS_TICKET_TTL', 30))
+
+    # Compresión de respuestas: tamaño mínimo en bytes (0 = desactivada) y niveles
+    app.config['COMPRESION_MINIMA'] = int(os.getenv('COMPRESION_MINIMA', 1024))
+    app.config['COMPRESION_NIVEL_GZIP'] = int(os.getenv('COMPRESION_NIVEL_GZIP', 6))
+    app.config['COMPRESION_NIVEL_BR'] = int(os.getenv('COMPRESION_NIVEL_BR', 4))
+
+    # Configuración explícita (pruebas, benchmarks) sobre los valores por defecto
+    if config:
+        app.config.update(config)
+
+    cache_identidad.max_entradas = app.config['IDENTIDAD_CACHE_MAX']
+    cache_identidad.ttl_segundos = app.config['IDENTIDAD_CACHE_TTL']
+    cache_dashboard.max_entradas = app.config['DASHBOARD_CACHE_MAX']
+    cache_dashboard.ttl_segundos = app.config['DASHBOARD_CACHE_TTL']
+    cache_pronostico.max_entradas = app.config['PRONOSTICO_CACHE_MAX']
+    cache_pronostico.ttl_segundos = app.config['PRONOSTICO_CACHE_TTL']
+    configurar_relay_eventos(app.config['EVENTOS_RELAY'], app.config['JWT_SECRET'])
+    configurar_cache_estimaciones(app.config)
+    configurar_cola_sugerencias(app.config['SUGERENCIAS_HILOS'], app.config['SUGERENCIAS_MAX_PENDIENTES'])
+    configurar_concurrencia(app.config['GROQ_CONCURRENCIA'])
+    configurar_purga_usuarios(
+        app.config['PURGA_UMBRAL_LECTURAS'], app.config['PURGA_TAMANO_BLOQUE'], app.config['PURGA_PAUSA_MS']
+    )
+    configurar_pool_hash(app.config['HASH_PROCESOS'], app.config['HASH_MAX_PENDIENTES'], app.config['HASH_METODO'])
 
     # Inicializamos extensiones
     db.init_app(app)
     CORS(app)
-    migrate=Migrate(app, db)
+    configurar_json(app)
+    registrar_compresion(app)
+    if app.config['REGISTRAR_MIGRACIONES']:
+        # Alembic solo hace falta para `flask db`; los workers de producción no lo cargan
+        from flask_migrate import Migrate
+        # render_as_batch: SQLite necesita recrear tablas para alterar columnas/constraints
+        migrate=Migrate(app, db, render_as_batch=True)
 
     # Registrar Blueprint
     app.register_blueprint(usuario_bp)
     app.register_blueprint(dispositivo_bp)
+    app.register_blueprint(consumo_bp)
+    app.register_blueprint(metricas_bp)
+    app.register_blueprint(eventos_bp)
+
+    # Resúmenes de consumo incrementales y comandos de mantenimiento
+    registrar_eventos(db.session)
+    escuchar_deltas(cache_pronostico.aplicar_deltas)
+    escuchar_deltas(relay_eventos.publicar_deltas)
+    registrar_comandos(app)
 
 
-    # Registramos modelos y creamos tablas
     with app.app_context():
-        from models import Usuario, Dispositivo, Consumo, SugerencIA
-        db.create_all()
+        aplicar_perfil_sqlite(db.engine, app.config.get('SQLITE_PERFIL'))
+        registrar_metricas(app, db.engine)
+
+    # Registramos modelos y creamos tablas
+    if app.config['ESQUEMA_AL_INICIAR']:
+        preparar_esquema(app)
 
     # Ruta simple de prueba
     @app.route("/")
     def home():
         return "PowerFlow API funcionando correctamente ⚡"
 
+    app.config['ARRANQUE_MS'] = round((time.perf_counter() - inicio) * 1000, 1)
+    metricas.registrar_gauge(
+        "powerflow_arranque_ms", "Milisegundos de create_app en este proceso",
+        lambda: app.config['ARRANQUE_MS'],
+    )
+    print(f"⚡ App creada en {app.config['ARRANQUE_MS']} ms (pid {os.getpid()})")
     return app
 
 
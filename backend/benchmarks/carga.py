@@ -0,0 +1,375 @@
+"""
+Benchmark de carga reproducible para la API.
+
+Siembra una base de datos temporal a través de create_app, levanta la API y
+un LLM simulado en hilos locales, y recorre los endpoints de cada blueprint
+con la concurrencia indicada. El resultado (latencias p50/p95/p99,
+throughput y consultas SQL por endpoint) se escribe en JSON para comparar
+entre versiones.
+
+Uso (desde backend/):
+    python -m benchmarks.carga --usuarios 100 --dispositivos 2000 --consumos 100000 \\
+        --peticiones 500 --concurrencia 16 --salida resultados.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+PASSWORD_BENCH = "benchmark123"
+NOMBRES_CATALOGO = ["Lavadora LG", "Televisor Samsung 55", "Refrigerador Mabe", "Laptop Dell", "Bombilla LED"]
+CATEGORIAS = ["Iluminación", "Climatización", "Electrodomésticos", "Electrónica", "Otros"]
+TAMANO_SIEMBRA = 50000
+NOMBRES_REPETIDOS = 10
+
+
+# ---------------------------------------------------------------- LLM simulado
+
+class _ManejadorLLM(BaseHTTPRequestHandler):
+    latencia = 0.05
+
+    def do_POST(self):
+        cuerpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        prompt = cuerpo['messages'][0]['content']
+        time.sleep(self.latencia)
+
+        elementos = prompt.count('\n- "')
+        sugerencia = {"potencia_watts": 50, "categoria": "Otros"}
+        contenido = json.dumps([sugerencia] * elementos if elementos else sugerencia)
+
+        salida = json.dumps({"choices": [{"message": {"content": contenido}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(salida)))
+        self.end_headers()
+        self.wfile.write(salida)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_llm_simulado(latencia_ms):
+    _ManejadorLLM.latencia = latencia_ms / 1000
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ManejadorLLM)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}/v1/chat/completions"
+
+
+# ---------------------------------------------------------------- Siembra
+
+def sembrar(app, usuarios, dispositivos, consumos, dias_historial, semilla):
+    """Inserta datos sintéticos en bloque con executemany sobre la conexión cruda"""
+    from werkzeug.security import generate_password_hash
+    from extensions import db
+    from services.resumenes import reconstruir_resumenes
+
+    rnd = random.Random(semilla)
+    # Un solo hash para todos: sembrar no debe costar minutos de CPU
+    password_hash = generate_password_hash(PASSWORD_BENCH)
+    hoy = date.today()
+    inicio = time.perf_counter()
+
+    with app.app_context():
+        conexion = db.engine.raw_connection()
+        try:
+            cursor = conexion.cursor()
+
+            cursor.executemany(
+                "INSERT INTO usuarios (id, nombre, correo, password, fecha_creacion) VALUES (?, ?, ?, ?, ?)",
+                ((i, f"Usuario {i}", f"bench{i}@powerflow.test", password_hash, datetime.utcnow())
+                 for i in range(1, usuarios + 1)),
+            )
+
+            cursor.executemany(
+                "INSERT INTO dispositivos (id, usuario_id, nombre, potencia_watts, categoria, horas_uso_dia) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((i, (i - 1) % usuarios + 1, f"Dispositivo {i}", rnd.choice([10, 60, 100, 180, 500, 1500]),
+                  rnd.choice(CATEGORIAS), rnd.choice([1, 2, 4, 6, 8, 24]))
+                 for i in range(1, dispositivos + 1)),
+            )
+            conexion.commit()
+
+            restantes = consumos
+            while restantes > 0:
+                lote = min(TAMANO_SIEMBRA, restantes)
+                filas = []
+                for _ in range(lote):
+                    horas = rnd.uniform(0.5, 12)
+                    kwh = horas * rnd.choice([0.01, 0.1, 0.5, 1.5])
+                    filas.append((rnd.randint(1, dispositivos), hoy - timedelta(days=rnd.randrange(dias_historial)),
+                                  horas, kwh, kwh * 3.7))
+                cursor.executemany(
+                    "INSERT INTO consumos (dispositivo_id, fecha, horas_uso, consumo_kwh, costo_lps) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    filas,
+                )
+                conexion.commit()
+                restantes -= lote
+        finally:
+            conexion.close()
+
+        reconstruir_resumenes()
+
+    return time.perf_counter() - inicio
+
+
+# ---------------------------------------------------------------- Servidor
+
+def iniciar_api(app):
+    from werkzeug.serving import make_server
+
+    # El log por petición de werkzeug distorsiona las mediciones
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+class ContadorSQL:
+    """Cuenta sentencias SQL ejecutadas por el motor (total del proceso)"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.total = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        with self._lock:
+            self.total += 1
+
+
+# ---------------------------------------------------------------- Ejecución
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def ejecutar_escenario(nombre, peticiones, concurrencia, hacer_peticion, contador):
+    import requests
+
+    local = threading.local()
+
+    def sesion():
+        if not hasattr(local, 'sesion'):
+            local.sesion = requests.Session()
+        return local.sesion
+
+    def una(i):
+        inicio = time.perf_counter()
+        try:
+            respuesta = hacer_peticion(sesion(), i)
+            ok = respuesta.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - inicio, ok
+
+    consultas_antes = contador.total
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        resultados = list(ejecutor.map(una, range(peticiones)))
+    duracion = time.perf_counter() - inicio
+    consultas = contador.total - consultas_antes
+
+    latencias = sorted(r[0] * 1000 for r in resultados)
+    errores = sum(1 for r in resultados if not r[1])
+    print(f"  {nombre:<28} {peticiones / duracion:8.1f} req/s  p95 {_percentil(latencias, 95):8.2f} ms  errores {errores}",
+          file=sys.stderr)
+    return {
+        "peticiones": peticiones,
+        "errores": errores,
+        "concurrencia": concurrencia,
+        "duracion_s": round(duracion, 4),
+        "throughput_rps": round(peticiones / duracion, 2),
+        "p50_ms": round(_percentil(latencias, 50), 3),
+        "p95_ms": round(_percentil(latencias, 95), 3),
+        "p99_ms": round(_percentil(latencias, 99), 3),
+        "max_ms": round(latencias[-1], 3),
+        "consultas_sql": consultas,
+        "consultas_sql_por_peticion": round(consultas / peticiones, 2),
+    }
+
+
+def escenarios(base, tokens, usuarios):
+    """Lista de (nombre, función(sesion, i)) que recorre todos los blueprints"""
+    def cabeceras(i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    creados = []
+    creados_lock = threading.Lock()
+
+    def crear(s, i):
+        r = s.post(f"{base}/api/dispositivos", headers=cabeceras(i), json={
+            "nombre": f"Bench {i}", "categoria": "Electrónica", "potencia_watts": 100, "horas_uso_dia": 4,
+        })
+        if r.status_code == 201:
+            with creados_lock:
+                creados.append((i % len(tokens), r.json()["dispositivo"]["id"]))
+        return r
+
+    def con_creado(i):
+        indice_token, dispositivo_id = creados[i % len(creados)]
+        return {"Authorization": f"Bearer {tokens[indice_token]}"}, dispositivo_id
+
+    def editar(s, i):
+        h, dispositivo_id = con_creado(i)
+        return s.put(f"{base}/api/dispositivos/{dispositivo_id}", headers=h, json={"horas_uso_dia": 5})
+
+    def eliminar(s, i):
+        if i >= len(creados):
+            return s.get(f"{base}/")
+        h, dispositivo_id = creados[i][0], creados[i][1]
+        return s.delete(f"{base}/api/dispositivos/{dispositivo_id}",
+                        headers={"Authorization": f"Bearer {tokens[h]}"})
+
+    def ingesta(s, i):
+        h, dispositivo_id = con_creado(i)
+        cuerpo = "\n".join(
+            json.dumps({"dispositivo_id": dispositivo_id, "fecha": date.today().isoformat(), "horas_uso": 1})
+            for _ in range(100)
+        )
+        return s.post(f"{base}/api/consumos/ingesta", data=cuerpo,
+                      headers={**h, "Content-Type": "application/x-ndjson"})
+
+    return [
+        ("login", lambda s, i: s.post(f"{base}/api/login", json={
+            "correo": f"bench{i % usuarios + 1}@powerflow.test", "password": PASSWORD_BENCH})),
+        ("usuarios_listar", lambda s, i: s.get(f"{base}/api/usuarios?limite=100")),
+        ("usuarios_obtener", lambda s, i: s.get(f"{base}/api/usuarios/{i % usuarios + 1}")),
+        ("dispositivos_crear", crear),
+        ("dispositivos_listar", lambda s, i: s.get(f"{base}/api/dispositivos", headers=cabeceras(i))),
+        ("dispositivos_editar", editar),
+        ("dispositivos_costos", lambda s, i: s.get(f"{base}/api/dispositivos/costos?tarifa=bloques",
+                                                   headers=cabeceras(i))),
+        ("sugerir_catalogo", lambda s, i: s.post(f"{base}/api/dispositivos/sugerir", headers=cabeceras(i),
+                                                 json={"nombre": NOMBRES_CATALOGO[i % len(NOMBRES_CATALOGO)]})),
+        ("sugerir_llm", lambda s, i: s.post(f"{base}/api/dispositivos/sugerir", headers=cabeceras(i),
+                                            json={"nombre": f"Aparato desconocido {i}"})),
+        # Pocos nombres fuera del catálogo: tras el primero de cada uno, todo sale de la cache de estimaciones
+        ("sugerir_llm_repetido", lambda s, i: s.post(f"{base}/api/dispositivos/sugerir", headers=cabeceras(i),
+                                                     json={"nombre": f"Aparato repetido {i % NOMBRES_REPETIDOS}"})),
+        ("sugerir_lote", lambda s, i: s.post(f"{base}/api/dispositivos/sugerir/lote", headers=cabeceras(i),
+                                             json={"nombres": NOMBRES_CATALOGO + [f"Lote {i} {j}" for j in range(5)]})),
+        ("consumos_ingesta", ingesta),
+        ("consumos_resumen", lambda s, i: s.get(f"{base}/api/consumos/resumen", headers=cabeceras(i))),
+        ("dispositivos_eliminar", eliminar),
+    ]
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API de PowerFlow")
+    parser.add_argument('--usuarios', type=int, default=100)
+    parser.add_argument('--dispositivos', type=int, default=2000)
+    parser.add_argument('--consumos', type=int, default=100000)
+    parser.add_argument('--dias-historial', type=int, default=365)
+    parser.add_argument('--peticiones', type=int, default=300, help="peticiones por endpoint")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--latencia-llm', type=float, default=50, help="ms de latencia del LLM simulado")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--db', help="archivo SQLite a usar (por defecto uno temporal)")
+    parser.add_argument('--salida', help="archivo JSON de resultados (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    # Los print de la API van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        reporte = ejecutar(args, parser)
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+def ejecutar(args, parser):
+    """Siembra, levanta la API y corre todos los escenarios; devuelve el reporte"""
+    if args.db:
+        if os.path.exists(args.db):
+            parser.error(f"{args.db} ya existe; el benchmark necesita una base de datos nueva")
+        return _ejecutar_en(args, args.db)
+    # Sin --db la base (cientos de MB con muchos consumos) se borra al terminar
+    with tempfile.TemporaryDirectory(prefix='powerflow-bench-') as directorio:
+        return _ejecutar_en(args, os.path.join(directorio, 'bench.db'))
+
+
+def _ejecutar_en(args, ruta_db):
+    llm, url_llm = iniciar_llm_simulado(args.latencia_llm)
+    import services.groq_cliente as groq_cliente
+    groq_cliente.GROQ_API_URL = url_llm
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + ruta_db,
+        'ESTIMACIONES_CACHE_RUTA': '',  # cache solo en memoria
+    })
+
+    print(f"🌱 Sembrando {args.usuarios} usuarios, {args.dispositivos} dispositivos, {args.consumos} consumos...",
+          file=sys.stderr)
+    segundos_siembra = sembrar(app, args.usuarios, args.dispositivos, args.consumos,
+                               args.dias_historial, args.semilla)
+
+    with app.app_context():
+        contador = ContadorSQL(db.engine)
+    api, base = iniciar_api(app)
+
+    import requests
+    tokens = []
+    for i in range(1, min(args.usuarios, 50) + 1):
+        r = requests.post(f"{base}/api/login", json={"correo": f"bench{i}@powerflow.test", "password": PASSWORD_BENCH})
+        tokens.append(r.json()["token"])
+
+    print("🚀 Ejecutando escenarios", file=sys.stderr)
+    resultados = {}
+    try:
+        for nombre, hacer_peticion in escenarios(base, tokens, args.usuarios):
+            resultados[nombre] = ejecutar_escenario(nombre, args.peticiones, args.concurrencia,
+                                                    hacer_peticion, contador)
+    finally:
+        api.shutdown()
+        llm.shutdown()
+        with app.app_context():
+            db.engine.dispose()
+
+    return {
+        "fecha": datetime.utcnow().isoformat() + "Z",
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": vars(args),
+        "siembra_s": round(segundos_siembra, 2),
+        "endpoints": resultados,
+    }
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import json
+import time
+
+import click
+
+
+def registrar_comandos(app):
+    """Registra los comandos de mantenimiento en `flask ...`"""
+
+    @app.cli.group('resumenes')
+    def resumenes():
+        """Tablas de resumen de consumo diario/mensual"""
+
+    @resumenes.command('reconstruir')
+    def reconstruir():
+        """Recalcula los resúmenes desde cero a partir de `consumos`"""
+        from services.resumenes import reconstruir_resumenes
+
+        totales = reconstruir_resumenes()
+        click.echo(f"✅ Resúmenes reconstruidos: {totales['diarios']} diarios, {totales['mensuales']} mensuales")
+
+    @app.cli.group('facturacion')
+    def facturacion():
+        """Cálculo de costos para todos los usuarios"""
+
+    @facturacion.command('cotizar')
+    @click.option('--tarifa', default='bloques', help="plana, bloques u horaria")
+    @click.option('--salida', type=click.Path(), help="Archivo JSON con el total por usuario")
+    def cotizar(tarifa, salida):
+        """Cotiza todos los dispositivos de todos los usuarios en una sola pasada"""
+        from extensions import db
+        from models.dispositivo import Dispositivo
+        from services.tarifas import cotizar_dispositivos, tarifa_desde_config
+
+        filas = db.session.query(
+            Dispositivo.usuario_id, Dispositivo.categoria, Dispositivo.potencia_watts, Dispositivo.horas_uso_dia
+        ).all()
+        if not filas:
+            click.echo("⚠️ No hay dispositivos registrados")
+            return
+
+        usuario_ids, categorias, potencias, horas = zip(*filas)
+        cotizacion = cotizar_dispositivos(
+            usuario_ids, potencias, horas, tarifa=tarifa_desde_config(tarifa), categorias=categorias
+        )
+
+        click.echo(
+            f"✅ {len(filas)} dispositivos de {len(cotizacion['usuarios'])} usuarios: "
+            f"{cotizacion['kwh_usuario'].sum():.2f} kWh, L {cotizacion['costo_usuario'].sum():.2f}"
+        )
+        if salida:
+            with open(salida, 'w', encoding='utf-8') as archivo:
+                json.dump([
+                    {"usuario_id": u, "consumo_kwh": k, "costo_lps": c}
+                    for u, k, c in zip(
+                        cotizacion['usuarios'].tolist(),
+                        cotizacion['kwh_usuario'].tolist(),
+                        cotizacion['costo_usuario'].tolist(),
+                    )
+                ], archivo, ensure_ascii=False)
+
+    @app.cli.group('sugerencias')
+    def sugerencias():
+        """Sugerencias de ahorro (SugerencIA)"""
+
+    @sugerencias.command('generar')
+    @click.option('--checkpoint', type=click.Path(), default='sugerencias_checkpoint.json',
+                  show_default=True, help="Archivo para continuar una corrida interrumpida")
+    @click.option('--bloque', default=500, show_default=True, help="Usuarios por bloque")
+    @click.option('--procesos', default=2, show_default=True, help="Procesos para las reglas (0 = en línea)")
+    @click.option('--top-llm', default=20, show_default=True, help="Consejos por bloque redactados por el LLM (0 = ninguno)")
+    @click.option('--concurrencia-llm', default=4, show_default=True, help="Llamadas simultáneas al LLM")
+    @click.option('--max-por-usuario', default=3, show_default=True)
+    @click.option('--limite-minutos', type=float, help="Detenerse tras este tiempo; la próxima corrida continúa")
+    @click.option('--reiniciar', is_flag=True, help="Ignorar el checkpoint y empezar desde el primer usuario")
+    def generar(checkpoint, bloque, procesos, top_llm, concurrencia_llm, max_por_usuario, limite_minutos, reiniciar):
+        """Genera sugerencias para todos los usuarios por bloques"""
+        from services.sugerencias import generar_sugerencias
+
+        inicio = time.perf_counter()
+        estado = generar_sugerencias(
+            checkpoint=checkpoint,
+            tamano_bloque=bloque,
+            procesos=procesos,
+            top_llm=top_llm,
+            concurrencia_llm=concurrencia_llm,
+            max_por_usuario=max_por_usuario,
+            limite_segundos=limite_minutos * 60 if limite_minutos else None,
+            reiniciar=reiniciar,
+            informar=click.echo,
+        )
+        click.echo(
+            f"{'✅ Corrida completa' if estado['completado'] else '⏸️ Corrida pausada'}: "
+            f"{estado['usuarios']} usuarios, {estado['sugerencias']} sugerencias, "
+            f"{estado['llamadas_llm']} consultas al LLM en {time.perf_counter() - inicio:.1f} s"
+        )
+
+    @app.cli.group('usuarios')
+    def usuarios():
+        """Mantenimiento de cuentas"""
+
+    @usuarios.command('purgar')
+    def purgar():
+        """Termina la eliminación de cuentas marcadas como pendientes (p. ej. tras un reinicio)"""
+        from flask import current_app
+        from services.purga_usuarios import purga_usuarios
+
+        pendientes = purga_usuarios.pendientes()
+        if not pendientes:
+            click.echo("✅ No hay cuentas pendientes de eliminación")
+            return
+        for usuario_id in pendientes:
+            resultado = purga_usuarios.purgar(current_app._get_current_object(), usuario_id)
+            click.echo(f"🗑️ Usuario {usuario_id}: {resultado['consumos']} consumos, {resultado['dispositivos']} dispositivos")
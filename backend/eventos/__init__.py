@@ -0,0 +1 @@
+# Servicio asyncio de eventos en vivo (SSE)
@@ -0,0 +1,375 @@
+"""
+Servicio de eventos en vivo (Server-Sent Events), independiente de la API Flask.
+
+Con gunicorn cada flujo SSE retenía un hilo del worker mientras estaba
+abierto, así que unas pocas pestañas del dashboard agotaban los hilos de la
+API. Aquí cada conexión es una corrutina con un buffer acotado: miles de
+dashboards inactivos solo cuestan memoria y descriptores de archivo.
+
+- Los navegadores piden un ticket a la API (POST /api/eventos/ticket, con su
+  JWT) y abren GET /api/eventos?ticket=... contra este servicio. El ticket va
+  firmado con una clave derivada de JWT_SECRET (ver services/eventos.py) y
+  solo se canjea una vez.
+- La API y la telemetría publican por un socket local (--relay), una línea
+  JSON por evento. Se escucha en 127.0.0.1 y el relay se identifica con una
+  primera línea firmada.
+
+En producción, el proxy envía /api/eventos a este servicio y el resto de /api
+a gunicorn.
+
+Uso (desde backend/, con el mismo JWT_SECRET que la API):
+    python -m eventos.servidor --puerto 5001 --relay 5002
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from urllib.parse import parse_qs, urlsplit
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from services.eventos import clave_eventos, leer_ticket, saludo_relay
+
+RUTA_FLUJO = '/api/eventos'
+MAX_CONEXIONES_DEFECTO = 10000
+MAX_POR_USUARIO_DEFECTO = 10
+BUFFER_DEFECTO = 100
+LATIDO_DEFECTO = 15
+DURACION_MAXIMA_DEFECTO = 600
+REINTENTO_MS_DEFECTO = 3000
+# Una petición de EventSource es una línea y unos encabezados; lo que no llegue
+# en este tamaño y tiempo no es un navegador
+MAX_ENCABEZADOS_BYTES = 8192
+ESPERA_ENCABEZADOS = 10
+# Un evento del relay (p. ej. las lecturas de un lote de ingesta) cabe en esto
+MAX_MENSAJE_BYTES = 1024 * 1024
+
+RAZONES = {200: 'OK', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+           503: 'Service Unavailable'}
+
+
+def formato_sse(tipo, datos, id_evento=None):
+    """Serializa un evento en el formato de text/event-stream"""
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"event: {tipo}")
+    lineas.extend(f"data: {linea}" for linea in json.dumps(datos, ensure_ascii=False).splitlines())
+    return ("\n".join(lineas) + "\n\n").encode('utf-8')
+
+
+class ConexionSSE:
+    """
+    Eventos pendientes de un navegador. Solo se usa desde el hilo del event
+    loop, así que no necesita locks.
+    """
+
+    def __init__(self, usuario_id, max_eventos):
+        self.usuario_id = usuario_id
+        self.max_eventos = max_eventos
+        self.eventos = deque()
+        self.desbordada = False
+        self.cerrada = False
+        self.despertar = asyncio.Event()
+
+    def entregar(self, evento):
+        if self.desbordada:
+            return
+        if len(self.eventos) >= self.max_eventos:
+            # Cliente demasiado lento: se descarta lo pendiente y se le pide recargar
+            self.eventos.clear()
+            self.desbordada = True
+        else:
+            self.eventos.append(evento)
+        self.despertar.set()
+
+    def cerrar(self):
+        self.cerrada = True
+        self.despertar.set()
+
+
+class ServicioEventos:
+
+    def __init__(self, clave, max_conexiones=MAX_CONEXIONES_DEFECTO, max_por_usuario=MAX_POR_USUARIO_DEFECTO,
+                 max_eventos=BUFFER_DEFECTO, latido=LATIDO_DEFECTO, duracion_maxima=DURACION_MAXIMA_DEFECTO,
+                 reintento_ms=REINTENTO_MS_DEFECTO, origen='*'):
+        self.clave = clave
+        self.max_conexiones = max_conexiones
+        self.max_por_usuario = max_por_usuario
+        self.max_eventos = max_eventos
+        self.latido = latido
+        self.duracion_maxima = duracion_maxima
+        self.reintento_ms = reintento_ms
+        self.origen = origen
+        self.conexiones = defaultdict(set)  # usuario_id -> {ConexionSSE}
+        self.total = 0
+        self.canjeados = {}  # nonce -> expira, para que cada ticket sirva una sola vez
+        self.contadores = Counter()
+        self.puertos = None  # (flujo, relay) una vez escuchando
+        self._atendiendo = {}  # tarea -> escritor de cada conexión abierta (navegadores y relays)
+        self._ids = itertools.count(1)
+        self._detener = asyncio.Event()
+
+    # ------------------------------------------------------------ Publicación (relay)
+
+    def publicar(self, usuario_id, tipo, datos):
+        destinos = self.conexiones.get(usuario_id)
+        if not destinos:
+            return 0
+        # Se serializa una vez por evento, no una por conexión
+        evento = formato_sse(tipo, datos, next(self._ids))
+        for conexion in destinos:
+            conexion.entregar(evento)
+            if conexion.desbordada:
+                self.contadores["desbordes"] += 1
+        self.contadores["publicados"] += 1
+        return len(destinos)
+
+    def cerrar_usuario(self, usuario_id):
+        for conexion in self.conexiones.get(usuario_id, ()):
+            conexion.cerrar()
+
+    async def atender_relay(self, lector, escritor):
+        self._atendiendo[asyncio.current_task()] = escritor
+        try:
+            saludo = await asyncio.wait_for(lector.readline(), ESPERA_ENCABEZADOS)
+            if saludo.strip().decode('ascii', 'replace') != saludo_relay(self.clave):
+                self.contadores["relays_rechazados"] += 1
+                return
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    mensaje = json.loads(linea)
+                    usuario_id = mensaje["usuario_id"]
+                    if mensaje.get("cerrar"):
+                        self.cerrar_usuario(usuario_id)
+                    else:
+                        self.publicar(usuario_id, mensaje["tipo"], mensaje.get("datos"))
+                except (ValueError, KeyError, TypeError):
+                    self.contadores["mensajes_invalidos"] += 1
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            # ValueError: una línea más larga que MAX_MENSAJE_BYTES
+            self.contadores["relays_cortados"] += 1
+        finally:
+            del self._atendiendo[asyncio.current_task()]
+            escritor.close()
+
+    # ------------------------------------------------------------ Navegadores
+
+    def _canjear(self, ticket):
+        datos = leer_ticket(self.clave, ticket) if ticket else None
+        if datos is None:
+            return None
+        usuario_id, expira, nonce = datos
+        if nonce in self.canjeados:
+            return None
+        self.canjeados[nonce] = expira
+        return usuario_id
+
+    def _suscribir(self, usuario_id):
+        if self.total >= self.max_conexiones or len(self.conexiones[usuario_id]) >= self.max_por_usuario:
+            if not self.conexiones[usuario_id]:
+                del self.conexiones[usuario_id]
+            return None
+        conexion = ConexionSSE(usuario_id, self.max_eventos)
+        self.conexiones[usuario_id].add(conexion)
+        self.total += 1
+        return conexion
+
+    def _cancelar(self, conexion):
+        actuales = self.conexiones.get(conexion.usuario_id)
+        if actuales and conexion in actuales:
+            actuales.discard(conexion)
+            self.total -= 1
+            if not actuales:
+                del self.conexiones[conexion.usuario_id]
+
+    def _encabezados(self, status, extra):
+        lineas = [f"HTTP/1.1 {status} {RAZONES[status]}", f"Access-Control-Allow-Origin: {self.origen}",
+                  "Connection: close"]
+        lineas.extend(f"{nombre}: {valor}" for nombre, valor in extra.items())
+        return ("\r\n".join(lineas) + "\r\n\r\n").encode('latin-1')
+
+    async def _responder(self, escritor, status, error, extra=None):
+        cuerpo = json.dumps({"error": error}, ensure_ascii=False).encode('utf-8')
+        escritor.write(self._encabezados(status, {
+            "Content-Type": "application/json", "Content-Length": len(cuerpo), **(extra or {}),
+        }) + cuerpo)
+        await escritor.drain()
+
+    async def _vigilar_cierre(self, lector, conexion):
+        """El navegador no manda nada más: un EOF significa que cerró la pestaña"""
+        try:
+            while await lector.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        conexion.cerrar()
+
+    async def atender_navegador(self, lector, escritor):
+        self._atendiendo[asyncio.current_task()] = escritor
+        try:
+            cabecera = await asyncio.wait_for(lector.readuntil(b'\r\n\r\n'), ESPERA_ENCABEZADOS)
+            metodo, ruta, _ = cabecera.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            del self._atendiendo[asyncio.current_task()]
+            escritor.close()
+            return
+
+        try:
+            partes = urlsplit(ruta)
+            if partes.path != RUTA_FLUJO:
+                return await self._responder(escritor, 404, "Ruta no encontrada")
+            if metodo != 'GET':
+                return await self._responder(escritor, 405, "Método no permitido", {"Allow": "GET"})
+
+            usuario_id = self._canjear(parse_qs(partes.query).get('ticket', [None])[0])
+            if usuario_id is None:
+                self.contadores["tickets_rechazados"] += 1
+                return await self._responder(escritor, 401, "Ticket inválido o vencido, solicita uno nuevo")
+
+            conexion = self._suscribir(usuario_id)
+            if conexion is None:
+                self.contadores["rechazadas_tope"] += 1
+                return await self._responder(escritor, 503, "Demasiadas conexiones abiertas, intenta de nuevo",
+                                             {"Retry-After": self.reintento_ms // 1000 or 1})
+
+            self.contadores["aceptadas"] += 1
+            vigilante = asyncio.create_task(self._vigilar_cierre(lector, conexion))
+            try:
+                await self._transmitir(escritor, conexion)
+            finally:
+                vigilante.cancel()
+                self._cancelar(conexion)
+        except ConnectionError:
+            pass
+        finally:
+            del self._atendiendo[asyncio.current_task()]
+            escritor.close()
+
+    async def _transmitir(self, escritor, conexion):
+        escritor.write(self._encabezados(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Que nginx no acumule el flujo
+        }))
+        escritor.write(f"retry: {self.reintento_ms}\n\n".encode('ascii'))
+        escritor.write(formato_sse("conectado", {"usuario_id": conexion.usuario_id}))
+        await escritor.drain()
+
+        # La conexión se cierra cada cierto tiempo: el ticket ya se gastó, así que el cliente
+        # pide uno nuevo (con su JWT vigente) antes de reabrir el flujo
+        limite = time.monotonic() + self.duracion_maxima
+        while not conexion.cerrada and time.monotonic() < limite:
+            try:
+                await asyncio.wait_for(conexion.despertar.wait(), self.latido)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión sin despertar al cliente
+                escritor.write(b": latido\n\n")
+                await escritor.drain()
+                continue
+            conexion.despertar.clear()
+            if conexion.desbordada:
+                # Se perdieron eventos: el cliente debe volver a pedir el estado completo
+                conexion.desbordada = False
+                escritor.write(formato_sse("recargar", {}))
+            else:
+                escritor.write(b''.join(conexion.eventos))
+                conexion.eventos.clear()
+            # Un cliente lento frena solo su corrutina; lo que le llegue mientras se acumula en su buffer
+            await escritor.drain()
+
+    # ------------------------------------------------------------ Ciclo de vida
+
+    async def informar(self, cada=30):
+        while not self._detener.is_set():
+            try:
+                await asyncio.wait_for(self._detener.wait(), cada)
+            except asyncio.TimeoutError:
+                pass
+            # Los tickets vencidos ya no se pueden canjear: no hace falta recordarlos
+            ahora = time.time()
+            self.canjeados = {nonce: expira for nonce, expira in self.canjeados.items() if expira >= ahora}
+            print(f"📡 {self.total} conexiones SSE de {len(self.conexiones)} usuarios, totales {dict(self.contadores)}")
+
+    def estadisticas(self):
+        return {"conexiones": self.total, "usuarios": len(self.conexiones), **self.contadores}
+
+    def detener(self):
+        self._detener.set()
+
+    async def ejecutar(self, host, puerto, host_relay, puerto_relay):
+        servidor = await asyncio.start_server(self.atender_navegador, host, puerto, limit=MAX_ENCABEZADOS_BYTES)
+        relay = await asyncio.start_server(self.atender_relay, host_relay, puerto_relay, limit=MAX_MENSAJE_BYTES)
+        self.puertos = (servidor.sockets[0].getsockname()[1], relay.sockets[0].getsockname()[1])
+        print(f"📡 Eventos SSE en {host}:{self.puertos[0]}, relay en {host_relay}:{self.puertos[1]}")
+
+        tarea = asyncio.create_task(self.informar())
+        await self._detener.wait()
+
+        # Apagado ordenado: se deja de aceptar, se cierran las conexiones y se espera a sus corrutinas
+        servidor.close()
+        relay.close()
+        for tarea_conexion, escritor in list(self._atendiendo.items()):
+            escritor.close()
+            tarea_conexion.cancel()
+        await asyncio.gather(tarea, *self._atendiendo, return_exceptions=True)
+        print(f"✅ Eventos detenidos: {dict(self.contadores)}")
+
+
+def _subir_limite_descriptores():
+    """Cada conexión es un descriptor: se usa todo lo que el sistema permite"""
+    try:
+        import resource
+        blando, duro = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if blando < duro:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (duro, duro))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de eventos en vivo (SSE)")
+    parser.add_argument('--host', default=os.getenv('EVENTOS_HOST', '0.0.0.0'))
+    parser.add_argument('--puerto', type=int, default=int(os.getenv('EVENTOS_PUERTO', 5001)), help="Puerto de los navegadores")
+    parser.add_argument('--relay-host', default=os.getenv('EVENTOS_RELAY_HOST', '127.0.0.1'))
+    parser.add_argument('--relay', type=int, default=int(os.getenv('EVENTOS_RELAY_PUERTO', 5002)), help="Puerto de la API y la telemetría")
+    parser.add_argument('--max-conexiones', type=int, default=int(os.getenv('EVENTOS_MAX_CONEXIONES', MAX_CONEXIONES_DEFECTO)))
+    parser.add_argument('--max-por-usuario', type=int, default=int(os.getenv('EVENTOS_MAX_POR_USUARIO', MAX_POR_USUARIO_DEFECTO)))
+    parser.add_argument('--buffer', type=int, default=int(os.getenv('EVENTOS_BUFFER', BUFFER_DEFECTO)), help="Eventos pendientes por conexión")
+    parser.add_argument('--latido', type=float, default=float(os.getenv('EVENTOS_LATIDO', LATIDO_DEFECTO)), help="Segundos entre latidos")
+    parser.add_argument('--duracion-maxima', type=float, default=float(os.getenv('EVENTOS_DURACION_MAXIMA', DURACION_MAXIMA_DEFECTO)))
+    parser.add_argument('--reintento-ms', type=int, default=int(os.getenv('EVENTOS_REINTENTO_MS', REINTENTO_MS_DEFECTO)))
+    parser.add_argument('--origen', default=os.getenv('EVENTOS_ORIGEN', '*'), help="Access-Control-Allow-Origin")
+    args = parser.parse_args(argv)
+    secreto = os.getenv('JWT_SECRET')
+    if not secreto:
+        parser.error("define la variable de entorno JWT_SECRET (la misma que usa la API)")
+
+    _subir_limite_descriptores()
+    servicio = ServicioEventos(
+        clave_eventos(secreto), args.max_conexiones, args.max_por_usuario, args.buffer,
+        args.latido, args.duracion_maxima, args.reintento_ms, args.origen,
+    )
+
+    async def correr():
+        bucle = asyncio.get_running_loop()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            bucle.add_signal_handler(senal, servicio.detener)
+        await servicio.ejecutar(args.host, args.puerto, args.relay_host, args.relay)
+
+    asyncio.run(correr())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,34 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 # Instancia global de la base de datos
 db = SQLAlchemy()
+
+
+# Perfil de almacenamiento SQLite: WAL para que los lectores no se bloqueen
+# con los escritores, espera ante bloqueos y mmap para lecturas rápidas.
+# SQLite no aplica las claves foráneas (ni ON DELETE CASCADE) si no se activan
+PERFIL_SQLITE = {
+    "foreign_keys": "ON",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,          # ms
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,          # negativo = tamaño en KiB
+    "temp_store": "MEMORY",
+}
+
+
+def aplicar_perfil_sqlite(engine, perfil=None):
+    """Aplica los PRAGMA del perfil en cada conexión nueva al motor SQLite"""
+    if engine.dialect.name != 'sqlite':
+        return
+    perfil = {**PERFIL_SQLITE, **(perfil or {})}
+
+    @event.listens_for(engine, 'connect')
+    def _configurar_conexion(conexion_dbapi, registro):
+        cursor = conexion_dbapi.cursor()
+        for pragma, valor in perfil.items():
+            cursor.execute(f"PRAGMA {pragma}={valor}")
+        cursor.close()
+
@@ -0,0 +1,48 @@
+"""
+Configuración de gunicorn para producción (ver wsgi.py).
+
+La app se carga en el master antes del fork (`preload_app`), así que un
+worker nuevo (o el que gunicorn levanta para reemplazar a uno caído) solo
+hereda memoria ya inicializada y está listo en milisegundos. Cada worker
+registra cuánto tardó desde el fork hasta estar listo.
+"""
+import os
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+# Un solo worker por defecto: la cola de trabajos, las caches (identidad, dashboard,
+# pronóstico) y el registro de /metrics viven en memoria del proceso. Con más workers
+# un sondeo de trabajo puede caer en otro proceso, las invalidaciones no se propagan y
+# /metrics ve solo un worker. Los flujos SSE no pasan por aquí: los sirve eventos/servidor.py.
+# Se escala con hilos; subir GUNICORN_WORKERS solo tras mover ese estado a un almacén compartido.
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+# Hilos por worker: las esperas al LLM no bloquean todo el proceso
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+preload_app = True
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+# Como el formato por defecto, pero con la ruta sin query string (%(U)s en vez de %(r)s):
+# ningún parámetro sensible de la query llega al log
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+
+def pre_fork(server, worker):
+    # CLOCK_MONOTONIC es el mismo para el master y el hijo
+    worker.inicio_fork = time.perf_counter()
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas por el master (verificación del esquema) no se comparten entre procesos
+    from extensions import db
+    from wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    milisegundos = (time.perf_counter() - worker.inicio_fork) * 1000
+    worker.log.info(f"⚡ Worker {worker.pid} listo en {milisegundos:.1f} ms")
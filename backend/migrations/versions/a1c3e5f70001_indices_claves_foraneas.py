@@ -0,0 +1,37 @@
+"""Índices para claves foráneas y consultas por fecha
+
+Revision ID: a1c3e5f70001
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f70001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (nombre, tabla, columnas); las tablas ya existen por db.create_all()
+INDICES = [
+    ('ix_dispositivos_usuario_id', 'dispositivos', ['usuario_id']),
+    ('ix_consumos_dispositivo_fecha', 'consumos', ['dispositivo_id', 'fecha']),
+    ('ix_consumos_fecha', 'consumos', ['fecha']),
+    ('ix_sugerencias_ia_usuario_fecha', 'sugerencias_ia', ['usuario_id', 'fecha_generacion']),
+]
+
+
+def upgrade():
+    for nombre, tabla, columnas in INDICES:
+        op.create_index(nombre, tabla, columnas, unique=False, if_not_exists=True)
+    # Estadísticas para que el planificador de SQLite elija bien los índices
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    for nombre, tabla, _ in reversed(INDICES):
+        op.drop_index(nombre, table_name=tabla, if_exists=True)
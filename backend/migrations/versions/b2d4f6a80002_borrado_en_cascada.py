@@ -0,0 +1,94 @@
+"""Borrado en cascada en la base y marca de eliminación pendiente
+
+Revision ID: b2d4f6a80002
+Revises: a1c3e5f70001
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a80002'
+down_revision = 'a1c3e5f70001'
+branch_labels = None
+depends_on = None
+
+
+# Nombres estables para las FK: las que creó db.create_all() en SQLite no tienen nombre
+CONVENCION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+# (tabla, columna, tabla referida, ¿existía antes?); los resúmenes no tenían FK
+CLAVES = [
+    ('dispositivos', 'usuario_id', 'usuarios', True),
+    ('sugerencias_ia', 'usuario_id', 'usuarios', True),
+    ('consumos', 'dispositivo_id', 'dispositivos', True),
+    ('consumos_diarios', 'dispositivo_id', 'dispositivos', False),
+    ('consumos_mensuales', 'dispositivo_id', 'dispositivos', False),
+]
+
+INDICES = [
+    ('ix_consumos_diarios_dispositivo_id', 'consumos_diarios', ['dispositivo_id']),
+    ('ix_consumos_mensuales_dispositivo_id', 'consumos_mensuales', ['dispositivo_id']),
+]
+
+
+def _nombre_fk(tabla, columna, referida):
+    return CONVENCION["fk"] % {"table_name": tabla, "column_0_name": columna, "referred_table_name": referida}
+
+
+def _clave_actual(inspector, tabla, columna, referida):
+    for fk in inspector.get_foreign_keys(tabla):
+        if fk['constrained_columns'] == [columna] and fk['referred_table'] == referida:
+            return fk
+    return None
+
+
+def _recrear_clave(tabla, columna, referida, crear=True, ondelete=None):
+    """Reemplaza la FK de `columna` (SQLite no permite ALTER de FK: se recrea la tabla)"""
+    actual = _clave_actual(sa.inspect(op.get_bind()), tabla, columna, referida)
+    with op.batch_alter_table(tabla, recreate='always', naming_convention=CONVENCION) as batch_op:
+        if actual is not None:
+            batch_op.drop_constraint(actual.get('name') or _nombre_fk(tabla, columna, referida), type_='foreignkey')
+        if crear:
+            batch_op.create_foreign_key(
+                _nombre_fk(tabla, columna, referida), referida, [columna], ['id'], ondelete=ondelete,
+            )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'pendiente_eliminacion' not in {c['name'] for c in inspector.get_columns('usuarios')}:
+        with op.batch_alter_table('usuarios') as batch_op:
+            batch_op.add_column(sa.Column('pendiente_eliminacion', sa.Boolean(), nullable=False,
+                                          server_default=sa.false()))
+
+    # Las tablas de resumen pueden no existir aún: db.create_all() las creará ya con la FK
+    claves = [c for c in CLAVES if c[0] in inspector.get_table_names()]
+
+    # Filas huérfanas de borrados anteriores: la FK nueva no las admitiría
+    for tabla, columna, referida, _ in claves:
+        op.execute(f'DELETE FROM {tabla} WHERE {columna} NOT IN (SELECT id FROM {referida})')
+
+    for tabla, columna, referida, _ in claves:
+        actual = _clave_actual(sa.inspect(op.get_bind()), tabla, columna, referida)
+        if actual is not None and (actual.get('options') or {}).get('ondelete') == 'CASCADE':
+            continue  # Base creada por db.create_all() con los modelos actuales
+        _recrear_clave(tabla, columna, referida, ondelete='CASCADE')
+
+    for nombre, tabla, columnas in INDICES:
+        if tabla in inspector.get_table_names():
+            op.create_index(nombre, tabla, columnas, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    tablas = sa.inspect(op.get_bind()).get_table_names()
+    for nombre, tabla, _ in reversed(INDICES):
+        if tabla in tablas:
+            op.drop_index(nombre, table_name=tabla, if_exists=True)
+    for tabla, columna, referida, existia in CLAVES:
+        if tabla in tablas:
+            _recrear_clave(tabla, columna, referida, crear=existia)
+    with op.batch_alter_table('usuarios') as batch_op:
+        batch_op.drop_column('pendiente_eliminacion')
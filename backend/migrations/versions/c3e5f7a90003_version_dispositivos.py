@@ -0,0 +1,29 @@
+"""Versión de la lista de dispositivos por usuario (ETag de /api/dispositivos)
+
+Revision ID: c3e5f7a90003
+Revises: b2d4f6a80002
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5f7a90003'
+down_revision = 'b2d4f6a80002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'version_dispositivos' not in {c['name'] for c in inspector.get_columns('usuarios')}:
+        with op.batch_alter_table('usuarios') as batch_op:
+            batch_op.add_column(sa.Column('version_dispositivos', sa.Integer(), nullable=False,
+                                          server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('usuarios') as batch_op:
+        batch_op.drop_column('version_dispositivos')
@@ -0,0 +1,29 @@
+"""Versión de telemetría por usuario (invalidación entre la telemetría y la API)
+
+Revision ID: d4f6a8b00004
+Revises: c3e5f7a90003
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6a8b00004'
+down_revision = 'c3e5f7a90003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'version_telemetria' not in {c['name'] for c in inspector.get_columns('usuarios')}:
+        with op.batch_alter_table('usuarios') as batch_op:
+            batch_op.add_column(sa.Column('version_telemetria', sa.Integer(), nullable=False,
+                                          server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('usuarios') as batch_op:
+        batch_op.drop_column('version_telemetria')
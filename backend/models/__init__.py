@@ -2,3 +2,4 @@ from .usuario import Usuario
 from .dispositivo import Dispositivo
 from .consumo import Consumo
 from .sugerencia import SugerencIA
+from .resumen import ConsumoDiario, ConsumoMensual
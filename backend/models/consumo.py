@@ -3,9 +3,15 @@ from extensions import db
 
 class Consumo(db.Model):
     __tablename__ = 'consumos'
+    __table_args__ = (
+        # Historial de un dispositivo por rango de fechas
+        db.Index('ix_consumos_dispositivo_fecha', 'dispositivo_id', 'fecha'),
+        # Exportaciones y reportes por rango de fechas de todos los dispositivos
+        db.Index('ix_consumos_fecha', 'fecha'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    dispositivo_id = db.Column(db.Integer, db.ForeignKey('dispositivos.id'), nullable=False)
+    dispositivo_id = db.Column(db.Integer, db.ForeignKey('dispositivos.id', ondelete='CASCADE'), nullable=False)
 
     fecha = db.Column(db.Date, default=date.today, nullable=False)
     horas_uso = db.Column(db.Float, nullable=False)
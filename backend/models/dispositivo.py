@@ -1,10 +1,15 @@
 from extensions import db
+from services.constantes import DIAS_MES, TARIFA_KWH_DEFECTO
 
 class Dispositivo(db.Model):
     __tablename__ = 'dispositivos'
+    __table_args__ = (
+        # Listados y agregados siempre filtran por usuario
+        db.Index('ix_dispositivos_usuario_id', 'usuario_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False)
 
     nombre = db.Column(db.String(100), nullable=False)
     potencia_watts = db.Column(db.Float, nullable=True)
@@ -13,7 +18,9 @@ class Dispositivo(db.Model):
 
     # Relaciones
     usuario = db.relationship('Usuario', back_populates='dispositivos')
-    consumos = db.relationship('Consumo', back_populates='dispositivo', cascade="all, delete-orphan")
+    # passive_deletes: los consumos los borra la base (ON DELETE CASCADE), sin cargarlos
+    consumos = db.relationship('Consumo', back_populates='dispositivo', cascade="all, delete-orphan",
+                               passive_deletes=True)
 
     def __repr__(self):
         return f"<Dispositivo {self.nombre} ({self.potencia_watts} W)>"
@@ -21,10 +28,10 @@ class Dispositivo(db.Model):
     def calcular_consumo_mensual(self):
         """Calcula el consumo mensual estimado en kWh"""
         if self.potencia_watts and self.horas_uso_dia:
-            return (self.potencia_watts * self.horas_uso_dia * 30) / 1000
+            return (self.potencia_watts * self.horas_uso_dia * DIAS_MES) / 1000
         return 0
     
-    def calcular_costo_mensual(self, tarifa_kwh=3.7):
+    def calcular_costo_mensual(self, tarifa_kwh=TARIFA_KWH_DEFECTO):
         """Calcula el costo mensual en Lempiras (tarifa por defecto: L3.70/kWh)"""
         consumo = self.calcular_consumo_mensual()
-        return consumo * tarifa_kwh
\ No newline at end of file
+        return consumo * tarifa_kwh
@@ -0,0 +1,40 @@
+from extensions import db
+
+class ConsumoDiario(db.Model):
+    __tablename__ = 'consumos_diarios'
+    __table_args__ = (
+        # La PK empieza por usuario_id; el borrado en cascada busca por dispositivo
+        db.Index('ix_consumos_diarios_dispositivo_id', 'dispositivo_id'),
+    )
+
+    usuario_id = db.Column(db.Integer, primary_key=True)
+    dispositivo_id = db.Column(db.Integer, db.ForeignKey('dispositivos.id', ondelete='CASCADE'), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+
+    horas_uso = db.Column(db.Float, default=0, nullable=False)
+    consumo_kwh = db.Column(db.Float, default=0, nullable=False)
+    costo_lps = db.Column(db.Float, default=0, nullable=False)
+    lecturas = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<ConsumoDiario {self.dispositivo_id} {self.fecha} - {self.consumo_kwh} kWh>"
+
+
+class ConsumoMensual(db.Model):
+    __tablename__ = 'consumos_mensuales'
+    __table_args__ = (
+        # La PK empieza por usuario_id; el borrado en cascada busca por dispositivo
+        db.Index('ix_consumos_mensuales_dispositivo_id', 'dispositivo_id'),
+    )
+
+    usuario_id = db.Column(db.Integer, primary_key=True)
+    dispositivo_id = db.Column(db.Integer, db.ForeignKey('dispositivos.id', ondelete='CASCADE'), primary_key=True)
+    periodo = db.Column(db.String(7), primary_key=True)  # Formato YYYY-MM
+
+    horas_uso = db.Column(db.Float, default=0, nullable=False)
+    consumo_kwh = db.Column(db.Float, default=0, nullable=False)
+    costo_lps = db.Column(db.Float, default=0, nullable=False)
+    lecturas = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<ConsumoMensual {self.dispositivo_id} {self.periodo} - {self.consumo_kwh} kWh>"
@@ -3,9 +3,13 @@ from extensions import db
 
 class SugerencIA(db.Model):
     __tablename__ = 'sugerencias_ia'
+    __table_args__ = (
+        # Sugerencias más recientes de un usuario
+        db.Index('ix_sugerencias_ia_usuario_fecha', 'usuario_id', 'fecha_generacion'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False)
 
     mensaje = db.Column(db.Text, nullable=False)
     fecha_generacion = db.Column(db.DateTime, default=datetime.utcnow)
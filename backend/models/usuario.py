@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import update
 from extensions import db
 
 class Usuario(db.Model):
@@ -9,10 +10,39 @@ class Usuario(db.Model):
     correo = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    # Cuenta grande en proceso de purga: ya no puede iniciar sesión ni usar su token
+    pendiente_eliminacion = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+    # Sube con cada alta, edición o baja de sus dispositivos: es el ETag de su lista
+    version_dispositivos = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Sube con cada volcado del servicio de telemetría (otro proceso) que trae lecturas suyas:
+    # la API la compara para saber que su serie de pronóstico y sus flujos SSE quedaron atrás
+    version_telemetria = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
-    # Relaciones
-    dispositivos = db.relationship('Dispositivo', back_populates='usuario', cascade="all, delete-orphan")
-    sugerencias = db.relationship('SugerencIA', back_populates='usuario', cascade="all, delete-orphan")
+    # Relaciones (la base borra en cascada; passive_deletes evita cargarlas al eliminar)
+    dispositivos = db.relationship('Dispositivo', back_populates='usuario', cascade="all, delete-orphan",
+                                   passive_deletes=True)
+    sugerencias = db.relationship('SugerencIA', back_populates='usuario', cascade="all, delete-orphan",
+                                  passive_deletes=True)
 
     def __repr__(self):
         return f"<Usuario {self.correo}>"
+
+    @classmethod
+    def tocar_dispositivos(cls, usuario_id):
+        """UPDATE que cambia la versión de la lista de dispositivos (en la misma transacción que el cambio)"""
+        return (
+            update(cls)
+            .where(cls.id == usuario_id)
+            .values(version_dispositivos=cls.version_dispositivos + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def tocar_telemetria(cls, usuario_ids):
+        """UPDATE que avisa a la API de lecturas escritas por la telemetría (en la misma transacción)"""
+        return (
+            update(cls)
+            .where(cls.id.in_(usuario_ids))
+            .values(version_telemetria=cls.version_telemetria + 1)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,125 @@
+import gzip
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# orjson es opcional: si no está instalado se usa el json estándar de Flask
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# brotli también es opcional; sin él solo se negocia gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tipos de contenido que vale la pena comprimir
+TIPOS_COMPRIMIBLES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+    'text/html',
+}
+
+
+class ProveedorJSONRapido(DefaultJSONProvider):
+    """
+    Serializa con orjson (datetime, date y arreglos de NumPy de forma nativa).
+    Lo que orjson no conoce pasa por el `default` de Flask (Decimal, UUID, dataclasses).
+    """
+
+    def _opciones(self):
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        if self._app.debug and self.compact is not True:
+            opciones |= orjson.OPT_INDENT_2
+        return opciones
+
+    @staticmethod
+    def _por_defecto(objeto):
+        if isinstance(objeto, tuple):
+            return list(objeto)
+        return DefaultJSONProvider.default(objeto)
+
+    def dumps(self, obj, **kwargs):
+        # Con argumentos propios de json.dumps (indent, separators...) se respeta el camino estándar
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self._por_defecto, option=self._opciones()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        cuerpo = orjson.dumps(obj, default=self._por_defecto, option=self._opciones())
+        return self._app.response_class(cuerpo + b'\n', mimetype=self.mimetype)
+
+
+def configurar_json(app):
+    """Activa orjson si está disponible"""
+    if orjson is None:
+        print("⚠️ orjson no está instalado, se usa el JSON estándar de Flask")
+        return
+    app.json = ProveedorJSONRapido(app)
+
+
+def _codificacion_aceptada():
+    """Elige br o gzip según Accept-Encoding (respetando q=0)"""
+    disponibles = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(disponibles)
+
+
+def registrar_compresion(app):
+    """
+    Comprime respuestas grandes (COMPRESION_MINIMA bytes) con br o gzip.
+    Las respuestas en streaming y las que ya traen Content-Encoding no se tocan.
+    """
+    minimo = app.config.get('COMPRESION_MINIMA', 1024)
+    nivel_gzip = app.config.get('COMPRESION_NIVEL_GZIP', 6)
+    nivel_br = app.config.get('COMPRESION_NIVEL_BR', 4)
+
+    if minimo <= 0:
+        return
+
+    @app.after_request
+    def comprimir_respuesta(respuesta):
+        if (
+            respuesta.direct_passthrough
+            or respuesta.is_streamed
+            or respuesta.status_code < 200
+            or respuesta.status_code in (204, 206, 304)
+            or 'Content-Encoding' in respuesta.headers
+            or respuesta.mimetype not in TIPOS_COMPRIMIBLES
+        ):
+            return respuesta
+
+        # El contenido depende de Accept-Encoding aunque esta vez no se comprima
+        respuesta.vary.add('Accept-Encoding')
+
+        datos = respuesta.get_data()
+        if len(datos) < minimo:
+            return respuesta
+
+        codificacion = _codificacion_aceptada()
+        if codificacion == 'br':
+            comprimido = brotli.compress(datos, quality=nivel_br)
+        elif codificacion == 'gzip':
+            comprimido = gzip.compress(datos, compresslevel=nivel_gzip, mtime=0)
+        else:
+            return respuesta
+
+        respuesta.set_data(comprimido)
+        respuesta.headers['Content-Encoding'] = codificacion
+
+        # Los bytes cambian con la codificación: el ETag deja de ser fuerte
+        etag, debil = respuesta.get_etag()
+        if etag and not debil:
+            respuesta.set_etag(etag, weak=True)
+        return respuesta
@@ -1,10 +1,74 @@
+from collections import OrderedDict, namedtuple
 from functools import wraps
-from flask import request, jsonify
+from flask import current_app, request, jsonify
 import jwt
+import threading
+import time
 from models.usuario import Usuario
 
-# Usa la misma clave que en usuario_routes.py
-SECRET_KEY = "powerflow_secret_key_2025"
+# Datos del usuario que necesitan los endpoints (no es un objeto ORM, se
+# puede compartir entre peticiones sin quedar atado a una sesión)
+UsuarioIdentidad = namedtuple('UsuarioIdentidad', ['id', 'nombre', 'correo'])
+
+
+class CacheIdentidad:
+    """Cache LRU en proceso de (usuario_id, token) -> UsuarioIdentidad, con TTL"""
+
+    def __init__(self, max_entradas=10000, ttl_segundos=60):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, usuario_id, token):
+        clave = (usuario_id, token)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                identidad, expira = entrada
+                if expira > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return identidad
+                del self._entradas[clave]
+            self.fallos += 1
+            return None
+
+    def guardar(self, token, identidad, exp=None):
+        expira = time.monotonic() + self.ttl_segundos
+        # Nunca mantener la entrada más allá de la expiración del propio token
+        if exp is not None:
+            expira = min(expira, time.monotonic() + (exp - time.time()))
+        with self._lock:
+            self._entradas[(identidad.id, token)] = (identidad, expira)
+            self._entradas.move_to_end((identidad.id, token))
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar_usuario(self, usuario_id):
+        with self._lock:
+            for clave in [c for c in self._entradas if c[0] == usuario_id]:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0,
+            }
+
+
+cache_identidad = CacheIdentidad()
+
 
 def token_required(f):
     @wraps(f)
@@ -23,12 +87,17 @@ def token_required(f):
 
         try:
             # Decodificar el token
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            data = jwt.decode(token, current_app.config['JWT_SECRET'], algorithms=["HS256"])
+
+            # Verificar que el usuario aún exista (primero en la cache en proceso)
+            usuario_actual = cache_identidad.obtener(data['id'], token)
+            if usuario_actual is None:
+                usuario = Usuario.query.get(data['id'])
+                if not usuario or usuario.pendiente_eliminacion:
+                    return jsonify({"error": "Usuario no encontrado o token inválido"}), 401
 
-            # Verificar que el usuario aún exista
-            usuario_actual = Usuario.query.get(data['id'])
-            if not usuario_actual:
-                return jsonify({"error": "Usuario no encontrado o token inválido"}), 401
+                usuario_actual = UsuarioIdentidad(usuario.id, usuario.nombre, usuario.correo)
+                cache_identidad.guardar(token, usuario_actual, data.get('exp'))
 
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "El token ha expirado, inicia sesión nuevamente"}), 401
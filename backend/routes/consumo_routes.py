@@ -0,0 +1,136 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from datetime import date
+from sqlalchemy import func
+from extensions import db
+from models.dispositivo import Dispositivo
+from models.resumen import ConsumoMensual
+from routes.auth_middleware import token_required
+from services.cache_pronostico import cache_pronostico
+import re
+
+consumo_bp = Blueprint('consumos', __name__)
+
+PATRON_PERIODO = re.compile(r'^\d{4}-\d{2}$')
+
+
+# Resumen de consumo (lee solo las tablas de resumen, nunca `consumos`)
+@consumo_bp.route('/api/consumos/resumen', methods=['GET'])
+@token_required
+def resumen_consumo(usuario_actual):
+    desde = request.args.get('desde')
+    hasta = request.args.get('hasta')
+
+    for valor in (desde, hasta):
+        if valor and not PATRON_PERIODO.match(valor):
+            return jsonify({"error": "Los periodos deben tener formato YYYY-MM"}), 400
+
+    filtros = [ConsumoMensual.usuario_id == usuario_actual.id]
+    if desde:
+        filtros.append(ConsumoMensual.periodo >= desde)
+    if hasta:
+        filtros.append(ConsumoMensual.periodo <= hasta)
+
+    kwh = func.sum(ConsumoMensual.consumo_kwh)
+    costo = func.sum(ConsumoMensual.costo_lps)
+    horas = func.sum(ConsumoMensual.horas_uso)
+
+    por_mes = (
+        db.session.query(ConsumoMensual.periodo, kwh, costo, horas)
+        .filter(*filtros)
+        .group_by(ConsumoMensual.periodo)
+        .order_by(ConsumoMensual.periodo)
+        .all()
+    )
+    por_dispositivo = (
+        db.session.query(ConsumoMensual.dispositivo_id, Dispositivo.nombre, Dispositivo.categoria, kwh, costo, horas)
+        .join(Dispositivo, Dispositivo.id == ConsumoMensual.dispositivo_id)
+        .filter(*filtros)
+        .group_by(ConsumoMensual.dispositivo_id, Dispositivo.nombre, Dispositivo.categoria)
+        .order_by(kwh.desc())
+        .all()
+    )
+
+    # Por categoría se agrupa sobre lo ya agregado por dispositivo
+    por_categoria = {}
+    for _, _, categoria, k, c, _ in por_dispositivo:
+        categoria = categoria or "Otros"
+        actual = por_categoria.setdefault(categoria, {"categoria": categoria, "consumo_kwh": 0, "costo_lps": 0})
+        actual["consumo_kwh"] += k or 0
+        actual["costo_lps"] += c or 0
+
+    return jsonify({
+        "total": {
+            "consumo_kwh": sum(fila[1] or 0 for fila in por_mes),
+            "costo_lps": sum(fila[2] or 0 for fila in por_mes),
+        },
+        "por_mes": [
+            {"periodo": p, "consumo_kwh": k, "costo_lps": c, "horas_uso": h}
+            for p, k, c, h in por_mes
+        ],
+        "por_dispositivo": [
+            {"dispositivo_id": i, "nombre": n, "categoria": cat, "consumo_kwh": k, "costo_lps": c, "horas_uso": h}
+            for i, n, cat, k, c, h in por_dispositivo
+        ],
+        "por_categoria": sorted(por_categoria.values(), key=lambda x: x["consumo_kwh"], reverse=True),
+    }), 200
+
+
+# Proyección de consumo y factura a fin de mes
+@consumo_bp.route('/api/consumos/pronostico', methods=['GET'])
+@token_required
+def pronostico_consumo(usuario_actual):
+    try:
+        resultado = cache_pronostico.obtener(usuario_actual.id, request.args.get('tarifa', 'plana'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(resultado), 200
+
+
+# Exportación completa del historial de lecturas (CSV o NDJSON, en streaming)
+@consumo_bp.route('/api/consumos/exportar', methods=['GET'])
+@token_required
+def exportar_consumos(usuario_actual):
+    from services.exportacion import consulta_exportacion, generar_csv, generar_ndjson, comprimir_gzip, codificar
+
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({"error": "El formato debe ser csv o ndjson"}), 400
+
+    try:
+        desde = date.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = date.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({"error": "Las fechas deben tener formato YYYY-MM-DD"}), 400
+
+    try:
+        dispositivo_id = int(request.args['dispositivo_id']) if request.args.get('dispositivo_id') else None
+        # Para reanudar una descarga cortada: último id recibido
+        despues_de = int(request.args['despues_de']) if request.args.get('despues_de') else None
+    except ValueError:
+        return jsonify({"error": "'dispositivo_id' y 'despues_de' deben ser números"}), 400
+
+    if dispositivo_id is not None:
+        dueno = db.session.query(Dispositivo.usuario_id).filter(Dispositivo.id == dispositivo_id).scalar()
+        if dueno != usuario_actual.id:
+            return jsonify({"error": "Dispositivo no encontrado"}), 404
+
+    consulta = consulta_exportacion(usuario_actual.id, desde, hasta, dispositivo_id, despues_de)
+    if formato == 'csv':
+        fragmentos, mimetype = generar_csv(consulta, encabezado=despues_de is None), 'text/csv'
+    else:
+        fragmentos, mimetype = generar_ndjson(consulta), 'application/x-ndjson'
+
+    cabeceras = {
+        'Content-Disposition': f'attachment; filename="consumos_{usuario_actual.id}.{formato}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no',
+    }
+    if request.accept_encodings['gzip']:
+        cuerpo = comprimir_gzip(fragmentos)
+        cabeceras['Content-Encoding'] = 'gzip'
+    else:
+        cuerpo = codificar(fragmentos)
+
+    # stream_with_context mantiene viva la sesión de BD mientras se recorre el cursor
+    return Response(stream_with_context(cuerpo), mimetype=mimetype, headers=cabeceras)
@@ -1,142 +1,68 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
+from sqlalchemy import insert, select, update
 from models.dispositivo import Dispositivo
+from models.usuario import Usuario
 from routes.auth_middleware import token_required
-import json
-import os
+from routes.listas import parametros_paginacion, campos_solicitados, consulta_paginada, responder_lista
+from routes.serializacion import CAMPOS_DISPOSITIVO, columnas, fila_a_dict
+from services.ingesta import leer_filas, ingerir_consumos, TAMANO_LOTE
+from services.cache_estimaciones import estimar_dispositivo, obtener_cache_estimaciones, clave_estimacion
+from services.trabajos import cola_sugerencias, ColaLlena
+from services.groq_cliente import estimar_lote_con_groq, GROQ_MAX_LOTE
+from services.lote_dispositivos import aplicar_operaciones, validar_campos, MAX_OPERACIONES
+from services.dashboard import dashboard_usuario, cache_dashboard, TOP_DEFECTO, TOP_MAXIMO
+from services.cache_pronostico import cache_pronostico
+from services.eventos import relay_eventos
+from services.constantes import DIAS_MES
 
 dispositivo_bp = Blueprint('dispositivos', __name__)
 
-# Clave API de Groq (mejor en variable de entorno)
-GROQ_API_KEY = os.getenv('GROQ_API_KEY', 'tu_clave_aqui')  # Cambiar por tu clave real
-
-# Base de datos estática de dispositivos comunes (fallback)
-DISPOSITIVOS_COMUNES = {
-    # Iluminación
-    "bombilla": {"potencia_watts": 10, "categoria": "Iluminación"},
-    "bombillo": {"potencia_watts": 10, "categoria": "Iluminación"},
-    "led": {"potencia_watts": 10, "categoria": "Iluminación"},
-    "foco": {"potencia_watts": 60, "categoria": "Iluminación"},
-    "lampara": {"potencia_watts": 15, "categoria": "Iluminación"},
-    "luz": {"potencia_watts": 15, "categoria": "Iluminación"},
-    
-    # Climatización
-    "aire acondicionado": {"potencia_watts": 1500, "categoria": "Climatización"},
-    "ac": {"potencia_watts": 1500, "categoria": "Climatización"},
-    "ventilador": {"potencia_watts": 75, "categoria": "Climatización"},
-    "abanico": {"potencia_watts": 75, "categoria": "Climatización"},
-    "calefactor": {"potencia_watts": 1500, "categoria": "Climatización"},
-    
-    # Electrodomésticos
-    "refrigerador": {"potencia_watts": 180, "categoria": "Electrodomésticos"},
-    "refri": {"potencia_watts": 180, "categoria": "Electrodomésticos"},
-    "nevera": {"potencia_watts": 180, "categoria": "Electrodomésticos"},
-    "lavadora": {"potencia_watts": 500, "categoria": "Electrodomésticos"},
-    "secadora": {"potencia_watts": 2000, "categoria": "Electrodomésticos"},
-    "microondas": {"potencia_watts": 1200, "categoria": "Electrodomésticos"},
-    "horno": {"potencia_watts": 2000, "categoria": "Electrodomésticos"},
-    "estufa": {"potencia_watts": 2000, "categoria": "Electrodomésticos"},
-    "plancha": {"potencia_watts": 1200, "categoria": "Electrodomésticos"},
-    "licuadora": {"potencia_watts": 400, "categoria": "Electrodomésticos"},
-    "cafetera": {"potencia_watts": 800, "categoria": "Electrodomésticos"},
-    "tostadora": {"potencia_watts": 1000, "categoria": "Electrodomésticos"},
-    
-    # Electrónica
-    "laptop": {"potencia_watts": 65, "categoria": "Electrónica"},
-    "computadora": {"potencia_watts": 300, "categoria": "Electrónica"},
-    "pc": {"potencia_watts": 300, "categoria": "Electrónica"},
-    "tv": {"potencia_watts": 100, "categoria": "Electrónica"},
-    "televisor": {"potencia_watts": 100, "categoria": "Electrónica"},
-    "television": {"potencia_watts": 100, "categoria": "Electrónica"},
-    "monitor": {"potencia_watts": 40, "categoria": "Electrónica"},
-    "consola": {"potencia_watts": 150, "categoria": "Electrónica"},
-    "playstation": {"potencia_watts": 150, "categoria": "Electrónica"},
-    "xbox": {"potencia_watts": 150, "categoria": "Electrónica"},
-    "celular": {"potencia_watts": 10, "categoria": "Electrónica"},
-    "cargador": {"potencia_watts": 20, "categoria": "Electrónica"},
-    "router": {"potencia_watts": 10, "categoria": "Electrónica"},
-    "impresora": {"potencia_watts": 30, "categoria": "Electrónica"},
-}
+
+def leer_dias(valor):
+    """Días a cotizar: entero positivo (de la query string o del JSON)"""
+    if isinstance(valor, str) and valor.strip().isdigit():
+        valor = int(valor)
+    if isinstance(valor, bool) or not isinstance(valor, int) or valor <= 0:
+        raise ValueError("El campo 'dias' debe ser un entero positivo")
+    return valor
 
 
 def buscar_en_db_estatica(nombre):
     """Busca en la base de datos estática"""
-    nombre_lower = nombre.lower()
-    
-    # Buscar coincidencia exacta o parcial
-    for key, value in DISPOSITIVOS_COMUNES.items():
-        if key in nombre_lower:
-            print(f"✅ Encontrado en BD estática: {key} -> {value}")
-            return value
-    
-    return None
+    # El catálogo se carga con la primera búsqueda, no al arrancar
+    from services.catalogo import buscar_en_catalogo
+    coincidencia = buscar_en_catalogo(nombre)
+    if coincidencia:
+        print(f"✅ Encontrado en BD estática: {coincidencia.clave} -> {coincidencia.valor}")
+    return coincidencia
 
 
-def estimar_con_groq(nombre):
-    """Estima usando Groq API (IA)"""
-    try:
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        prompt = f"""Eres un experto en electrodomésticos y consumo eléctrico.
-
-Para el dispositivo: "{nombre}"
-
-Responde SOLO con un objeto JSON válido en este formato exacto (sin texto adicional):
-{{"potencia_watts": número, "categoria": "categoría"}}
-
-Categorías válidas: Iluminación, Climatización, Electrodomésticos, Electrónica, Otros
-
-Ejemplos de potencias comunes:
-- Bombilla LED: 10W
-- Laptop: 65W  
-- Refrigerador: 180W
-- Aire Acondicionado: 1500W
-- TV: 100W
-- Microondas: 1200W
-
-Si no estás seguro, da una estimación conservadora."""
-        
-        data = {
-            "model": "llama-3.3-70b-versatile",  # Modelo potente y gratis
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.3,
-            "max_tokens": 100
-        }
-        
-        print(f"🤖 Consultando Groq API para: {nombre}")
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
-            
-            # Limpiar posible markdown
-            content = content.replace('```json', '').replace('```', '').strip()
-            
-            print(f"📥 Respuesta de Groq: {content}")
-            
-            # Parsear JSON
-            sugerencia = json.loads(content)
-            
-            # Validar que tenga los campos necesarios
-            if 'potencia_watts' in sugerencia and 'categoria' in sugerencia:
-                print(f"✅ Sugerencia válida de Groq: {sugerencia}")
-                return sugerencia
-            
-        print(f"⚠️ Groq API respondió con status: {response.status_code}")
-        return None
-        
-    except Exception as e:
-        print(f"❌ Error en Groq API: {str(e)}")
-        return None
+# Valores cuando ni el catálogo ni la IA logran estimar
+SUGERENCIA_DEFECTO = {
+    "potencia_watts": None,
+    "categoria": "Otros"
+}
+
+# Tiempo máximo de long-poll sobre un trabajo de sugerencia (segundos). Corto a
+# propósito: cada espera ocupa un hilo del worker gthread
+ESPERA_MAXIMA_TRABAJO = 5
+# Retry-After sugerido mientras el trabajo no termina (segundos)
+REINTENTO_TRABAJO = 1
+
+
+def estimar_o_defecto(nombre):
+    """Consulta la IA (vía cache) y cae a valores por defecto si falla"""
+    print("🤖 No encontrado en BD estática, consultando Groq IA...")
+    sugerencia = estimar_dispositivo(nombre)
+    if not sugerencia:
+        print("⚠️ No se pudo estimar, usando valores por defecto")
+        return {"sugerencia": dict(SUGERENCIA_DEFECTO), "metodo": "defecto"}
+    return {"sugerencia": sugerencia, "metodo": "groq_ia"}
 
 
 # Endpoint para sugerencias (BD estática + Groq IA)
+# Con "asincrono": true la consulta a la IA se encola y se responde 202 con un trabajo_id
 @dispositivo_bp.route('/api/dispositivos/sugerir', methods=['POST'])
 @token_required
 def sugerir_dispositivo(usuario_actual):
@@ -149,122 +75,230 @@ def sugerir_dispositivo(usuario_actual):
     print(f"\n🔍 Buscando sugerencias para: '{nombre}'")
     
     # 1. Primero buscar en BD estática (rápido y gratis)
-    sugerencia = buscar_en_db_estatica(nombre)
-    
-    # 2. Si no encuentra, usar Groq API
-    if not sugerencia:
-        print("🤖 No encontrado en BD estática, consultando Groq IA...")
-        sugerencia = estimar_con_groq(nombre)
-    
-    # 3. Si todo falla, devolver valores por defecto
-    if not sugerencia:
-        print("⚠️ No se pudo estimar, usando valores por defecto")
-        sugerencia = {
-            "potencia_watts": None,
-            "categoria": "Otros"
-        }
-    
+    coincidencia = buscar_en_db_estatica(nombre)
+    if coincidencia:
+        return jsonify({
+            "sugerencia": coincidencia.valor,
+            "metodo": coincidencia.metodo
+        }), 200
+
+    # 2. En modo asíncrono, solo se encola si la IA no está ya en cache
+    if data.get('asincrono'):
+        encontrado, sugerencia = obtener_cache_estimaciones().consultar(nombre)
+        if encontrado and sugerencia:
+            return jsonify({"sugerencia": sugerencia, "metodo": "groq_ia"}), 200
+
+        try:
+            trabajo = cola_sugerencias.encolar(usuario_actual.id, estimar_o_defecto, nombre)
+        except ColaLlena:
+            return jsonify({"error": "Demasiadas sugerencias pendientes, intenta de nuevo"}), 503
+
+        respuesta = jsonify(trabajo.a_dict())
+        respuesta.headers['Location'] = f"/api/dispositivos/sugerir/trabajos/{trabajo.id}"
+        respuesta.headers['Retry-After'] = str(REINTENTO_TRABAJO)
+        return respuesta, 202
+
+    # 3. Modo síncrono: Groq API o valores por defecto
+    return jsonify(estimar_o_defecto(nombre)), 200
+
+
+# Máximo de nombres por petición al endpoint de lote: lo que cabe en un solo
+# prompt, para que una petición nunca encadene varias llamadas al LLM
+MAX_NOMBRES_LOTE = GROQ_MAX_LOTE
+
+
+# Sugerencias para varios dispositivos a la vez (onboarding de un hogar)
+# Catálogo y cache se resuelven localmente; el resto va en un solo prompt a la IA
+@dispositivo_bp.route('/api/dispositivos/sugerir/lote', methods=['POST'])
+@token_required
+def sugerir_dispositivos_lote(usuario_actual):
+    data = request.get_json() or {}
+    nombres = data.get('nombres')
+
+    if not isinstance(nombres, list) or not nombres:
+        return jsonify({"error": "El campo 'nombres' debe ser una lista no vacía"}), 400
+    if len(nombres) > MAX_NOMBRES_LOTE:
+        return jsonify({"error": f"Máximo {MAX_NOMBRES_LOTE} nombres por petición"}), 400
+
+    cache = obtener_cache_estimaciones()
+    resultados = []
+    pendientes = {}  # nombre normalizado -> nombre original (deduplicados)
+    from services.catalogo import buscar_en_catalogo
+
+    for nombre in nombres:
+        nombre = str(nombre or '').strip()
+        item = {"nombre": nombre, "sugerencia": None, "metodo": None}
+        resultados.append(item)
+
+        if len(nombre) < 3:
+            item["error"] = "Nombre muy corto"
+            continue
+
+        coincidencia = buscar_en_catalogo(nombre)
+        if coincidencia:
+            item["sugerencia"], item["metodo"] = coincidencia.valor, coincidencia.metodo
+            continue
+
+        encontrado, sugerencia = cache.consultar(nombre)
+        if encontrado and sugerencia:
+            item["sugerencia"], item["metodo"] = sugerencia, "groq_ia"
+            continue
+
+        pendientes.setdefault(clave_estimacion(nombre), nombre)
+
+    # Una sola llamada al LLM con todos los nombres sin resolver
+    estimaciones = {}
+    if pendientes:
+        claves = list(pendientes)
+        for clave, sugerencia in zip(claves, estimar_lote_con_groq([pendientes[c] for c in claves])):
+            estimaciones[clave] = sugerencia
+            cache.guardar(pendientes[clave], sugerencia)
+
+    for item in resultados:
+        if item["metodo"] or "error" in item:
+            continue
+        sugerencia = estimaciones.get(clave_estimacion(item["nombre"]))
+        if sugerencia:
+            item["sugerencia"], item["metodo"] = sugerencia, "groq_ia"
+        else:
+            item["sugerencia"], item["metodo"] = dict(SUGERENCIA_DEFECTO), "defecto"
+
     return jsonify({
-        "sugerencia": sugerencia,
-        "metodo": "bd_estatica" if nombre.lower() in ' '.join(DISPOSITIVOS_COMUNES.keys()) else "groq_ia"
+        "resultados": resultados,
+        "llamadas_ia": 1 if pendientes else 0,
     }), 200
 
 
+# Estado de un trabajo de sugerencia (?esperar=N hace long-poll hasta N segundos).
+# Mientras no termina responde 202 con Retry-After; al terminar, 200
+@dispositivo_bp.route('/api/dispositivos/sugerir/trabajos/<trabajo_id>', methods=['GET'])
+@token_required
+def estado_trabajo_sugerencia(usuario_actual, trabajo_id):
+    try:
+        esperar = min(float(request.args.get('esperar', 0)), ESPERA_MAXIMA_TRABAJO)
+    except ValueError:
+        return jsonify({"error": "El parámetro 'esperar' debe ser un número"}), 400
+
+    trabajo = cola_sugerencias.obtener(trabajo_id, esperar)
+    if not trabajo or trabajo.usuario_id != usuario_actual.id:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+
+    respuesta = jsonify(trabajo.a_dict())
+    if not trabajo.listo.is_set():
+        respuesta.headers['Retry-After'] = str(REINTENTO_TRABAJO)
+        return respuesta, 202
+    return respuesta, 200
+
+
 # Crear un nuevo dispositivo (actualizado con horas_uso_dia)
 @dispositivo_bp.route('/api/dispositivos', methods=['POST'])
 @token_required
 def crear_dispositivo(usuario_actual):
     data = request.get_json()
-    nombre = data.get('nombre')
-    potencia_watts = data.get('potencia_watts')
-    categoria = data.get('categoria')
-    horas_uso_dia = data.get('horas_uso_dia', 6)  # Default 6 horas
-
-    if not nombre:
-        return jsonify({"error": "El campo 'nombre' es obligatorio"}), 400
-    
-    if not categoria:
-        return jsonify({"error": "El campo 'categoría' es obligatorio"}), 400
-
-    nuevo_dispositivo = Dispositivo(
-        usuario_id=usuario_actual.id,
-        nombre=nombre,
-        potencia_watts=potencia_watts,
-        categoria=categoria,
-        horas_uso_dia=horas_uso_dia
-    )
+    try:
+        # Mismas reglas que las altas del lote; sin horas se asumen 6
+        valores = validar_campos(
+            {c: data.get(c) for c in ('nombre', 'potencia_watts', 'categoria', 'horas_uso_dia')}, crear=True
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    db.session.add(nuevo_dispositivo)
+    # INSERT ... RETURNING: la respuesta sale de la misma sentencia, sin recargar el objeto
+    campos = list(CAMPOS_DISPOSITIVO)
+    fila = db.session.execute(
+        insert(Dispositivo)
+        .values(usuario_id=usuario_actual.id, **valores)
+        .returning(*columnas(CAMPOS_DISPOSITIVO))
+    ).one()
+    db.session.execute(Usuario.tocar_dispositivos(usuario_actual.id))
     db.session.commit()
+    cache_dashboard.invalidar_usuario(usuario_actual.id)
+
+    dispositivo = fila_a_dict(campos, fila)
+    relay_eventos.publicar(usuario_actual.id, "dispositivo_creado", dispositivo)
 
     return jsonify({
         "mensaje": "Dispositivo registrado correctamente",
-        "dispositivo": {
-            "id": nuevo_dispositivo.id,
-            "nombre": nuevo_dispositivo.nombre,
-            "potencia_watts": nuevo_dispositivo.potencia_watts,
-            "categoria": nuevo_dispositivo.categoria,
-            "horas_uso_dia": nuevo_dispositivo.horas_uso_dia
-        }
+        "dispositivo": dispositivo
     }), 201
 
 
-# Listar dispositivos del usuario logueado
+# Listar dispositivos del usuario logueado (paginado por cursor, con proyección de campos y ETag)
 @dispositivo_bp.route('/api/dispositivos', methods=['GET'])
 @token_required
 def listar_dispositivos(usuario_actual):
-    dispositivos = Dispositivo.query.filter_by(usuario_id=usuario_actual.id).all()
+    try:
+        limite, despues_de = parametros_paginacion()
+        campos = campos_solicitados(CAMPOS_DISPOSITIVO, CAMPOS_DISPOSITIVO.keys())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # La versión se lee antes que las filas: un 304 no consulta la lista
+    version = db.session.execute(
+        select(Usuario.version_dispositivos).where(Usuario.id == usuario_actual.id)
+    ).scalar()
+    query = (
+        db.session.query(*columnas(CAMPOS_DISPOSITIVO, campos))
+        .filter(Dispositivo.usuario_id == usuario_actual.id)
+    )
+    consultar = consulta_paginada(query, Dispositivo.id, limite, despues_de).all
+    return responder_lista(version, consultar, campos, limite, despues_de)
 
-    if not dispositivos:
-        return jsonify([]), 200
 
-    resultado = [
-        {
-            "id": d.id,
-            "nombre": d.nombre,
-            "potencia_watts": d.potencia_watts,
-            "categoria": d.categoria,
-            "horas_uso_dia": d.horas_uso_dia if hasattr(d, 'horas_uso_dia') else 6
-        }
-        for d in dispositivos
-    ]
-    return jsonify(resultado), 200
+# Totales, categorías y dispositivos de mayor consumo para el dashboard
+@dispositivo_bp.route('/api/dispositivos/dashboard', methods=['GET'])
+@token_required
+def dashboard_dispositivos(usuario_actual):
+    try:
+        top = int(request.args.get('top', TOP_DEFECTO))
+    except ValueError:
+        return jsonify({"error": "El parámetro 'top' debe ser un número"}), 400
+    if not 1 <= top <= TOP_MAXIMO:
+        return jsonify({"error": f"El parámetro 'top' debe estar entre 1 y {TOP_MAXIMO}"}), 400
+
+    return jsonify(dashboard_usuario(usuario_actual.id, top)), 200
 
 
 # Editar dispositivo
 @dispositivo_bp.route('/api/dispositivos/<int:id>', methods=['PUT'])
 @token_required
 def editar_dispositivo(usuario_actual, id):
-    dispositivo = Dispositivo.query.get(id)
-    
-    if not dispositivo:
-        return jsonify({"error": "Dispositivo no encontrado"}), 404
-    
-    if dispositivo.usuario_id != usuario_actual.id:
-        return jsonify({"error": "No autorizado"}), 403
-    
     data = request.get_json()
-    
-    if 'nombre' in data:
-        dispositivo.nombre = data['nombre']
-    if 'potencia_watts' in data:
-        dispositivo.potencia_watts = data['potencia_watts']
-    if 'categoria' in data:
-        dispositivo.categoria = data['categoria']
-    if 'horas_uso_dia' in data:
-        dispositivo.horas_uso_dia = data['horas_uso_dia']
-    
+    valores = {c: data[c] for c in ('nombre', 'potencia_watts', 'categoria', 'horas_uso_dia') if c in data}
+    try:
+        validar_campos(valores)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # UPDATE ... RETURNING filtrado por dueño: una sola sentencia en el caso normal
+    campos = list(CAMPOS_DISPOSITIVO)
+    filtro = (Dispositivo.id == id, Dispositivo.usuario_id == usuario_actual.id)
+    if valores:
+        consulta = update(Dispositivo).where(*filtro).values(**valores).returning(*columnas(CAMPOS_DISPOSITIVO))
+    else:
+        # Sin cambios: se responde con el estado actual
+        consulta = select(*columnas(CAMPOS_DISPOSITIVO)).where(*filtro)
+    fila = db.session.execute(consulta).one_or_none()
+
+    if fila is None:
+        db.session.rollback()
+        dueno = db.session.execute(select(Dispositivo.usuario_id).where(Dispositivo.id == id)).scalar()
+        if dueno is None:
+            return jsonify({"error": "Dispositivo no encontrado"}), 404
+        return jsonify({"error": "No autorizado"}), 403
+
+    if valores:
+        db.session.execute(Usuario.tocar_dispositivos(usuario_actual.id))
     db.session.commit()
-    
+    cache_dashboard.invalidar_usuario(usuario_actual.id)
+
+    dispositivo = fila_a_dict(campos, fila)
+    if valores:
+        relay_eventos.publicar(usuario_actual.id, "dispositivo_actualizado", dispositivo)
+
     return jsonify({
         "mensaje": "Dispositivo actualizado correctamente",
-        "dispositivo": {
-            "id": dispositivo.id,
-            "nombre": dispositivo.nombre,
-            "potencia_watts": dispositivo.potencia_watts,
-            "categoria": dispositivo.categoria,
-            "horas_uso_dia": dispositivo.horas_uso_dia if hasattr(dispositivo, 'horas_uso_dia') else 6
-        }
+        "dispositivo": dispositivo
     }), 200
 
 
@@ -282,8 +316,144 @@ def eliminar_dispositivo(usuario_actual, id):
     
     nombre = dispositivo.nombre
     db.session.delete(dispositivo)
+    db.session.execute(Usuario.tocar_dispositivos(usuario_actual.id))
     db.session.commit()
+    cache_dashboard.invalidar_usuario(usuario_actual.id)
+    # Los resúmenes se borraron por cascada, sin deltas que avisen a la cache de pronóstico
+    cache_pronostico.invalidar_usuario(usuario_actual.id)
+    relay_eventos.publicar(usuario_actual.id, "dispositivo_eliminado", {"id": id})
     
     return jsonify({
         "mensaje": f"Dispositivo '{nombre}' eliminado correctamente"
-    }), 200
\ No newline at end of file
+    }), 200
+
+
+# Crear, editar y eliminar varios dispositivos en una sola transacción
+@dispositivo_bp.route('/api/dispositivos/lote', methods=['POST'])
+@token_required
+def lote_dispositivos(usuario_actual):
+    data = request.get_json() or {}
+    operaciones = data.get('operaciones')
+
+    if not isinstance(operaciones, list) or not operaciones:
+        return jsonify({"error": "El campo 'operaciones' debe ser una lista no vacía"}), 400
+    if len(operaciones) > MAX_OPERACIONES:
+        return jsonify({"error": f"Máximo {MAX_OPERACIONES} operaciones por lote"}), 400
+
+    try:
+        resultados, afectados = aplicar_operaciones(usuario_actual.id, operaciones, bool(data.get('atomico')))
+    except Exception as e:
+        print(f"❌ Error aplicando lote de dispositivos: {str(e)}")
+        return jsonify({"error": "No se pudo aplicar el lote"}), 500
+
+    if afectados:
+        cache_dashboard.invalidar_usuario(usuario_actual.id)
+        # Los borrados en bloque no pasan por los eventos de la sesión
+        cache_pronostico.invalidar_usuario(usuario_actual.id)
+        relay_eventos.publicar(usuario_actual.id, "dispositivos_lote", [
+            {"op": r["op"], "id": r["id"]} for r in resultados if r["ok"]
+        ])
+
+    fallidas = sum(1 for r in resultados if not r["ok"])
+    return jsonify({
+        "aplicadas": len(resultados) - fallidas,
+        "fallidas": fallidas,
+        "resultados": resultados,
+    }), 200
+
+
+# Ingesta masiva de lecturas de consumo (NDJSON o CSV)
+@dispositivo_bp.route('/api/consumos/ingesta', methods=['POST'])
+@token_required
+def ingerir_consumos_masivo(usuario_actual):
+    content_type = request.mimetype or ''
+    if content_type not in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'text/csv'):
+        return jsonify({"error": "Formato no soportado. Usa application/x-ndjson o text/csv"}), 415
+
+    try:
+        tamano_lote = int(request.args.get('lote', TAMANO_LOTE))
+    except ValueError:
+        return jsonify({"error": "El parámetro 'lote' debe ser un número"}), 400
+    tamano_lote = max(1, min(tamano_lote, 50000))
+
+    # El cuerpo se lee directamente del stream, nunca completo en memoria
+    filas = leer_filas(request.stream, content_type)
+    resultado = ingerir_consumos(usuario_actual.id, filas, tamano_lote)
+
+    print(f"📥 Ingesta usuario {usuario_actual.id}: {resultado['aceptados']} aceptados, {resultado['rechazados']} rechazados")
+
+    status = 400 if "error" in resultado and not resultado["aceptados"] else 200
+    return jsonify(resultado), status
+
+
+# Costo mensual estimado de todos los dispositivos del usuario (una sola pasada)
+@dispositivo_bp.route('/api/dispositivos/costos', methods=['GET'])
+@token_required
+def costos_dispositivos(usuario_actual):
+    # El motor de tarifas (NumPy) se carga con la primera cotización, no al arrancar
+    from services.tarifas import cotizar_dispositivos, tarifa_desde_config
+
+    try:
+        tarifa = tarifa_desde_config(request.args.get('tarifa', 'plana'))
+        dias = leer_dias(request.args.get('dias', DIAS_MES))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filas = (
+        db.session.query(
+            Dispositivo.id, Dispositivo.nombre, Dispositivo.categoria,
+            Dispositivo.potencia_watts, Dispositivo.horas_uso_dia,
+        )
+        .filter(Dispositivo.usuario_id == usuario_actual.id)
+        .order_by(Dispositivo.id)
+        .all()
+    )
+    if not filas:
+        return jsonify({"tarifa": tarifa.tipo, "dispositivos": [], "total_kwh": 0, "total_lps": 0}), 200
+
+    ids, nombres, categorias, potencias, horas = zip(*filas)
+    cotizacion = cotizar_dispositivos(
+        [usuario_actual.id] * len(ids), potencias, horas, tarifa=tarifa, dias=dias, categorias=categorias
+    )
+
+    return jsonify({
+        "tarifa": tarifa.tipo,
+        "dispositivos": [
+            {"id": i, "nombre": n, "consumo_kwh": round(k, 3), "costo_lps": round(c, 2)}
+            for i, n, k, c in zip(ids, nombres, cotizacion["kwh"].tolist(), cotizacion["costo_lps"].tolist())
+        ],
+        "total_kwh": round(float(cotizacion["kwh_usuario"][0]), 3),
+        "total_lps": round(float(cotizacion["costo_usuario"][0]), 2),
+    }), 200
+
+
+# Simulación "¿y si...?": muchos escenarios de cambios en horas/potencia, sin tocar la base
+@dispositivo_bp.route('/api/dispositivos/simular', methods=['POST'])
+@token_required
+def simular_dispositivos(usuario_actual):
+    from services.simulador import simular_escenarios, EscenarioInvalido
+    from services.tarifas import tarifa_desde_config
+
+    data = request.get_json() or {}
+    try:
+        dias = leer_dias(data.get('dias', DIAS_MES))
+        tarifa = tarifa_desde_config(data.get('tarifa', 'plana'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filas = (
+        db.session.query(
+            Dispositivo.id, Dispositivo.nombre, Dispositivo.categoria,
+            Dispositivo.potencia_watts, Dispositivo.horas_uso_dia,
+        )
+        .filter(Dispositivo.usuario_id == usuario_actual.id)
+        .order_by(Dispositivo.id)
+        .all()
+    )
+
+    try:
+        resultado = simular_escenarios(filas, data.get('escenarios'), tarifa, dias, bool(data.get('detalle')))
+    except EscenarioInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"tarifa": tarifa.tipo, "dias": dias, **resultado}), 200
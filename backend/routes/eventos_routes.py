@@ -0,0 +1,18 @@
+from flask import Blueprint, current_app, jsonify
+from routes.auth_middleware import token_required
+from services.eventos import clave_eventos, emitir_ticket
+
+eventos_bp = Blueprint('eventos', __name__)
+
+
+# Ticket de un solo uso para abrir el flujo SSE. El flujo no lo sirve esta API sino el
+# servicio de eventos (eventos/servidor.py), y EventSource no envía el encabezado Authorization
+@eventos_bp.route('/api/eventos/ticket', methods=['POST'])
+@token_required
+def ticket_eventos(usuario_actual):
+    ttl = current_app.config['EVENTOS_TICKET_TTL']
+    return jsonify({
+        "ticket": emitir_ticket(clave_eventos(current_app.config['JWT_SECRET']), usuario_actual.id, ttl),
+        "expira_en": ttl,
+        "url": current_app.config['EVENTOS_URL'],
+    }), 200
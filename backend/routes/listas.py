@@ -0,0 +1,82 @@
+from flask import request, jsonify, Response
+import hashlib
+
+from routes.serializacion import filas_a_dicts
+
+# Límite máximo de filas por página
+LIMITE_MAXIMO = 1000
+
+
+def parametros_paginacion():
+    """
+    Lee `limite` y `despues_de` (cursor = último id recibido) de la query string.
+    Sin `limite` se devuelve la lista completa, como antes.
+    """
+    limite = request.args.get('limite')
+    despues_de = request.args.get('despues_de')
+    try:
+        limite = min(int(limite), LIMITE_MAXIMO) if limite is not None else None
+        despues_de = int(despues_de) if despues_de is not None else None
+    except ValueError:
+        raise ValueError("Los parámetros 'limite' y 'despues_de' deben ser números")
+    if limite is not None and limite < 1:
+        raise ValueError("El parámetro 'limite' debe ser mayor que 0")
+    return limite, despues_de
+
+
+def campos_solicitados(columnas, defecto):
+    """
+    Interpreta `fields=nombre,categoria`. `columnas` mapea nombre -> columna.
+    El id siempre se incluye porque es el cursor de paginación.
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        campos = list(defecto)
+    else:
+        campos = [c.strip() for c in fields.split(',') if c.strip()]
+        desconocidos = [c for c in campos if c not in columnas]
+        if desconocidos:
+            raise ValueError(f"Campos no válidos: {', '.join(desconocidos)}")
+    if 'id' in campos:
+        campos.remove('id')
+    return ['id'] + campos
+
+
+def consulta_paginada(query, columna_id, limite, despues_de):
+    """Aplica la paginación por keyset sobre el id (sin OFFSET)"""
+    if despues_de is not None:
+        query = query.filter(columna_id > despues_de)
+    query = query.order_by(columna_id)
+    if limite is not None:
+        # Una fila extra para saber si existe una página siguiente
+        query = query.limit(limite + 1)
+    return query
+
+
+def responder_lista(version, consultar, campos, limite, despues_de):
+    """
+    Responde la lista con ETag. `version` es un validador barato de los datos
+    (contador o agregado) leído antes que las filas; si el cliente ya tiene esa
+    versión (If-None-Match) se devuelve 304 sin llamar a `consultar`.
+    """
+    huella = hashlib.sha1(repr((campos, limite, despues_de, version)).encode('utf-8'))
+    etag = huella.hexdigest()
+
+    siguiente = None
+    # Comparación débil: la compresión marca el ETag como W/ al cambiar los bytes
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    else:
+        filas = consultar()
+        if limite is not None and len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = filas[-1][0]
+        respuesta = jsonify(filas_a_dicts(campos, filas))
+
+    respuesta.set_etag(etag)
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    if siguiente is not None:
+        respuesta.headers['X-Siguiente-Cursor'] = str(siguiente)
+        respuesta.headers['Access-Control-Expose-Headers'] = 'ETag, X-Siguiente-Cursor'
+    return respuesta
@@ -0,0 +1,47 @@
+from flask import Blueprint, Response
+from routes.auth_middleware import cache_identidad
+from services.dashboard import cache_dashboard
+from services.cache_pronostico import cache_pronostico
+from services.eventos import relay_eventos
+from services.cache_estimaciones import obtener_cache_estimaciones
+from services.metricas import metricas
+from services.trabajos import cola_sugerencias
+from services.purga_usuarios import purga_usuarios
+
+metricas_bp = Blueprint('metricas', __name__)
+
+# Estado de caches y colas, leído en cada scrape
+metricas.registrar_gauge(
+    "powerflow_cache_identidad", "Cache de identidad de token_required",
+    lambda: cache_identidad.estadisticas(),
+)
+metricas.registrar_gauge(
+    "powerflow_cache_estimaciones", "Cache de estimaciones del LLM",
+    lambda: obtener_cache_estimaciones().estadisticas(),
+)
+metricas.registrar_gauge(
+    "powerflow_cache_dashboard", "Cache de agregados del dashboard",
+    lambda: cache_dashboard.estadisticas(),
+)
+metricas.registrar_gauge(
+    "powerflow_cache_pronostico", "Series de consumo en memoria para el pronóstico",
+    lambda: cache_pronostico.estadisticas(),
+)
+metricas.registrar_gauge(
+    "powerflow_eventos", "Eventos enviados al servicio SSE desde este proceso",
+    lambda: relay_eventos.estadisticas(),
+)
+metricas.registrar_gauge(
+    "powerflow_cola_sugerencias", "Cola de trabajos de sugerencia",
+    lambda: {k: v for k, v in cola_sugerencias.estadisticas().items() if not k.startswith('max_')},
+)
+metricas.registrar_gauge(
+    "powerflow_purga_usuarios", "Eliminación de cuentas (directa y por purga en segundo plano)",
+    lambda: purga_usuarios.estadisticas(),
+)
+
+
+# Métricas en formato Prometheus
+@metricas_bp.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,40 @@
+from models.dispositivo import Dispositivo
+from models.usuario import Usuario
+
+# Columnas públicas de cada recurso (las que se pueden pedir con `fields=`)
+CAMPOS_DISPOSITIVO = {
+    "id": Dispositivo.id,
+    "nombre": Dispositivo.nombre,
+    "potencia_watts": Dispositivo.potencia_watts,
+    "categoria": Dispositivo.categoria,
+    "horas_uso_dia": Dispositivo.horas_uso_dia,
+}
+
+CAMPOS_USUARIO = {
+    "id": Usuario.id,
+    "nombre": Usuario.nombre,
+    "correo": Usuario.correo,
+    "fecha_creacion": Usuario.fecha_creacion,
+}
+
+# Campos del usuario que viajan en la respuesta de login
+CAMPOS_SESION = ("id", "nombre", "correo")
+
+
+def columnas(mapa, campos=None):
+    """Columnas a seleccionar para `campos` (por defecto, todas las del mapa)"""
+    return [mapa[c] for c in (campos or mapa)]
+
+
+def fila_a_dict(campos, fila):
+    """Una tupla de columnas (Row) a dict, sin hidratar objetos ORM"""
+    return dict(zip(campos, fila))
+
+
+def filas_a_dicts(campos, filas):
+    return [dict(zip(campos, fila)) for fila in filas]
+
+
+def objeto_a_dict(objeto, campos):
+    """Para los pocos casos donde ya hay un objeto cargado (p. ej. login)"""
+    return {c: getattr(objeto, c) for c in campos}
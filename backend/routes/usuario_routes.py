@@ -1,16 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from extensions import db
+from sqlalchemy import func
 from models.usuario import Usuario
-from werkzeug.security import generate_password_hash, check_password_hash
+from routes.auth_middleware import cache_identidad
+from routes.listas import parametros_paginacion, campos_solicitados, consulta_paginada, responder_lista
+from routes.serializacion import CAMPOS_USUARIO, CAMPOS_SESION, columnas, fila_a_dict, objeto_a_dict
+from services.dashboard import cache_dashboard
+from services.cache_pronostico import cache_pronostico
+from services.eventos import relay_eventos
+from services.hashing import pool_hash, SobrecargaHash
+from services.purga_usuarios import purga_usuarios
 import re
 import jwt
 import datetime
 
 usuario_bp = Blueprint('usuarios', __name__)
 
-# Clave secreta (para firmar el token)
-SECRET_KEY = "powerflow_secret_key_2025"
-
 # Registrar nuevo usuario
 @usuario_bp.route('/api/usuarios', methods=['POST'])
 def crear_usuario():
@@ -44,8 +49,11 @@ def crear_usuario():
     if Usuario.query.filter_by(correo=correo).first():
         return jsonify({"error": "El correo ya está registrado"}), 409
 
-    # Encriptar contraseña
-    password_hash = generate_password_hash(password)
+    # Encriptar contraseña (en el pool de procesos, fuera del GIL de este worker)
+    try:
+        password_hash = pool_hash.generar(password)
+    except SobrecargaHash:
+        return jsonify({"error": "Servidor ocupado, intenta de nuevo"}), 503
 
     nuevo_usuario = Usuario(nombre=nombre, correo=correo, password=password_hash)
     db.session.add(nuevo_usuario)
@@ -54,40 +62,58 @@ def crear_usuario():
     return jsonify({"mensaje": "Usuario creado exitosamente"}), 201
 
 
-# Listar todos los usuarios
+# Listar usuarios (paginado por cursor, con proyección de campos y ETag)
 @usuario_bp.route('/api/usuarios', methods=['GET'])
 def listar_usuarios():
-    usuarios = Usuario.query.all()
-    resultado = [
-        {"id": u.id, "nombre": u.nombre, "correo": u.correo, "fecha_creacion": u.fecha_creacion}
-        for u in usuarios
-    ]
-    return jsonify(resultado), 200
+    try:
+        limite, despues_de = parametros_paginacion()
+        campos = campos_solicitados(CAMPOS_USUARIO, CAMPOS_USUARIO.keys())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    visibles = Usuario.pendiente_eliminacion.is_(False)
+    # Los usuarios no se editan: altas y bajas cambian el conteo, el id o la fecha de creación
+    # máximos desde el cursor. Ese agregado es el ETag; un 304 no consulta la lista.
+    agregado = db.session.query(func.count(Usuario.id), func.max(Usuario.id), func.max(Usuario.fecha_creacion))
+    if despues_de is not None:
+        agregado = agregado.filter(Usuario.id > despues_de)
+    version = tuple(agregado.filter(visibles).one())
+
+    query = db.session.query(*columnas(CAMPOS_USUARIO, campos)).filter(visibles)
+    consultar = consulta_paginada(query, Usuario.id, limite, despues_de).all
+    return responder_lista(version, consultar, campos, limite, despues_de)
 
 
 # Obtener un usuario por ID
 @usuario_bp.route('/api/usuarios/<int:id>', methods=['GET'])
 def obtener_usuario(id):
-    usuario = Usuario.query.get(id)
-    if not usuario:
+    campos = list(CAMPOS_USUARIO)
+    fila = db.session.query(*columnas(CAMPOS_USUARIO)).filter(
+        Usuario.id == id, Usuario.pendiente_eliminacion.is_(False)
+    ).first()
+    if not fila:
         return jsonify({"error": "Usuario no encontrado"}), 404
-    return jsonify({
-        "id": usuario.id,
-        "nombre": usuario.nombre,
-        "correo": usuario.correo,
-        "fecha_creacion": usuario.fecha_creacion
-    }), 200
+    return jsonify(fila_a_dict(campos, fila)), 200
 
 
 # Eliminar usuario por ID
 @usuario_bp.route('/api/usuarios/<int:id>', methods=['DELETE'])
 def eliminar_usuario(id):
     usuario = Usuario.query.get(id)
-    if not usuario:
+    if not usuario or usuario.pendiente_eliminacion:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
-    db.session.delete(usuario)
-    db.session.commit()
+    # La base borra en cascada; las cuentas grandes se purgan en segundo plano
+    estado = purga_usuarios.eliminar(id)
+
+    # Sus tokens dejan de ser válidos de inmediato en este proceso
+    cache_identidad.invalidar_usuario(id)
+    cache_dashboard.invalidar_usuario(id)
+    cache_pronostico.invalidar_usuario(id)
+    relay_eventos.cerrar_usuario(id)
+
+    if estado == "pendiente":
+        return jsonify({"mensaje": "El usuario se está eliminando en segundo plano"}), 202
     return jsonify({"mensaje": "Usuario eliminado correctamente"}), 200
 
 
@@ -109,12 +135,27 @@ def login_usuario():
     # Buscar usuario en la base de datos
     usuario = Usuario.query.filter_by(correo=correo).first()
 
-    if not usuario:
-        return jsonify({"error": "El correo ingresado no está registrado"}), 404
+    # Correo desconocido (o cuenta en eliminación): misma respuesta y latencia que
+    # una contraseña incorrecta, pero sin gastar CPU en un hash
+    if not usuario or usuario.pendiente_eliminacion:
+        pool_hash.simular_verificacion()
+        return jsonify({"error": "Correo o contraseña incorrectos"}), 401
 
     # Verificar contraseña encriptada
-    if not check_password_hash(usuario.password, password):
-        return jsonify({"error": "Contraseña incorrecta"}), 401
+    try:
+        if not pool_hash.verificar(usuario.password, password):
+            return jsonify({"error": "Correo o contraseña incorrectos"}), 401
+    except SobrecargaHash:
+        return jsonify({"error": "Servidor ocupado, intenta de nuevo"}), 503
+
+    # Si el hash usa parámetros viejos, se actualiza aprovechando que tenemos la
+    # contraseña. Es opcional: con el pool ocupado se deja para el próximo inicio
+    if pool_hash.necesita_rehash(usuario.password):
+        try:
+            usuario.password = pool_hash.generar(password)
+            db.session.commit()
+        except SobrecargaHash:
+            print(f"⚠️ Pool de hash ocupado, se omite el rehash del usuario {usuario.id}")
 
     # Generar token JWT válido por 1 hora
     token = jwt.encode({
@@ -122,15 +163,11 @@ def login_usuario():
         'nombre': usuario.nombre,
         'correo': usuario.correo,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
-    }, SECRET_KEY, algorithm='HS256')
+    }, current_app.config['JWT_SECRET'], algorithm='HS256')
 
     # Si todo es correcto, responder con los datos básicos del usuario
     return jsonify({
         "mensaje": "Inicio de sesión exitoso",
         "token": token,
-        "usuario": {
-            "id": usuario.id,
-            "nombre": usuario.nombre,
-            "correo": usuario.correo
-        }
+        "usuario": objeto_a_dict(usuario, CAMPOS_SESION)
     }), 200
@@ -0,0 +1 @@
+# Lógica de dominio compartida entre blueprints, comandos y procesos batch
@@ -0,0 +1,276 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Las estimaciones de potencia casi no cambian: una semana por defecto
+TTL_DEFECTO = 7 * 24 * 3600
+# Si el LLM falla, no reintentar el mismo nombre durante unos minutos
+TTL_FALLO = 5 * 60
+MAX_ENTRADAS_DEFECTO = 50000
+# Cuánto espera una petición el resultado de otra que ya consulta el mismo nombre
+ESPERA_COMPARTIDA_DEFECTO = 15
+# Los aciertos de BackendSQLite marcan su uso en memoria y se escriben juntos
+# cada tantos segundos o usos pendientes (un acierto no abre una transacción)
+INTERVALO_USOS = 30
+MAX_USOS_PENDIENTES = 500
+
+
+def clave_estimacion(nombre):
+    """'Televisor  Samsung' y 'televisor samsung' comparten entrada"""
+    # El catálogo se carga con la primera búsqueda, no al arrancar
+    from services.catalogo import normalizar
+    return ' '.join(normalizar(nombre))
+
+
+class BackendMemoria:
+    """Backend en memoria (por proceso); útil en pruebas"""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, expira, _ = entrada
+            self._datos[clave] = (valor, expira, time.time())
+            return valor, expira
+
+    def guardar(self, clave, valor, expira):
+        with self._lock:
+            self._datos[clave] = (valor, expira, time.time())
+
+    def eliminar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def tamano(self):
+        with self._lock:
+            return len(self._datos)
+
+    def desalojar(self, max_entradas):
+        """Quita expiradas y, si sobra, las menos usadas recientemente"""
+        ahora = time.time()
+        with self._lock:
+            for clave in [c for c, (_, expira, _) in self._datos.items() if expira <= ahora]:
+                del self._datos[clave]
+            sobrantes = len(self._datos) - max_entradas
+            if sobrantes > 0:
+                por_uso = sorted(self._datos.items(), key=lambda item: item[1][2])
+                for clave, _ in por_uso[:sobrantes]:
+                    del self._datos[clave]
+
+
+class BackendSQLite:
+    """Backend persistente en un archivo SQLite propio (sobrevive reinicios y se comparte entre workers)"""
+
+    def __init__(self, ruta, intervalo_usos=INTERVALO_USOS, max_usos_pendientes=MAX_USOS_PENDIENTES):
+        self.ruta = ruta
+        self.intervalo_usos = intervalo_usos
+        self.max_usos_pendientes = max_usos_pendientes
+        self._local = threading.local()
+        # clave -> último uso aún no escrito en `usado`
+        self._usos = {}
+        self._usos_lock = threading.Lock()
+        self._ultima_escritura_usos = time.monotonic()
+        with self._conexion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS estimaciones ("
+                " clave TEXT PRIMARY KEY, valor TEXT, expira REAL NOT NULL, usado REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS ix_estimaciones_usado ON estimaciones (usado)")
+
+    def _conexion(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            con = sqlite3.connect(self.ruta, timeout=5)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def obtener(self, clave):
+        con = self._conexion()
+        fila = con.execute("SELECT valor, expira FROM estimaciones WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        self._marcar_uso(clave)
+        return json.loads(fila[0]), fila[1]
+
+    def _marcar_uso(self, clave):
+        with self._usos_lock:
+            self._usos[clave] = time.time()
+            vencido = time.monotonic() - self._ultima_escritura_usos >= self.intervalo_usos
+            if not vencido and len(self._usos) < self.max_usos_pendientes:
+                return
+        self.escribir_usos()
+
+    def escribir_usos(self):
+        """Vuelca en una sola transacción los usos acumulados desde la última escritura"""
+        with self._usos_lock:
+            usos, self._usos = self._usos, {}
+            self._ultima_escritura_usos = time.monotonic()
+        if usos:
+            with self._conexion() as con:
+                con.executemany(
+                    "UPDATE estimaciones SET usado = MAX(usado, ?) WHERE clave = ?",
+                    [(usado, clave) for clave, usado in usos.items()],
+                )
+
+    def guardar(self, clave, valor, expira):
+        with self._conexion() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO estimaciones (clave, valor, expira, usado) VALUES (?, ?, ?, ?)",
+                (clave, json.dumps(valor), expira, time.time()),
+            )
+
+    def eliminar(self, clave):
+        with self._conexion() as con:
+            con.execute("DELETE FROM estimaciones WHERE clave = ?", (clave,))
+
+    def tamano(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM estimaciones").fetchone()[0]
+
+    def desalojar(self, max_entradas):
+        # El orden por `usado` debe ver los aciertos que aún están en memoria
+        self.escribir_usos()
+        with self._conexion() as con:
+            con.execute("DELETE FROM estimaciones WHERE expira <= ?", (time.time(),))
+            con.execute(
+                "DELETE FROM estimaciones WHERE clave IN ("
+                " SELECT clave FROM estimaciones ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                (max_entradas,),
+            )
+
+
+class _EnVuelo:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+
+
+class CacheEstimaciones:
+    """
+    Cache de estimaciones del LLM por nombre normalizado, con TTL y límite de
+    tamaño. Las peticiones concurrentes por el mismo nombre comparten una sola
+    llamada al LLM (single-flight).
+    """
+
+    def __init__(self, estimador, backend=None, ttl=TTL_DEFECTO, ttl_fallo=TTL_FALLO,
+                 max_entradas=MAX_ENTRADAS_DEFECTO, espera_compartida=ESPERA_COMPARTIDA_DEFECTO):
+        self.estimador = estimador
+        self.backend = backend or BackendMemoria()
+        self.ttl = ttl
+        self.ttl_fallo = ttl_fallo
+        self.max_entradas = max_entradas
+        self.espera_compartida = espera_compartida
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.compartidas = 0
+        self.esperas_agotadas = 0
+
+    def consultar(self, nombre):
+        """Solo lectura: devuelve (encontrado, valor) sin llamar al LLM"""
+        entrada = self.backend.obtener(clave_estimacion(nombre))
+        if entrada is not None and entrada[1] > time.time():
+            return True, entrada[0]
+        return False, None
+
+    def guardar(self, nombre, valor):
+        ttl = self.ttl if valor else self.ttl_fallo
+        self.backend.guardar(clave_estimacion(nombre), valor, time.time() + ttl)
+        with self._lock:
+            self._escrituras += 1
+            # Desalojo amortizado: no en cada escritura
+            desalojar = self._escrituras % 100 == 0
+        if desalojar:
+            self.backend.desalojar(self.max_entradas)
+
+    def obtener(self, nombre):
+        encontrado, valor = self.consultar(nombre)
+        if encontrado:
+            self.aciertos += 1
+            return valor
+
+        clave = clave_estimacion(nombre)
+        with self._lock:
+            vuelo = self._en_vuelo.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_vuelo[clave] = _EnVuelo()
+
+        if not lider:
+            # Otra petición ya está consultando este nombre: esperar su resultado
+            self.compartidas += 1
+            if not vuelo.listo.wait(self.espera_compartida):
+                # El líder sigue colgado del LLM: sin estimación en vez de bloquear el hilo
+                self.esperas_agotadas += 1
+                print(f"⚠️ Estimación de '{nombre}' sin respuesta tras {self.espera_compartida} s")
+                return None
+            return vuelo.valor
+
+        self.fallos += 1
+        try:
+            vuelo.valor = self.estimador(nombre)
+            self.guardar(nombre, vuelo.valor)
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            vuelo.listo.set()
+        return vuelo.valor
+
+    def estadisticas(self):
+        return {
+            "entradas": self.backend.tamano(),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "compartidas": self.compartidas,
+            "esperas_agotadas": self.esperas_agotadas,
+            "en_vuelo": len(self._en_vuelo),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_config = {}
+
+
+def configurar_cache_estimaciones(config):
+    """Guarda la configuración de la app; la cache se crea en el primer uso"""
+    global _cache
+    _config.update(config)
+    _cache = None
+
+
+def obtener_cache_estimaciones():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from services.groq_cliente import estimar_con_groq
+
+                ruta = _config.get('ESTIMACIONES_CACHE_RUTA')
+                backend = BackendSQLite(ruta) if ruta else BackendMemoria()
+                _cache = CacheEstimaciones(
+                    _config.get('ESTIMADOR_LLM') or estimar_con_groq,
+                    backend=backend,
+                    ttl=_config.get('ESTIMACIONES_CACHE_TTL', TTL_DEFECTO),
+                    max_entradas=_config.get('ESTIMACIONES_CACHE_MAX', MAX_ENTRADAS_DEFECTO),
+                    espera_compartida=_config.get('ESTIMACIONES_ESPERA_COMPARTIDA', ESPERA_COMPARTIDA_DEFECTO),
+                )
+    return _cache
+
+
+def estimar_dispositivo(nombre):
+    """Estimación del LLM pasando por la cache compartida"""
+    return obtener_cache_estimaciones().obtener(nombre)
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from datetime import date
+import threading
+import time
+
+from sqlalchemy import select
+
+from extensions import db
+from models.usuario import Usuario
+
+
+def version_telemetria(usuario_id):
+    """Contador que sube el servicio de telemetría al escribir lecturas del usuario"""
+    return db.session.execute(select(Usuario.version_telemetria).where(Usuario.id == usuario_id)).scalar()
+
+
+class CachePronostico:
+    """
+    Cache LRU en proceso de usuario_id -> SerieUsuario, con TTL.
+    Las lecturas nuevas se suman a la serie en memoria (escuchar_deltas), así
+    que un pronóstico solo vuelve a leer la base cuando la serie expira.
+    Como en CacheDashboard, la versión de un usuario solo se lleva mientras
+    tiene cargas en curso. Las lecturas de la telemetría (otro proceso) no
+    pasan por escuchar_deltas: la serie se descarta cuando cambia
+    `usuarios.version_telemetria`, que se lee en cada consulta (una fila por PK).
+    """
+
+    def __init__(self, max_entradas=5000, ttl_segundos=3600):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._series = OrderedDict()
+        self._en_curso = {}  # usuario_id -> [cargas activas, versión]
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.incrementales = 0
+
+    def obtener(self, usuario_id, nombre_tarifa='plana', hoy=None):
+        # El motor (NumPy) se carga con el primer pronóstico, no al arrancar la app
+        from services.pronostico import cargar_serie, pronosticar
+        from services.tarifas import tarifa_desde_config
+
+        hoy = hoy or date.today()
+        tarifa = tarifa_desde_config(nombre_tarifa)
+        # Antes de cargar: si la telemetría escribe durante la carga, la próxima consulta recarga
+        telemetria = version_telemetria(usuario_id)
+        with self._lock:
+            serie = self._series.get(usuario_id)
+            if serie is not None and (
+                time.monotonic() - serie.cargada > self.ttl_segundos
+                or (hoy - serie.fin).days >= len(serie.kwh)
+                or serie.version_telemetria != telemetria
+            ):
+                del self._series[usuario_id]
+                serie = None
+            if serie is not None:
+                self._series.move_to_end(usuario_id)
+                serie.avanzar(hoy)
+                self.aciertos += 1
+                # Sin lecturas nuevas se reutiliza el resultado; si no, se recalcula sobre la serie en memoria
+                if nombre_tarifa not in serie.resultados:
+                    serie.resultados[nombre_tarifa] = pronosticar(serie, tarifa)
+                return serie.resultados[nombre_tarifa]
+            self.fallos += 1
+            en_curso = self._en_curso.setdefault(usuario_id, [0, 0])
+            en_curso[0] += 1
+            version = en_curso[1]
+
+        resultado = None
+        try:
+            serie = cargar_serie(usuario_id, hoy)
+            serie.version_telemetria = telemetria
+            resultado = pronosticar(serie, tarifa)
+        finally:
+            with self._lock:
+                # Si llegaron lecturas mientras se leía la base, la serie puede no incluirlas
+                if resultado is not None and en_curso[1] == version:
+                    serie.resultados[nombre_tarifa] = resultado
+                    self._series[usuario_id] = serie
+                    self._series.move_to_end(usuario_id)
+                    while len(self._series) > self.max_entradas:
+                        self._series.popitem(last=False)
+                en_curso[0] -= 1
+                if not en_curso[0]:
+                    del self._en_curso[usuario_id]
+        return resultado
+
+    def aplicar_deltas(self, deltas):
+        """Oyente de services.resumenes: suma los deltas confirmados a las series en memoria"""
+        with self._lock:
+            for (usuario_id, _, fecha), (_, kwh, costo, lecturas) in deltas.items():
+                if usuario_id in self._en_curso:
+                    self._en_curso[usuario_id][1] += 1
+                serie = self._series.get(usuario_id)
+                if serie is None:
+                    continue
+                if serie.sumar(fecha, kwh, costo, lecturas):
+                    self.incrementales += 1
+                else:
+                    del self._series[usuario_id]
+
+    def invalidar_usuario(self, usuario_id):
+        with self._lock:
+            if usuario_id in self._en_curso:
+                self._en_curso[usuario_id][1] += 1
+            self._series.pop(usuario_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._series.clear()
+            for en_curso in self._en_curso.values():
+                en_curso[1] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._series),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "incrementales": self.incrementales,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0,
+            }
+
+
+cache_pronostico = CachePronostico()
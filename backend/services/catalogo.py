@@ -0,0 +1,195 @@
+from collections import namedtuple
+import re
+import threading
+import unicodedata
+
+# Base de datos estática de dispositivos comunes (fallback)
+DISPOSITIVOS_COMUNES = {
+    # Iluminación
+    "bombilla": {"potencia_watts": 10, "categoria": "Iluminación"},
+    "bombillo": {"potencia_watts": 10, "categoria": "Iluminación"},
+    "led": {"potencia_watts": 10, "categoria": "Iluminación"},
+    "foco": {"potencia_watts": 60, "categoria": "Iluminación"},
+    "lampara": {"potencia_watts": 15, "categoria": "Iluminación"},
+    "luz": {"potencia_watts": 15, "categoria": "Iluminación"},
+    
+    # Climatización
+    "aire acondicionado": {"potencia_watts": 1500, "categoria": "Climatización"},
+    "ac": {"potencia_watts": 1500, "categoria": "Climatización"},
+    "ventilador": {"potencia_watts": 75, "categoria": "Climatización"},
+    "abanico": {"potencia_watts": 75, "categoria": "Climatización"},
+    "calefactor": {"potencia_watts": 1500, "categoria": "Climatización"},
+    
+    # Electrodomésticos
+    "refrigerador": {"potencia_watts": 180, "categoria": "Electrodomésticos"},
+    "refri": {"potencia_watts": 180, "categoria": "Electrodomésticos"},
+    "nevera": {"potencia_watts": 180, "categoria": "Electrodomésticos"},
+    "lavadora": {"potencia_watts": 500, "categoria": "Electrodomésticos"},
+    "secadora": {"potencia_watts": 2000, "categoria": "Electrodomésticos"},
+    "microondas": {"potencia_watts": 1200, "categoria": "Electrodomésticos"},
+    "horno": {"potencia_watts": 2000, "categoria": "Electrodomésticos"},
+    "estufa": {"potencia_watts": 2000, "categoria": "Electrodomésticos"},
+    "plancha": {"potencia_watts": 1200, "categoria": "Electrodomésticos"},
+    "licuadora": {"potencia_watts": 400, "categoria": "Electrodomésticos"},
+    "cafetera": {"potencia_watts": 800, "categoria": "Electrodomésticos"},
+    "tostadora": {"potencia_watts": 1000, "categoria": "Electrodomésticos"},
+    
+    # Electrónica
+    "laptop": {"potencia_watts": 65, "categoria": "Electrónica"},
+    "computadora": {"potencia_watts": 300, "categoria": "Electrónica"},
+    "pc": {"potencia_watts": 300, "categoria": "Electrónica"},
+    "tv": {"potencia_watts": 100, "categoria": "Electrónica"},
+    "televisor": {"potencia_watts": 100, "categoria": "Electrónica"},
+    "television": {"potencia_watts": 100, "categoria": "Electrónica"},
+    "monitor": {"potencia_watts": 40, "categoria": "Electrónica"},
+    "consola": {"potencia_watts": 150, "categoria": "Electrónica"},
+    "playstation": {"potencia_watts": 150, "categoria": "Electrónica"},
+    "xbox": {"potencia_watts": 150, "categoria": "Electrónica"},
+    "celular": {"potencia_watts": 10, "categoria": "Electrónica"},
+    "cargador": {"potencia_watts": 20, "categoria": "Electrónica"},
+    "router": {"potencia_watts": 10, "categoria": "Electrónica"},
+    "impresora": {"potencia_watts": 30, "categoria": "Electrónica"},
+}
+
+# Resultado de una búsqueda en el catálogo
+Coincidencia = namedtuple('Coincidencia', ['clave', 'valor', 'metodo'])
+
+_SEPARADORES = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y separado en tokens alfanuméricos"""
+    sin_acentos = unicodedata.normalize('NFKD', texto)
+    sin_acentos = ''.join(c for c in sin_acentos if not unicodedata.combining(c))
+    return [t for t in _SEPARADORES.split(sin_acentos.lower()) if t]
+
+
+def _variantes(token):
+    """El token y sus formas sin plural ('bombillas' -> 'bombilla', 'televisores' -> 'televisor')"""
+    yield token
+    if len(token) > 3 and token.endswith('s'):
+        yield token[:-1]
+        if token.endswith('ces'):
+            yield token[:-3] + 'z'
+        elif token.endswith('es'):
+            yield token[:-2]
+
+
+def _borrados(token):
+    """Vecindario de borrado a distancia 1 (índice simétrico tipo SymSpell)"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _distancia_max_1(a, b):
+    """True si a y b están a distancia Damerau-Levenshtein <= 1"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        # Sustitución o transposición de dos letras contiguas
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    if la > lb:
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+class IndiceCatalogo:
+    """
+    Índice precompilado del catálogo: un trie de tokens para encontrar la
+    coincidencia más larga en límites de palabra, más un índice de borrados
+    para tolerar errores de escritura de una letra.
+    """
+
+    # Los tokens muy cortos ("ac", "tv") solo se aceptan exactos
+    LONGITUD_MINIMA_APROXIMADA = 4
+
+    def __init__(self, catalogo):
+        self.catalogo = catalogo
+        self.trie = {}
+        self.vocabulario = set()
+        self.borrados = {}
+
+        for clave in catalogo:
+            tokens = normalizar(clave)
+            nodo = self.trie
+            for token in tokens:
+                nodo = nodo.setdefault(token, {})
+                self.vocabulario.add(token)
+            nodo[None] = clave  # Marca de fin de clave
+
+        for token in self.vocabulario:
+            if len(token) >= self.LONGITUD_MINIMA_APROXIMADA:
+                for borrado in _borrados(token) | {token}:
+                    self.borrados.setdefault(borrado, set()).add(token)
+
+    def _mejor_coincidencia(self, tokens):
+        """Recorre el trie desde cada posición y se queda con la clave más larga"""
+        mejor = None
+        mejor_rango = None
+        for inicio in range(len(tokens)):
+            # Cada rama activa es (nodo, caracteres consumidos)
+            ramas = [(self.trie, 0)]
+            for posicion in range(inicio, len(tokens)):
+                siguientes = []
+                for nodo, caracteres in ramas:
+                    for variante in _variantes(tokens[posicion]):
+                        hijo = nodo.get(variante)
+                        if hijo is not None:
+                            siguientes.append((hijo, caracteres + len(variante)))
+                            break
+                if not siguientes:
+                    break
+                for nodo, caracteres in siguientes:
+                    if None in nodo:
+                        # Más tokens gana; a igualdad, más caracteres
+                        rango = (posicion - inicio + 1, caracteres)
+                        if mejor_rango is None or rango > mejor_rango:
+                            mejor, mejor_rango = nodo[None], rango
+                ramas = siguientes
+        return mejor
+
+    def _corregir(self, token):
+        """Corrige un token a una palabra del vocabulario a distancia 1, si es única"""
+        if token in self.vocabulario or len(token) < self.LONGITUD_MINIMA_APROXIMADA:
+            return token
+        candidatos = set()
+        for borrado in _borrados(token) | {token}:
+            candidatos |= self.borrados.get(borrado, set())
+        candidatos = [c for c in candidatos if _distancia_max_1(token, c)]
+        return candidatos[0] if len(candidatos) == 1 else token
+
+    def buscar(self, nombre):
+        tokens = normalizar(nombre)
+        clave = self._mejor_coincidencia(tokens)
+        if clave:
+            return Coincidencia(clave, dict(self.catalogo[clave]), 'bd_estatica')
+
+        corregidos = [self._corregir(t) for t in tokens]
+        if corregidos != tokens:
+            clave = self._mejor_coincidencia(corregidos)
+            if clave:
+                return Coincidencia(clave, dict(self.catalogo[clave]), 'bd_estatica_aproximada')
+        return None
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def indice_catalogo():
+    """Índice compartido, construido una sola vez en el primer uso"""
+    global _indice
+    if _indice is None:
+        with _indice_lock:
+            if _indice is None:
+                _indice = IndiceCatalogo(DISPOSITIVOS_COMUNES)
+    return _indice
+
+
+def buscar_en_catalogo(nombre):
+    return indice_catalogo().buscar(nombre)
@@ -0,0 +1,4 @@
+# Constantes de facturación sin dependencias pesadas: los modelos y la
+# validación las usan sin cargar NumPy (services/tarifas es el motor vectorizado)
+DIAS_MES = 30
+TARIFA_KWH_DEFECTO = 3.7
@@ -0,0 +1,157 @@
+from collections import OrderedDict
+import threading
+import time
+
+from sqlalchemy import func
+
+from extensions import db
+from models.dispositivo import Dispositivo
+from services.constantes import DIAS_MES, TARIFA_KWH_DEFECTO
+
+TOP_DEFECTO = 3
+TOP_MAXIMO = 20
+
+# Misma fórmula que Dispositivo.calcular_consumo_mensual (sin potencia u horas = 0 kWh)
+KWH_MENSUAL = (
+    func.coalesce(Dispositivo.potencia_watts, 0)
+    * func.coalesce(Dispositivo.horas_uso_dia, 0)
+    * DIAS_MES / 1000.0
+)
+CATEGORIA = func.coalesce(Dispositivo.categoria, "Otros")
+
+
+def _redondear(kwh, tarifa_kwh):
+    kwh = float(kwh or 0)
+    return round(kwh, 2), round(kwh * tarifa_kwh, 2)
+
+
+def calcular_dashboard(usuario_id, top=TOP_DEFECTO, tarifa_kwh=TARIFA_KWH_DEFECTO):
+    """Totales, desglose por categoría y top-N de consumo, agregados en SQL"""
+    filtro = Dispositivo.usuario_id == usuario_id
+
+    total, kwh_total, sin_potencia = db.session.query(
+        func.count(Dispositivo.id),
+        func.sum(KWH_MENSUAL),
+        func.count(Dispositivo.id).filter(Dispositivo.potencia_watts.is_(None)),
+    ).filter(filtro).one()
+
+    kwh_categoria = func.sum(KWH_MENSUAL)
+    por_categoria = (
+        db.session.query(CATEGORIA, func.count(Dispositivo.id), kwh_categoria)
+        .filter(filtro)
+        .group_by(CATEGORIA)
+        .order_by(kwh_categoria.desc(), CATEGORIA)
+        .all()
+    )
+
+    kwh = KWH_MENSUAL.label("consumo_kwh")
+    mayores = (
+        db.session.query(Dispositivo.id, Dispositivo.nombre, CATEGORIA, Dispositivo.potencia_watts, kwh)
+        .filter(filtro)
+        .order_by(kwh.desc(), Dispositivo.id)
+        .limit(top)
+        .all()
+    )
+
+    consumo_kwh, costo_lps = _redondear(kwh_total, tarifa_kwh)
+    resultado = {
+        "total_dispositivos": total,
+        "sin_potencia": sin_potencia,
+        "consumo_mensual_kwh": consumo_kwh,
+        "costo_mensual_lps": costo_lps,
+        "por_categoria": [],
+        "top": [],
+    }
+    for categoria, cantidad, k in por_categoria:
+        consumo_kwh, costo_lps = _redondear(k, tarifa_kwh)
+        resultado["por_categoria"].append({
+            "categoria": categoria, "dispositivos": cantidad,
+            "consumo_kwh": consumo_kwh, "costo_lps": costo_lps,
+        })
+    for id_, nombre, categoria, potencia, k in mayores:
+        consumo_kwh, costo_lps = _redondear(k, tarifa_kwh)
+        resultado["top"].append({
+            "id": id_, "nombre": nombre, "categoria": categoria, "potencia_watts": potencia,
+            "consumo_kwh": consumo_kwh, "costo_lps": costo_lps,
+        })
+    return resultado
+
+
+class CacheDashboard:
+    """
+    Cache LRU en proceso de (usuario_id, top) -> dashboard, con TTL.
+    Mientras un usuario tiene cálculos en curso se lleva su versión: un
+    cálculo que empezó antes de una invalidación no puede guardar su
+    resultado viejo. La versión se descarta al terminar el último cálculo,
+    así que solo hay tantas como cálculos simultáneos.
+    """
+
+    def __init__(self, max_entradas=5000, ttl_segundos=300):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._en_curso = {}  # usuario_id -> [cálculos activos, versión]
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, usuario_id, top, calcular):
+        clave = (usuario_id, top)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                valor, expira = entrada
+                if expira > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._entradas[clave]
+            self.fallos += 1
+            en_curso = self._en_curso.setdefault(usuario_id, [0, 0])
+            en_curso[0] += 1
+            version = en_curso[1]
+
+        valor = None
+        try:
+            valor = calcular()
+        finally:
+            with self._lock:
+                if valor is not None and en_curso[1] == version:
+                    self._entradas[clave] = (valor, time.monotonic() + self.ttl_segundos)
+                    self._entradas.move_to_end(clave)
+                    while len(self._entradas) > self.max_entradas:
+                        self._entradas.popitem(last=False)
+                en_curso[0] -= 1
+                if not en_curso[0]:
+                    del self._en_curso[usuario_id]
+        return valor
+
+    def invalidar_usuario(self, usuario_id):
+        with self._lock:
+            if usuario_id in self._en_curso:
+                self._en_curso[usuario_id][1] += 1
+            for clave in [c for c in self._entradas if c[0] == usuario_id]:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            for en_curso in self._en_curso.values():
+                en_curso[1] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0,
+            }
+
+
+cache_dashboard = CacheDashboard()
+
+
+def dashboard_usuario(usuario_id, top=TOP_DEFECTO):
+    return cache_dashboard.obtener(usuario_id, top, lambda: calcular_dashboard(usuario_id, top))
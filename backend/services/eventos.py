@@ -0,0 +1,207 @@
+"""
+Publicación de eventos en vivo hacia el servicio SSE (ver eventos/servidor.py).
+
+Los flujos SSE no se sirven desde gunicorn: cada uno ocuparía un hilo del
+worker mientras está abierto. Los atiende un servicio asyncio aparte, donde
+una conexión inactiva cuesta una corrutina y unos KB. La API y la telemetría
+le envían los eventos por un socket local (un JSON por línea) y el navegador
+se conecta con un ticket firmado que emite la API.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+import base64
+import hashlib
+import hmac
+import json
+import os
+import queue
+import secrets
+import select
+import socket
+import threading
+import time
+
+# Eventos que esperan envío en este proceso; con el servicio caído, lo nuevo se descarta
+MAX_PENDIENTES_DEFECTO = 10000
+# Eventos que el hilo de envío junta en un solo sendall
+MAX_POR_ENVIO = 500
+# Segundos entre intentos de reconexión con el servicio
+REINTENTO_CONEXION = 2
+
+
+def clave_eventos(secreto):
+    """Clave derivada del secreto de los JWT: un ticket no sirve como JWT ni al revés"""
+    return hmac.new(secreto.encode('utf-8'), b'powerflow-eventos', hashlib.sha256).digest()
+
+
+def saludo_relay(clave):
+    """Primera línea que el relay manda al servicio para identificarse"""
+    return hmac.new(clave, b'relay', hashlib.sha256).hexdigest()
+
+
+def _firma(clave, contenido):
+    digest = hmac.new(clave, contenido.encode('ascii'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def emitir_ticket(clave, usuario_id, ttl_segundos):
+    """Ticket 'usuario.expira.nonce.firma' que abre el flujo SSE una sola vez"""
+    contenido = f"{usuario_id}.{int(time.time()) + ttl_segundos}.{secrets.token_urlsafe(16)}"
+    return f"{contenido}.{_firma(clave, contenido)}"
+
+
+def leer_ticket(clave, ticket):
+    """
+    (usuario_id, expira, nonce) si la firma es válida y no venció, o None.
+    Que el nonce no se haya usado ya lo comprueba el servicio, que es quien los canjea.
+    """
+    try:
+        contenido, firma = ticket.rsplit('.', 1)
+        usuario, expira, nonce = contenido.split('.')
+        usuario_id, expira = int(usuario), int(expira)
+        esperada = _firma(clave, contenido)
+    except (AttributeError, ValueError):
+        return None
+    if not hmac.compare_digest(firma, esperada) or expira < time.time():
+        return None
+    return usuario_id, expira, nonce
+
+
+def _por_defecto(objeto):
+    if isinstance(objeto, (date, datetime)):
+        return objeto.isoformat()
+    raise TypeError(f"{type(objeto).__name__} no es serializable")
+
+
+class RelayEventos:
+    """
+    Envía los eventos de este proceso al servicio SSE sin bloquear a quien
+    publica: una cola acotada y un hilo que mantiene la conexión. Si el
+    servicio no está, la cola se llena y lo nuevo se descarta; el cliente SSE
+    pide el estado completo al reconectar.
+    """
+
+    def __init__(self, destino=None, clave=None, max_pendientes=MAX_PENDIENTES_DEFECTO):
+        self.destino = destino  # (host, puerto), o None para no enviar nada
+        self.clave = clave
+        self._cola = queue.Queue(max_pendientes)
+        self._pid = None
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.descartados = 0
+        self.conectado = False
+
+    def _asegurar_hilo(self):
+        # El hilo se crea en el primer uso de cada proceso: los workers de un fork no lo heredan
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._enviar, name='relay-eventos', daemon=True).start()
+
+    def _encolar(self, mensaje):
+        if self.destino is None:
+            return
+        try:
+            linea = json.dumps(mensaje, default=_por_defecto, separators=(',', ':')) + '\n'
+        except (TypeError, ValueError) as e:
+            # El cambio ya se confirmó: un evento que no se puede serializar no tumba la petición
+            print(f"⚠️ Evento '{mensaje.get('tipo')}' no serializable: {str(e)}")
+            return
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(linea.encode('utf-8'))
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+
+    def _enviar(self):
+        conexion = None
+        avisado = False
+        while True:
+            lineas = [self._cola.get()]
+            while len(lineas) < MAX_POR_ENVIO:
+                try:
+                    lineas.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            bloque = b''.join(lineas)
+
+            # El bloque se reintenta hasta entregarlo; mientras tanto la cola absorbe lo nuevo
+            while self.destino is not None:
+                try:
+                    # El servicio nunca escribe: si hay algo que leer es que cerró (p. ej. se reinició)
+                    if conexion is not None and select.select([conexion], [], [], 0)[0]:
+                        conexion.close()
+                        conexion = None
+                    if conexion is None:
+                        conexion = socket.create_connection(self.destino, timeout=5)
+                        conexion.sendall(saludo_relay(self.clave).encode('ascii') + b'\n')
+                        self.conectado, avisado = True, False
+                        print(f"✅ Relay de eventos conectado a {self.destino[0]}:{self.destino[1]}")
+                    conexion.sendall(bloque)
+                    with self._lock:
+                        self.enviados += len(lineas)
+                    break
+                except OSError as e:
+                    if conexion is not None:
+                        conexion.close()
+                        conexion = None
+                    self.conectado = False
+                    if not avisado:
+                        avisado = True
+                        print(f"⚠️ Servicio de eventos no disponible en {self.destino[0]}:{self.destino[1]}: {str(e)}")
+                    time.sleep(REINTENTO_CONEXION)
+
+    def publicar(self, usuario_id, tipo, datos):
+        """Encola el evento para las conexiones SSE del usuario (no bloquea)"""
+        self._encolar({"usuario_id": usuario_id, "tipo": tipo, "datos": datos})
+
+    def publicar_deltas(self, deltas):
+        """Oyente de services.resumenes: avisa las lecturas nuevas por usuario y fecha"""
+        por_usuario = defaultdict(lambda: defaultdict(lambda: [0.0, 0.0, 0]))
+        for (usuario_id, dispositivo_id, fecha), (_, kwh, costo, lecturas) in deltas.items():
+            acumulado = por_usuario[usuario_id][(dispositivo_id, fecha)]
+            acumulado[0] += kwh
+            acumulado[1] += costo
+            acumulado[2] += lecturas
+        for usuario_id, cambios in por_usuario.items():
+            self.publicar(usuario_id, "consumos", [
+                {
+                    "dispositivo_id": dispositivo_id,
+                    "fecha": fecha.isoformat(),
+                    "consumo_kwh": round(kwh, 3),
+                    "costo_lps": round(costo, 2),
+                    "lecturas": lecturas,
+                }
+                for (dispositivo_id, fecha), (kwh, costo, lecturas) in cambios.items()
+            ])
+
+    def cerrar_usuario(self, usuario_id):
+        """Pide al servicio cerrar los flujos abiertos del usuario (cuenta eliminada)"""
+        self._encolar({"usuario_id": usuario_id, "cerrar": True})
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "enviados": self.enviados,
+                "descartados": self.descartados,
+                "pendientes": self._cola.qsize(),
+                "conectado": int(self.conectado),
+            }
+
+
+relay_eventos = RelayEventos()
+
+
+def configurar_relay_eventos(destino, secreto):
+    """
+    Ajusta el relay existente (los módulos ya lo importaron). `destino` es
+    'host:puerto' del servicio de eventos, o vacío para no enviar eventos.
+    """
+    if destino:
+        host, _, puerto = destino.rpartition(':')
+        relay_eventos.destino = (host or '127.0.0.1', int(puerto))
+    else:
+        relay_eventos.destino = None
+    relay_eventos.clave = clave_eventos(secreto)
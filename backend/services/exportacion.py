@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from extensions import db
+from models.consumo import Consumo
+from models.dispositivo import Dispositivo
+
+# Filas que el cursor trae de la base por vez
+FILAS_POR_LECTURA = 2000
+# Filas que se serializan juntas en cada fragmento enviado al cliente
+FILAS_POR_FRAGMENTO = 500
+
+COLUMNAS_EXPORTACION = ('id', 'dispositivo_id', 'dispositivo', 'fecha', 'horas_uso', 'consumo_kwh', 'costo_lps')
+
+
+def consulta_exportacion(usuario_id, desde=None, hasta=None, dispositivo_id=None, despues_de=None):
+    """Lecturas del usuario ordenadas por id (el id es el cursor para reanudar)"""
+    consulta = (
+        select(
+            Consumo.id, Consumo.dispositivo_id, Dispositivo.nombre, Consumo.fecha,
+            Consumo.horas_uso, Consumo.consumo_kwh, Consumo.costo_lps,
+        )
+        .join(Dispositivo, Dispositivo.id == Consumo.dispositivo_id)
+        .where(Dispositivo.usuario_id == usuario_id)
+        .order_by(Consumo.id)
+    )
+    if dispositivo_id is not None:
+        consulta = consulta.where(Consumo.dispositivo_id == dispositivo_id)
+    if desde is not None:
+        consulta = consulta.where(Consumo.fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.where(Consumo.fecha <= hasta)
+    if despues_de is not None:
+        consulta = consulta.where(Consumo.id > despues_de)
+    return consulta
+
+
+def _fragmentos(consulta):
+    """Listas de filas de tamaño acotado, leídas con un cursor del lado del servidor"""
+    resultado = db.session.execute(consulta.execution_options(yield_per=FILAS_POR_LECTURA))
+    for particion in resultado.partitions(FILAS_POR_FRAGMENTO):
+        yield particion
+
+
+def generar_csv(consulta, encabezado=True):
+    """Sin `encabezado` (al reanudar) las filas se pueden anexar al archivo ya descargado"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if encabezado:
+        escritor.writerow(COLUMNAS_EXPORTACION)
+        yield buffer.getvalue()
+    for filas in _fragmentos(consulta):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows((i, d, n, f.isoformat(), h, k, c) for i, d, n, f, h, k, c in filas)
+        yield buffer.getvalue()
+
+
+def generar_ndjson(consulta):
+    for filas in _fragmentos(consulta):
+        yield ''.join(
+            json.dumps(dict(zip(COLUMNAS_EXPORTACION, (i, d, n, f.isoformat(), h, k, c))), ensure_ascii=False) + '\n'
+            for i, d, n, f, h, k, c in filas
+        )
+
+
+def comprimir_gzip(fragmentos, nivel=6):
+    """gzip al vuelo: cada fragmento sale comprimido en cuanto se genera"""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # 31 = formato gzip
+    for fragmento in fragmentos:
+        datos = compresor.compress(fragmento.encode('utf-8'))
+        # SYNC_FLUSH: el cliente puede descomprimir lo recibido sin esperar al final
+        datos += compresor.flush(zlib.Z_SYNC_FLUSH)
+        yield datos
+    yield compresor.flush()
+
+
+def codificar(fragmentos):
+    for fragmento in fragmentos:
+        yield fragmento.encode('utf-8')
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+
+from services.metricas import medir_externa
+
+# Clave API de Groq (mejor en variable de entorno)
+GROQ_API_KEY = os.getenv('GROQ_API_KEY', 'tu_clave_aqui')  # Cambiar por tu clave real
+
+# La URL se puede apuntar a un servidor LLM local (p. ej. un stub en pruebas)
+GROQ_API_URL = os.getenv('GROQ_API_URL', "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODELO = os.getenv('GROQ_MODELO', "llama-3.3-70b-versatile")
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', 10))
+
+# Máximo de llamadas simultáneas al LLM desde este proceso
+GROQ_CONCURRENCIA = int(os.getenv('GROQ_CONCURRENCIA', 4))
+# Cuánto espera una llamada un lugar libre; si el LLM está colgado, las
+# peticiones no se encolan detrás sin límite y caen al valor por defecto
+GROQ_ESPERA_CONCURRENCIA = float(os.getenv('GROQ_ESPERA_CONCURRENCIA', 5))
+_limite_llamadas = threading.BoundedSemaphore(GROQ_CONCURRENCIA)
+
+
+def _requests():
+    """`requests` tarda en importarse y solo se usa al llamar al LLM: se carga en la primera llamada"""
+    import requests
+    return requests
+
+
+def configurar_concurrencia(maximo):
+    global _limite_llamadas
+    _limite_llamadas = threading.BoundedSemaphore(maximo)
+
+
+def _consultar_groq(prompt, temperatura, max_tokens, timeout=GROQ_TIMEOUT):
+    """
+    Una llamada a la API de chat de Groq con el límite de concurrencia y la
+    métrica de latencia. Devuelve el texto de la respuesta o None si el
+    status no es 200 o no hubo lugar en GROQ_ESPERA_CONCURRENCIA segundos;
+    los errores de red o de formato se propagan.
+    """
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": GROQ_MODELO,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperatura,
+        "max_tokens": max_tokens
+    }
+    limite = _limite_llamadas
+    if not limite.acquire(timeout=GROQ_ESPERA_CONCURRENCIA):
+        print(f"⚠️ Groq saturado: sin lugar tras {GROQ_ESPERA_CONCURRENCIA} s")
+        return None
+    try:
+        with medir_externa("groq"):
+            response = _requests().post(GROQ_API_URL, headers=headers, json=data, timeout=timeout)
+    finally:
+        limite.release()
+
+    if response.status_code != 200:
+        print(f"⚠️ Groq API respondió con status: {response.status_code}")
+        return None
+    return response.json()['choices'][0]['message']['content'].strip()
+
+
+def _json_de_respuesta(content):
+    """Parsea la respuesta quitando el posible bloque markdown"""
+    return json.loads(content.replace('```json', '').replace('```', '').strip())
+
+
+def estimar_con_groq(nombre):
+    """Estima usando Groq API (IA)"""
+    try:
+        prompt = f"""Eres un experto en electrodomésticos y consumo eléctrico.
+
+Para el dispositivo: "{nombre}"
+
+Responde SOLO con un objeto JSON válido en este formato exacto (sin texto adicional):
+{{"potencia_watts": número, "categoria": "categoría"}}
+
+Categorías válidas: Iluminación, Climatización, Electrodomésticos, Electrónica, Otros
+
+Ejemplos de potencias comunes:
+- Bombilla LED: 10W
+- Laptop: 65W  
+- Refrigerador: 180W
+- Aire Acondicionado: 1500W
+- TV: 100W
+- Microondas: 1200W
+
+Si no estás seguro, da una estimación conservadora."""
+
+        print(f"🤖 Consultando Groq API para: {nombre}")
+        content = _consultar_groq(prompt, temperatura=0.3, max_tokens=100)
+        if content is None:
+            return None
+
+        print(f"📥 Respuesta de Groq: {content}")
+        sugerencia = _json_de_respuesta(content)
+
+        # Validar que tenga los campos necesarios
+        if isinstance(sugerencia, dict) and 'potencia_watts' in sugerencia and 'categoria' in sugerencia:
+            print(f"✅ Sugerencia válida de Groq: {sugerencia}")
+            return sugerencia
+
+        print(f"⚠️ Respuesta de Groq sin los campos esperados: {content}")
+        return None
+
+    except Exception as e:
+        print(f"❌ Error en Groq API: {str(e)}")
+        return None
+
+
+# Máximo de nombres por prompt en las consultas por lote
+GROQ_MAX_LOTE = int(os.getenv('GROQ_MAX_LOTE', 50))
+GROQ_TIMEOUT_LOTE = float(os.getenv('GROQ_TIMEOUT_LOTE', 30))
+
+
+def estimar_lote_con_groq(nombres):
+    """
+    Estima varios dispositivos con una sola llamada a Groq.
+    Devuelve una lista alineada con `nombres` (None donde no hubo estimación válida).
+    """
+    if not nombres:
+        return []
+    try:
+        listado = '\n'.join(f'- "{nombre}"' for nombre in nombres)
+        prompt = f"""Eres un experto en electrodomésticos y consumo eléctrico.
+
+Para cada uno de estos {len(nombres)} dispositivos, en el mismo orden:
+{listado}
+
+Responde SOLO con un arreglo JSON válido de {len(nombres)} objetos en este formato exacto (sin texto adicional):
+[{{"potencia_watts": número, "categoria": "categoría"}}, ...]
+
+Categorías válidas: Iluminación, Climatización, Electrodomésticos, Electrónica, Otros
+
+Ejemplos de potencias comunes:
+- Bombilla LED: 10W
+- Laptop: 65W
+- Refrigerador: 180W
+- Aire Acondicionado: 1500W
+- TV: 100W
+- Microondas: 1200W
+
+Si no estás seguro, da una estimación conservadora."""
+
+        print(f"🤖 Consultando Groq API por lote de {len(nombres)} dispositivos")
+        content = _consultar_groq(prompt, temperatura=0.3, max_tokens=40 * len(nombres) + 50,
+                                  timeout=GROQ_TIMEOUT_LOTE)
+        if content is None:
+            return [None] * len(nombres)
+
+        sugerencias = _json_de_respuesta(content)
+
+        if not isinstance(sugerencias, list) or len(sugerencias) != len(nombres):
+            print(f"⚠️ Groq devolvió {len(sugerencias) if isinstance(sugerencias, list) else 'algo distinto a'} elementos para {len(nombres)} nombres")
+            return [None] * len(nombres)
+
+        return [
+            s if isinstance(s, dict) and 'potencia_watts' in s and 'categoria' in s else None
+            for s in sugerencias
+        ]
+
+    except Exception as e:
+        print(f"❌ Error en Groq API (lote): {str(e)}")
+        return [None] * len(nombres)
+
+
+def redactar_consejo_con_groq(oportunidad):
+    """
+    Redacta un consejo de ahorro personalizado a partir de una oportunidad
+    calculada por las reglas (services/reglas_ahorro.py). Devuelve el texto o None.
+    """
+    try:
+        prompt = f"""Eres un asesor de ahorro de energía en Honduras.
+
+Dispositivo: "{oportunidad['nombre']}" ({oportunidad['categoria']})
+Potencia: {oportunidad['potencia_watts']} W, uso diario: {oportunidad['horas_uso_dia']} horas
+Recomendación base: {oportunidad['mensaje']}
+Ahorro estimado: {oportunidad['ahorro_kwh']} kWh y L {oportunidad['ahorro_lps']} al mes
+
+Escribe UN consejo breve (máximo 2 oraciones) en español, concreto y amable,
+que incluya el ahorro estimado en Lempiras. Responde solo con el texto del consejo."""
+
+        content = _consultar_groq(prompt, temperatura=0.5, max_tokens=120)
+        if content is None:
+            return None
+
+        content = content.strip('"')
+        # Si el modelo no siguió el formato se usa el mensaje de la regla
+        if not content or len(content) > 600 or content.startswith(('{', '[', '```')):
+            return None
+        return content
+
+    except Exception as e:
+        print(f"❌ Error en Groq API (consejo): {str(e)}")
+        return None
@@ -0,0 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Método y factor de trabajo de werkzeug (p. ej. 'scrypt:32768:8:1' o 'pbkdf2:sha256:600000')
+METODO_DEFECTO = 'scrypt:32768:8:1'
+
+# Espera del camino de correo desconocido antes de haber medido una verificación real
+ESPERA_INICIAL = 0.1
+
+
+class SobrecargaHash(Exception):
+    """Demasiadas operaciones de hash en espera"""
+
+
+class PoolHash:
+    """
+    Ejecuta generate/check_password_hash en un pool de procesos acotado, para
+    que el trabajo de CPU no retenga el GIL del worker que atiende peticiones.
+    Con procesos=0 todo se ejecuta en línea.
+    """
+
+    def __init__(self, procesos=2, max_pendientes=64, metodo=METODO_DEFECTO, espera_maxima=10):
+        self.procesos = procesos
+        self.metodo = metodo
+        self.espera_maxima = espera_maxima
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Media móvil del tiempo de verificación, para igualar el camino de correo desconocido
+        self._media_verificacion = None
+        self._media_lock = threading.Lock()
+
+    def _ejecutar(self, funcion, *args):
+        if not self.procesos:
+            return funcion(*args)
+
+        if not self._cupos.acquire(timeout=self.espera_maxima):
+            raise SobrecargaHash()
+        try:
+            try:
+                return self._pool_activo().submit(funcion, *args).result()
+            except BrokenProcessPool:
+                # Un proceso murió (OOM, kill): se recrea el pool y se reintenta una vez
+                print("⚠️ Pool de hash roto, recreándolo")
+                with self._pool_lock:
+                    self._pool = None
+                return self._pool_activo().submit(funcion, *args).result()
+        finally:
+            self._cupos.release()
+
+    def _pool_activo(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: hacer fork de un proceso con hilos no es seguro
+                    contexto = multiprocessing.get_context('spawn')
+                    self._pool = ProcessPoolExecutor(max_workers=self.procesos, mp_context=contexto)
+        return self._pool
+
+    def generar(self, password):
+        return self._ejecutar(generate_password_hash, password, self.metodo)
+
+    def verificar(self, password_hash, password):
+        inicio = time.perf_counter()
+        resultado = self._ejecutar(check_password_hash, password_hash, password)
+        duracion = time.perf_counter() - inicio
+        with self._media_lock:
+            if self._media_verificacion is None:
+                self._media_verificacion = duracion
+            else:
+                self._media_verificacion = 0.8 * self._media_verificacion + 0.2 * duracion
+        return resultado
+
+    def simular_verificacion(self):
+        """
+        Camino barato para correos desconocidos: espera lo que tarda una
+        verificación típica sin gastar CPU, así la latencia no revela si existe
+        """
+        with self._media_lock:
+            espera = self._media_verificacion
+        time.sleep(espera if espera is not None else ESPERA_INICIAL)
+
+    def necesita_rehash(self, password_hash):
+        """True si el hash guardado usa otro método o factor de trabajo que el configurado"""
+        return password_hash.split('$', 1)[0] != self.metodo
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+pool_hash = PoolHash()
+
+
+def configurar_pool_hash(procesos, max_pendientes, metodo):
+    """Ajusta el pool compartido (los módulos ya tienen referencia a `pool_hash`)"""
+    pool_hash.cerrar()
+    pool_hash.procesos = procesos
+    pool_hash.metodo = metodo
+    pool_hash._cupos = threading.BoundedSemaphore(max_pendientes)
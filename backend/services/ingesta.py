@@ -0,0 +1,221 @@
+import csv
+import itertools
+import json
+import math
+from datetime import date
+
+from sqlalchemy import insert
+
+from extensions import db
+from models.consumo import Consumo
+from models.dispositivo import Dispositivo
+from services.lote_dispositivos import es_id
+from services.resumenes import aplicar_deltas, deltas_de_filas, notificar_deltas
+from services.constantes import TARIFA_KWH_DEFECTO
+
+# Filas por transacción: suficientemente grande para amortizar el commit,
+# suficientemente pequeño para mantener la memoria acotada
+TAMANO_LOTE = 5000
+
+# Máximo de errores detallados que se reportan por lote
+MAX_ERRORES_POR_LOTE = 20
+
+# Una lectura ocupa menos de 200 bytes; una línea más larga que esto no es una
+# lectura y no se lee completa a memoria
+MAX_LINEA_BYTES = 4096
+
+
+class LineaDemasiadoLarga(Exception):
+    pass
+
+
+def _lineas(stream):
+    """Genera (numero_linea, texto) leyendo como mucho MAX_LINEA_BYTES por línea"""
+    for numero in itertools.count(1):
+        linea = stream.readline(MAX_LINEA_BYTES + 1)
+        if not linea:
+            return
+        if len(linea) > MAX_LINEA_BYTES:
+            raise LineaDemasiadoLarga(f"La línea {numero} supera {MAX_LINEA_BYTES} bytes")
+        # '\n' nunca aparece dentro de un carácter UTF-8 multibyte
+        yield numero, linea.decode('utf-8')
+
+
+def _leer_ndjson(stream):
+    """Genera (numero_linea, dict) leyendo NDJSON línea por línea"""
+    for numero, linea in _lineas(stream):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError:
+            yield numero, None
+            continue
+        yield numero, fila if isinstance(fila, dict) else None
+
+
+def _leer_csv(stream):
+    """Genera (numero_linea, dict) leyendo CSV con encabezado"""
+    # Las líneas ya vienen acotadas; un campo entre comillas que abarca varias
+    # líneas lo acota csv.field_size_limit()
+    lector = csv.DictReader(linea for _, linea in _lineas(stream))
+    for fila in lector:
+        yield lector.line_num, fila
+
+
+def leer_filas(stream, content_type):
+    """Parsea el stream binario de la petición de forma incremental"""
+    if 'csv' in (content_type or ''):
+        return _leer_csv(stream)
+    return _leer_ndjson(stream)
+
+
+def _a_id(valor):
+    # JSON trae un entero y CSV un texto de dígitos; true o 1.9 no son el dispositivo 1
+    if es_id(valor):
+        return valor
+    if isinstance(valor, str) and valor.isascii() and valor.strip().isdigit():
+        return int(valor)
+    raise ValueError("'dispositivo_id' inválido")
+
+
+def _a_float(valor):
+    if valor is None or valor == '':
+        return None
+    numero = float(valor)
+    # float() acepta 'nan' e 'inf', y json.loads acepta NaN e Infinity
+    if not math.isfinite(numero):
+        raise ValueError(f"Valor no finito: {valor!r}")
+    return numero
+
+
+def normalizar_fila(fila, potencias):
+    """
+    Valida una lectura y la convierte en un dict listo para insertar.
+    `potencias` mapea dispositivo_id -> potencia_watts de los dispositivos del usuario.
+    Lanza ValueError con el motivo si la fila no es válida.
+    """
+    if fila is None:
+        raise ValueError("Fila mal formada")
+
+    dispositivo_id = _a_id(fila.get('dispositivo_id'))
+
+    if dispositivo_id not in potencias:
+        raise ValueError(f"Dispositivo {dispositivo_id} no pertenece al usuario")
+
+    try:
+        horas_uso = _a_float(fila.get('horas_uso'))
+        consumo_kwh = _a_float(fila.get('consumo_kwh'))
+        costo_lps = _a_float(fila.get('costo_lps'))
+    except (TypeError, ValueError):
+        raise ValueError("Valores numéricos inválidos")
+
+    if horas_uso is None or horas_uso < 0 or horas_uso > 24:
+        raise ValueError("'horas_uso' debe estar entre 0 y 24")
+    if consumo_kwh is not None and consumo_kwh < 0:
+        raise ValueError("'consumo_kwh' no puede ser negativo")
+    if costo_lps is not None and costo_lps < 0:
+        raise ValueError("'costo_lps' no puede ser negativo")
+
+    fecha_txt = fila.get('fecha')
+    try:
+        fecha = date.fromisoformat(fecha_txt) if fecha_txt else date.today()
+    except (TypeError, ValueError):
+        raise ValueError("'fecha' debe tener formato YYYY-MM-DD")
+
+    # Si el medidor no manda kWh o costo, se estiman igual que en Dispositivo
+    if consumo_kwh is None:
+        potencia = potencias[dispositivo_id] or 0
+        consumo_kwh = potencia * horas_uso / 1000
+    if costo_lps is None:
+        costo_lps = consumo_kwh * TARIFA_KWH_DEFECTO
+
+    return {
+        "dispositivo_id": dispositivo_id,
+        "fecha": fecha,
+        "horas_uso": horas_uso,
+        "consumo_kwh": consumo_kwh,
+        "costo_lps": costo_lps,
+    }
+
+
+def _insertar_lote(usuario_id, filas):
+    """Inserta un lote completo y actualiza los resúmenes en una sola transacción"""
+    db.session.execute(insert(Consumo), filas)
+    deltas = deltas_de_filas(usuario_id, filas)
+    aplicar_deltas(db.session.connection(), deltas)
+    notificar_deltas(db.session, deltas)
+    db.session.commit()
+
+
+def ingerir_consumos(usuario_id, filas, tamano_lote=TAMANO_LOTE):
+    """
+    Consume un iterable de (numero_linea, dict), valida la propiedad de cada
+    dispositivo e inserta en lotes. Nunca mantiene más de un lote en memoria.
+    """
+    # Una sola consulta para conocer los dispositivos del usuario
+    potencias = dict(
+        db.session.query(Dispositivo.id, Dispositivo.potencia_watts)
+        .filter(Dispositivo.usuario_id == usuario_id)
+        .all()
+    )
+
+    lotes = []
+    total_aceptados = 0
+    total_rechazados = 0
+
+    pendientes = []
+    rechazados = 0
+    errores = []
+
+    def cerrar_lote():
+        nonlocal pendientes, rechazados, errores, total_aceptados, total_rechazados
+        aceptados = len(pendientes)
+        if pendientes:
+            try:
+                _insertar_lote(usuario_id, pendientes)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error insertando lote {len(lotes) + 1}: {str(e)}")
+                rechazados += aceptados
+                errores.append({"linea": None, "error": "Error de base de datos al insertar el lote"})
+                aceptados = 0
+
+        lotes.append({
+            "lote": len(lotes) + 1,
+            "aceptados": aceptados,
+            "rechazados": rechazados,
+            "errores": errores,
+        })
+        total_aceptados += aceptados
+        total_rechazados += rechazados
+        pendientes, rechazados, errores = [], 0, []
+
+    error_lectura = None
+    try:
+        for numero, fila in filas:
+            try:
+                pendientes.append(normalizar_fila(fila, potencias))
+            except ValueError as e:
+                rechazados += 1
+                if len(errores) < MAX_ERRORES_POR_LOTE:
+                    errores.append({"linea": numero, "error": str(e)})
+
+            if len(pendientes) + rechazados >= tamano_lote:
+                cerrar_lote()
+    except (csv.Error, UnicodeDecodeError, LineaDemasiadoLarga) as e:
+        # El cuerpo se corrompió a mitad de camino: se guarda lo ya validado
+        error_lectura = f"Cuerpo ilegible: {str(e)}"
+
+    if pendientes or rechazados:
+        cerrar_lote()
+
+    resultado = {
+        "aceptados": total_aceptados,
+        "rechazados": total_rechazados,
+        "lotes": lotes,
+    }
+    if error_lectura:
+        resultado["error"] = error_lectura
+    return resultado
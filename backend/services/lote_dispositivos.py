@@ -0,0 +1,168 @@
+import math
+
+from sqlalchemy import delete, insert, select, update
+
+from extensions import db
+from models.dispositivo import Dispositivo
+from models.usuario import Usuario
+
+MAX_OPERACIONES = 1000
+CAMPOS_EDITABLES = ('nombre', 'potencia_watts', 'categoria', 'horas_uso_dia')
+HORAS_USO_DEFECTO = 6
+# Longitudes de las columnas de Dispositivo
+MAX_NOMBRE = 100
+MAX_CATEGORIA = 50
+
+
+class OperacionInvalida(ValueError):
+    pass
+
+
+def es_id(valor):
+    # Los bool de JSON son int para Python: true no es el dispositivo 1
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _numero(valores, campo, minimo, maximo=None):
+    valor = valores[campo]
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+        raise OperacionInvalida(f"El campo '{campo}' debe ser numérico")
+    if valor < minimo or (maximo is not None and valor > maximo):
+        rango = f"entre {minimo} y {maximo}" if maximo is not None else f"mayor o igual a {minimo}"
+        raise OperacionInvalida(f"El campo '{campo}' debe estar {rango}")
+
+
+def validar_campos(valores, crear=False):
+    """
+    Valida los campos de un dispositivo antes de escribirlos (alta o edición,
+    individual o en lote). Al crear completa `horas_uso_dia` con el valor por
+    defecto. Lanza OperacionInvalida con el motivo.
+    """
+    if crear:
+        if not valores.get('nombre'):
+            raise OperacionInvalida("El campo 'nombre' es obligatorio")
+        if not valores.get('categoria'):
+            raise OperacionInvalida("El campo 'categoría' es obligatorio")
+        if valores.get('horas_uso_dia') is None:
+            valores['horas_uso_dia'] = HORAS_USO_DEFECTO
+
+    for campo, maximo in (('nombre', MAX_NOMBRE), ('categoria', MAX_CATEGORIA)):
+        if campo in valores:
+            valor = valores[campo]
+            if not isinstance(valor, str) or not valor.strip():
+                raise OperacionInvalida(f"El campo '{campo}' no puede quedar vacío")
+            if len(valor) > maximo:
+                raise OperacionInvalida(f"El campo '{campo}' admite máximo {maximo} caracteres")
+    # La potencia es opcional (sin estimación); las horas no
+    if valores.get('potencia_watts') is not None:
+        _numero(valores, 'potencia_watts', 0)
+    if 'horas_uso_dia' in valores:
+        _numero(valores, 'horas_uso_dia', 0, 24)
+    return valores
+
+
+def _validar(operacion, propios):
+    """Devuelve (tipo, id, valores) o lanza OperacionInvalida"""
+    if not isinstance(operacion, dict):
+        raise OperacionInvalida("La operación debe ser un objeto")
+
+    tipo = operacion.get('op')
+    if tipo == 'crear':
+        valores = {campo: operacion.get(campo) for campo in CAMPOS_EDITABLES}
+        return tipo, None, validar_campos(valores, crear=True)
+
+    if tipo in ('editar', 'eliminar'):
+        dispositivo_id = operacion.get('id')
+        if not es_id(dispositivo_id):
+            raise OperacionInvalida("El campo 'id' es obligatorio")
+        if dispositivo_id not in propios:
+            raise OperacionInvalida("Dispositivo no encontrado")
+        if tipo == 'eliminar':
+            return tipo, dispositivo_id, None
+        valores = {campo: operacion[campo] for campo in CAMPOS_EDITABLES if campo in operacion}
+        if not valores:
+            raise OperacionInvalida("No hay campos para actualizar")
+        return tipo, dispositivo_id, validar_campos(valores)
+
+    raise OperacionInvalida("'op' debe ser crear, editar o eliminar")
+
+
+def aplicar_operaciones(usuario_id, operaciones, atomico=False):
+    """
+    Aplica una lista de operaciones crear/editar/eliminar en una sola transacción.
+    Devuelve (resultados por operación, ids afectados). Con `atomico` una sola
+    operación inválida cancela todo el lote.
+
+    Las operaciones se agrupan por tipo para ejecutarlas en bloque, así que un
+    mismo dispositivo solo puede aparecer en una operación del lote: las
+    siguientes que lo repitan se rechazan (el orden no se podría respetar).
+    """
+    # Una sola consulta para verificar la propiedad de todos los ids referidos
+    referidos = {o.get('id') for o in operaciones if isinstance(o, dict) and es_id(o.get('id'))}
+    propios = set()
+    if referidos:
+        propios = set(db.session.execute(
+            select(Dispositivo.id).where(Dispositivo.id.in_(referidos), Dispositivo.usuario_id == usuario_id)
+        ).scalars())
+
+    resultados = []
+    vistos = set()
+    crear, editar, eliminar = [], [], []
+    for indice, operacion in enumerate(operaciones):
+        resultado = {"indice": indice, "op": operacion.get('op') if isinstance(operacion, dict) else None}
+        resultados.append(resultado)
+        try:
+            tipo, dispositivo_id, valores = _validar(operacion, propios)
+            if dispositivo_id is not None and dispositivo_id in vistos:
+                raise OperacionInvalida("El dispositivo ya aparece en otra operación del lote")
+        except OperacionInvalida as e:
+            resultado.update(ok=False, error=str(e))
+            continue
+
+        if dispositivo_id is not None:
+            vistos.add(dispositivo_id)
+        resultado.update(ok=True)
+        if tipo == 'crear':
+            crear.append((resultado, {**valores, "usuario_id": usuario_id}))
+        elif tipo == 'editar':
+            resultado["id"] = dispositivo_id
+            editar.append({**valores, "id": dispositivo_id})
+        else:
+            resultado["id"] = dispositivo_id
+            eliminar.append(dispositivo_id)
+
+    if atomico and any(not r["ok"] for r in resultados):
+        for r in resultados:
+            if r["ok"]:
+                r.update(ok=False, error="Lote cancelado por operaciones inválidas")
+        return resultados, set()
+
+    try:
+        if crear:
+            ids = db.session.execute(
+                insert(Dispositivo).returning(Dispositivo.id, sort_by_parameter_order=True),
+                [valores for _, valores in crear],
+            ).scalars().all()
+            for (resultado, _), nuevo_id in zip(crear, ids):
+                resultado["id"] = nuevo_id
+
+        if editar:
+            # UPDATE por clave primaria en bloque (executemany)
+            db.session.execute(update(Dispositivo), editar)
+
+        if eliminar:
+            # Sin cargar objetos: consumos y resúmenes caen por ON DELETE CASCADE
+            db.session.execute(
+                delete(Dispositivo).where(Dispositivo.id.in_(eliminar)),
+                execution_options={"synchronize_session": False},
+            )
+
+        if crear or editar or eliminar:
+            db.session.execute(Usuario.tocar_dispositivos(usuario_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    afectados = {r["id"] for r in resultados if r["ok"]}
+    return resultados, afectados
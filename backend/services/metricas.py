@@ -0,0 +1,264 @@
+"""
+Instrumentación por petición: histogramas de latencia, sentencias SQL y
+tiempo en BD/llamadas externas por endpoint, detección opcional de N+1 y un
+perfilador por muestreo (opcional) para peticiones lentas. Todo se expone en
+formato Prometheus desde /metrics.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import os
+import re
+import sys
+import threading
+import time
+
+from flask import g, has_request_context, request, request_finished, request_started, got_request_exception
+from sqlalchemy import event
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_SQL = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+_LISTA_PARAMETROS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.suma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[i] += 1
+                break
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencia = defaultdict(lambda: Histograma(BUCKETS_LATENCIA))
+        self.sql_por_peticion = defaultdict(lambda: Histograma(BUCKETS_SQL))
+        self.sql_tiempo = defaultdict(float)
+        self.externa_por_endpoint = defaultdict(float)
+        self.peticiones = Counter()
+        self.externas = defaultdict(lambda: Histograma(BUCKETS_LATENCIA))
+        self.n_mas_1 = Counter()
+        self.lentas = Counter()
+        self.gauges = {}  # nombre -> función que devuelve {etiquetas: valor}
+
+    def registrar_peticion(self, endpoint, metodo, status, duracion, sentencias, tiempo_sql, tiempo_externo):
+        with self._lock:
+            self.latencia[endpoint].observar(duracion)
+            self.sql_por_peticion[endpoint].observar(sentencias)
+            self.sql_tiempo[endpoint] += tiempo_sql
+            self.externa_por_endpoint[endpoint] += tiempo_externo
+            self.peticiones[(endpoint, metodo, status)] += 1
+
+    def registrar_externa(self, destino, duracion):
+        with self._lock:
+            self.externas[destino].observar(duracion)
+
+    def registrar_gauge(self, nombre, ayuda, funcion):
+        """`funcion` devuelve un dict {valor_etiqueta: número} o un número"""
+        self.gauges[nombre] = (ayuda, funcion)
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus"""
+        lineas = []
+
+        def histograma(nombre, ayuda, datos, etiqueta):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} histogram")
+            for valor_etiqueta, h in sorted(datos.items()):
+                acumulado = 0
+                for limite, conteo in zip(h.buckets, h.conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{{{etiqueta}="{valor_etiqueta}",le="{limite}"}} {acumulado}')
+                lineas.append(f'{nombre}_bucket{{{etiqueta}="{valor_etiqueta}",le="+Inf"}} {h.total}')
+                lineas.append(f'{nombre}_sum{{{etiqueta}="{valor_etiqueta}"}} {h.suma:.6f}')
+                lineas.append(f'{nombre}_count{{{etiqueta}="{valor_etiqueta}"}} {h.total}')
+
+        def contador(nombre, ayuda, datos, etiqueta, tipo="counter"):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for valor_etiqueta, valor in sorted(datos.items()):
+                lineas.append(f'{nombre}{{{etiqueta}="{valor_etiqueta}"}} {valor}')
+
+        with self._lock:
+            histograma("powerflow_peticion_duracion_segundos", "Latencia de las peticiones HTTP",
+                       self.latencia, "endpoint")
+            histograma("powerflow_peticion_sentencias_sql", "Sentencias SQL ejecutadas por petición",
+                       self.sql_por_peticion, "endpoint")
+            contador("powerflow_sql_duracion_segundos_total", "Tiempo total en la base de datos",
+                     {k: f"{v:.6f}" for k, v in self.sql_tiempo.items()}, "endpoint")
+            contador("powerflow_externa_por_endpoint_segundos_total", "Tiempo en llamadas externas por endpoint",
+                     {k: f"{v:.6f}" for k, v in self.externa_por_endpoint.items()}, "endpoint")
+            histograma("powerflow_externa_duracion_segundos", "Latencia de llamadas externas (LLM)",
+                       self.externas, "destino")
+            contador("powerflow_n_mas_1_total", "Peticiones con consultas repetidas (posible N+1)",
+                     self.n_mas_1, "endpoint")
+            contador("powerflow_peticiones_lentas_total", "Peticiones que superaron el umbral del perfilador",
+                     self.lentas, "endpoint")
+
+            lineas.append("# HELP powerflow_peticiones_total Peticiones HTTP atendidas")
+            lineas.append("# TYPE powerflow_peticiones_total counter")
+            for (endpoint, metodo, status), valor in sorted(self.peticiones.items()):
+                lineas.append(
+                    f'powerflow_peticiones_total{{endpoint="{endpoint}",metodo="{metodo}",status="{status}"}} {valor}'
+                )
+
+        for nombre, (ayuda, funcion) in sorted(self.gauges.items()):
+            valores = funcion()
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} gauge")
+            if isinstance(valores, dict):
+                for etiqueta, valor in sorted(valores.items()):
+                    lineas.append(f'{nombre}{{tipo="{etiqueta}"}} {valor}')
+            else:
+                lineas.append(f"{nombre} {valores}")
+
+        return "\n".join(lineas) + "\n"
+
+
+metricas = RegistroMetricas()
+
+
+@contextmanager
+def medir_externa(destino):
+    """Mide una llamada saliente y la suma al tiempo externo de la petición en curso"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        metricas.registrar_externa(destino, duracion)
+        if has_request_context() and hasattr(g, 'metricas'):
+            g.metricas['externa'] += duracion
+
+
+def _normalizar_sql(sentencia):
+    """Misma forma para 'IN (?, ?, ?)' y 'IN (?)' y sin espacios de más"""
+    return _ESPACIOS.sub(' ', _LISTA_PARAMETROS.sub('(?)', sentencia)).strip()
+
+
+class PerfiladorMuestreo:
+    """Toma muestras de las pilas de los hilos que están atendiendo peticiones"""
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._hilos = {}  # ident -> Counter de pilas
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _asegurar_hilo(self):
+        # El hilo se crea en el primer uso de cada proceso: los workers de un fork no lo heredan
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._muestrear, name='perfilador', daemon=True).start()
+
+    def iniciar(self, ident):
+        with self._lock:
+            self._asegurar_hilo()
+            self._hilos[ident] = Counter()
+
+    def terminar(self, ident):
+        with self._lock:
+            return self._hilos.pop(ident, Counter())
+
+    def _muestrear(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                if not self._hilos:
+                    continue
+                marcos = sys._current_frames()
+                for ident, pilas in self._hilos.items():
+                    marco = marcos.get(ident)
+                    pila = []
+                    while marco is not None and len(pila) < 12:
+                        codigo = marco.f_code
+                        pila.append(f"{codigo.co_filename.rsplit('/', 1)[-1]}:{marco.f_lineno} {codigo.co_name}")
+                        marco = marco.f_back
+                    if pila:
+                        pilas[tuple(pila)] += 1
+
+
+def registrar_metricas(app, engine):
+    """Conecta señales de Flask y eventos del motor SQL al registro de métricas"""
+    umbral_n_mas_1 = app.config.get('METRICAS_UMBRAL_N_MAS_1', 0)
+    umbral_lento = app.config.get('PERFILADOR_LENTO_MS', 0) / 1000
+    perfilador = None
+    if umbral_lento > 0:
+        perfilador = PerfiladorMuestreo(app.config.get('PERFILADOR_INTERVALO_MS', 5) / 1000)
+
+    def al_iniciar(sender, **extra):
+        g.metricas = {
+            "inicio": time.perf_counter(),
+            "sql": 0,
+            "sql_tiempo": 0.0,
+            "externa": 0.0,
+            "sentencias": Counter() if umbral_n_mas_1 else None,
+        }
+        if perfilador:
+            perfilador.iniciar(threading.get_ident())
+
+    def al_terminar(sender, response, **extra):
+        datos = g.pop('metricas', None)
+        if datos is None:
+            return
+        duracion = time.perf_counter() - datos["inicio"]
+        endpoint = request.endpoint or 'desconocido'
+
+        metricas.registrar_peticion(endpoint, request.method, response.status_code, duracion,
+                                    datos["sql"], datos["sql_tiempo"], datos["externa"])
+
+        if datos["sentencias"]:
+            sentencia, repeticiones = datos["sentencias"].most_common(1)[0]
+            if repeticiones >= umbral_n_mas_1:
+                with metricas._lock:
+                    metricas.n_mas_1[endpoint] += 1
+                app.logger.warning(f"⚠️ Posible N+1 en {endpoint}: {repeticiones}x {sentencia[:200]}")
+
+        if perfilador:
+            pilas = perfilador.terminar(threading.get_ident())
+            if duracion >= umbral_lento:
+                with metricas._lock:
+                    metricas.lentas[endpoint] += 1
+                resumen = "\n".join(
+                    f"    {n} muestras: {' <- '.join(pila[:4])}" for pila, n in pilas.most_common(5)
+                )
+                app.logger.warning(f"🐢 Petición lenta {endpoint} ({duracion * 1000:.0f} ms):\n{resumen}")
+
+    def al_fallar(sender, exception, **extra):
+        if perfilador:
+            perfilador.terminar(threading.get_ident())
+
+    # weak=False: las funciones locales deben vivir tanto como la app
+    request_started.connect(al_iniciar, app, weak=False)
+    request_finished.connect(al_terminar, app, weak=False)
+    got_request_exception.connect(al_fallar, app, weak=False)
+
+    # El inicio va en el contexto de la sentencia y no en la conexión: si la
+    # sentencia falla no llega a after_cursor_execute y no deja nada atrás
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes_sql(conn, cursor, sentencia, parametros, contexto, executemany):
+        if contexto is not None:
+            contexto._inicio_sql = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues_sql(conn, cursor, sentencia, parametros, contexto, executemany):
+        inicio = getattr(contexto, '_inicio_sql', None)
+        if inicio is None or not has_request_context():
+            return
+        datos = g.get('metricas')
+        if datos is None:
+            return
+        datos["sql"] += 1
+        datos["sql_tiempo"] += time.perf_counter() - inicio
+        if datos["sentencias"] is not None:
+            datos["sentencias"][_normalizar_sql(sentencia)] += 1
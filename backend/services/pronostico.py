@@ -0,0 +1,173 @@
+from calendar import monthrange
+from datetime import date, timedelta
+import time
+
+import numpy as np
+from sqlalchemy import func
+
+from extensions import db
+from models.resumen import ConsumoDiario
+from services.tarifas import TarifaPlana, cotizar_consumos
+
+# Días de historia que se mantienen por usuario (12 semanas)
+VENTANA_DIAS = 84
+VENTANA_CORTA = 7
+VENTANA_LARGA = 28
+# Con menos días completos no se estima estacionalidad semanal
+MIN_DIAS_ESTACIONALIDAD = 14
+DIAS_SEMANA = ('lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo')
+
+
+class SerieUsuario:
+    """Consumo diario de un usuario en [fin - VENTANA_DIAS + 1, fin] como arreglos"""
+
+    def __init__(self, fin, kwh, costo, lecturas):
+        self.fin = fin
+        self.kwh = kwh
+        self.costo = costo
+        self.lecturas = lecturas
+        self.cargada = time.monotonic()
+        self.version_telemetria = None  # ver CachePronostico
+        self.resultados = {}
+
+    @property
+    def inicio(self):
+        return self.fin - timedelta(days=len(self.kwh) - 1)
+
+    def sumar(self, fecha, kwh, costo, lecturas):
+        """Aplica un delta; devuelve False si la fecha cae después de la ventana"""
+        i = (fecha - self.inicio).days
+        if i >= len(self.kwh):
+            return False
+        if i >= 0:
+            self.kwh[i] += kwh
+            self.costo[i] += costo
+            self.lecturas[i] += lecturas
+            self.resultados.clear()
+        return True
+
+    def avanzar(self, hoy):
+        """Corre la ventana hasta `hoy`; los días nuevos empiezan en cero"""
+        dias = (hoy - self.fin).days
+        if dias <= 0:
+            return
+        for arreglo in (self.kwh, self.costo, self.lecturas):
+            arreglo[:-dias] = arreglo[dias:].copy() if dias < len(arreglo) else 0
+            arreglo[-dias:] = 0
+        self.fin = hoy
+        self.resultados.clear()
+
+
+def cargar_serie(usuario_id, hoy=None, dias=VENTANA_DIAS):
+    """Lee la ventana desde consumos_diarios (una fila por fecha, ya agregada)"""
+    hoy = hoy or date.today()
+    inicio = hoy - timedelta(days=dias - 1)
+    filas = (
+        db.session.query(
+            ConsumoDiario.fecha,
+            func.sum(ConsumoDiario.consumo_kwh),
+            func.sum(ConsumoDiario.costo_lps),
+            func.sum(ConsumoDiario.lecturas),
+        )
+        .filter(ConsumoDiario.usuario_id == usuario_id, ConsumoDiario.fecha.between(inicio, hoy))
+        .group_by(ConsumoDiario.fecha)
+        .all()
+    )
+
+    kwh = np.zeros(dias)
+    costo = np.zeros(dias)
+    lecturas = np.zeros(dias, dtype=np.int64)
+    if filas:
+        fechas, k, c, n = zip(*filas)
+        indices = np.fromiter(((f - inicio).days for f in fechas), dtype=np.int64, count=len(fechas))
+        kwh[indices] = k
+        costo[indices] = c
+        lecturas[indices] = n
+    return SerieUsuario(hoy, kwh, costo, lecturas)
+
+
+def media_movil(valores, ventana):
+    """Media móvil con sumas acumuladas; los primeros días promedian lo que haya"""
+    acumulado = np.concatenate(([0.0], np.cumsum(valores)))
+    fin = np.arange(1, len(valores) + 1)
+    inicio = np.maximum(fin - ventana, 0)
+    return (acumulado[fin] - acumulado[inicio]) / (fin - inicio)
+
+
+def estacionalidad_semanal(valores, dias_semana):
+    """Factor por día de la semana (media del día / media general); 1.0 si no hay base"""
+    media = valores.mean() if len(valores) else 0
+    if len(valores) < MIN_DIAS_ESTACIONALIDAD or media <= 0:
+        return np.ones(7)
+    suma = np.bincount(dias_semana, weights=valores, minlength=7)
+    cuenta = np.bincount(dias_semana, minlength=7)
+    media_dia = np.divide(suma, cuenta, out=np.full(7, media), where=cuenta > 0)
+    return media_dia / media
+
+
+def pronosticar(serie, tarifa=None):
+    """Proyección de fin de mes en kWh y Lempiras a partir de la serie diaria"""
+    tarifa = tarifa or TarifaPlana()
+    hoy = serie.fin
+    n = len(serie.kwh)
+    ultimo_dia = monthrange(hoy.year, hoy.month)[1]
+    inicio_mes = max(n - hoy.day, 0)
+
+    consumo_mes = float(serie.kwh[inicio_mes:].sum())
+    costo_mes = float(serie.costo[inicio_mes:].sum())
+
+    con_datos = np.flatnonzero(serie.lecturas > 0)
+    primero = int(con_datos[0]) if len(con_datos) else n - 1
+
+    # Historia completa: desde el primer día con lecturas hasta ayer (hoy puede estar a medias)
+    historia = serie.kwh[primero:n - 1]
+    dias_semana = (np.arange(primero, n - 1) + serie.inicio.weekday()) % 7
+
+    if len(historia):
+        movil_corta = media_movil(historia, VENTANA_CORTA)
+        movil_larga = media_movil(historia, VENTANA_LARGA)
+        base = float(movil_larga[-1])
+    else:
+        movil_corta = movil_larga = np.zeros(0)
+        base = float(serie.kwh[-1])
+    factores = estacionalidad_semanal(historia, dias_semana)
+
+    # Días que faltan: hoy (si aún no tiene lecturas) y el resto del mes
+    restantes = ultimo_dia - hoy.day
+    futuros = (hoy.weekday() + 1 + np.arange(restantes)) % 7
+    esperado = base * factores[futuros]
+    esperado_hoy = base * factores[hoy.weekday()] if serie.lecturas[-1] == 0 else 0.0
+    consumo_proyectado = consumo_mes + esperado_hoy + float(esperado.sum())
+
+    cotizacion = cotizar_consumos([0], [consumo_proyectado], tarifa=tarifa)
+    costo_proyectado = float(cotizacion["costo_usuario"][0])
+
+    # Últimos días completos con su media de 7 días, para graficar
+    ultimos = min(len(historia), VENTANA_LARGA)
+    desde = serie.inicio + timedelta(days=n - 1 - ultimos)
+    recientes = [
+        {
+            "fecha": (desde + timedelta(days=i)).isoformat(),
+            "consumo_kwh": round(float(k), 3),
+            "promedio_7_dias": round(float(m), 3),
+        }
+        for i, (k, m) in enumerate(zip(historia[len(historia) - ultimos:], movil_corta[len(historia) - ultimos:]))
+    ]
+
+    return {
+        "fecha": hoy.isoformat(),
+        "periodo": hoy.strftime('%Y-%m'),
+        "dias_con_historia": int(len(historia)),
+        "consumo_mes_kwh": round(consumo_mes, 3),
+        "costo_mes_lps": round(costo_mes, 2),
+        "promedio_7_dias_kwh": round(float(movil_corta[-1]), 3) if len(movil_corta) else 0.0,
+        "promedio_28_dias_kwh": round(float(movil_larga[-1]), 3) if len(movil_larga) else 0.0,
+        "estacionalidad": {dia: round(float(f), 3) for dia, f in zip(DIAS_SEMANA, factores)},
+        "proyeccion": {
+            "consumo_kwh": round(consumo_proyectado, 3),
+            "costo_lps": round(costo_proyectado, 2),
+            "dias_restantes": restantes,
+            "tarifa": tarifa.tipo,
+        },
+        "serie": recientes,
+    }
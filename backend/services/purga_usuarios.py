@@ -0,0 +1,125 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+
+from extensions import db
+from models.consumo import Consumo
+from models.dispositivo import Dispositivo
+from models.resumen import ConsumoMensual
+from models.usuario import Usuario
+from services.trabajos import ColaTrabajos, ColaLlena
+
+# Cuentas con más lecturas que esto se purgan en segundo plano
+UMBRAL_PURGA = 20000
+TAMANO_BLOQUE = 5000
+BLOQUE_DISPOSITIVOS = 200
+PAUSA_ENTRE_BLOQUES = 0.02  # s
+
+
+class PurgaUsuarios:
+    """
+    Eliminación de cuentas apoyada en ON DELETE CASCADE.
+
+    Cuentas chicas: un solo DELETE del usuario y la base arrastra dispositivos,
+    consumos, resúmenes y sugerencias sin cargarlos en memoria. Cuentas
+    grandes: se marcan `pendiente_eliminacion` (dejan de poder autenticarse)
+    y un hilo borra sus consumos por bloques, en transacciones cortas para
+    que los demás escritores de SQLite no esperen mucho.
+    """
+
+    def __init__(self, umbral=UMBRAL_PURGA, tamano_bloque=TAMANO_BLOQUE, pausa=PAUSA_ENTRE_BLOQUES):
+        self.umbral = umbral
+        self.tamano_bloque = tamano_bloque
+        self.pausa = pausa
+        self.cola = ColaTrabajos(max_hilos=1, max_pendientes=100, prefijo_hilos='purga',
+                                 mensaje_error="No se pudo completar la eliminación")
+        self._lock = threading.Lock()
+        self.directas = 0
+        self.purgadas = 0
+        self.consumos_purgados = 0
+
+    def lecturas(self, usuario_id):
+        """Tamaño de la cuenta según los resúmenes mensuales (sin contar `consumos`)"""
+        return db.session.query(func.coalesce(func.sum(ConsumoMensual.lecturas), 0)).filter(
+            ConsumoMensual.usuario_id == usuario_id
+        ).scalar()
+
+    def eliminar(self, usuario_id):
+        """Elimina la cuenta o la deja en purga; devuelve 'eliminado' o 'pendiente'"""
+        if self.lecturas(usuario_id) <= self.umbral:
+            db.session.execute(delete(Usuario).where(Usuario.id == usuario_id))
+            db.session.commit()
+            with self._lock:
+                self.directas += 1
+            return "eliminado"
+
+        db.session.execute(update(Usuario).where(Usuario.id == usuario_id).values(pendiente_eliminacion=True))
+        db.session.commit()
+        try:
+            self.cola.encolar(usuario_id, self.purgar, current_app._get_current_object(), usuario_id)
+        except ColaLlena:
+            # La cuenta ya está bloqueada; `flask usuarios purgar` la termina
+            print(f"⚠️ Cola de purgas llena, el usuario {usuario_id} queda pendiente de eliminación")
+        return "pendiente"
+
+    def purgar(self, app, usuario_id):
+        """Borra por bloques los datos de la cuenta y al final la fila del usuario"""
+        inicio = time.perf_counter()
+        with app.app_context():
+            dispositivos = select(Dispositivo.id).where(Dispositivo.usuario_id == usuario_id)
+            consumos = 0
+            while True:
+                bloque = select(Consumo.id).where(Consumo.dispositivo_id.in_(dispositivos)).limit(self.tamano_bloque)
+                with db.engine.begin() as conexion:
+                    borradas = conexion.execute(delete(Consumo).where(Consumo.id.in_(bloque))).rowcount
+                consumos += borradas
+                if borradas < self.tamano_bloque:
+                    break
+                # Entre bloques la base queda libre para otros escritores
+                time.sleep(self.pausa)
+
+            # Sin consumos, cada dispositivo solo arrastra sus resúmenes
+            with db.engine.connect() as conexion:
+                ids = conexion.execute(dispositivos).scalars().all()
+            for i in range(0, len(ids), BLOQUE_DISPOSITIVOS):
+                with db.engine.begin() as conexion:
+                    conexion.execute(delete(Dispositivo).where(Dispositivo.id.in_(ids[i:i + BLOQUE_DISPOSITIVOS])))
+                time.sleep(self.pausa)
+
+            with db.engine.begin() as conexion:
+                conexion.execute(delete(Usuario).where(Usuario.id == usuario_id))
+
+        with self._lock:
+            self.purgadas += 1
+            self.consumos_purgados += consumos
+        print(f"🗑️ Usuario {usuario_id} purgado: {consumos} consumos y {len(ids)} dispositivos "
+              f"en {time.perf_counter() - inicio:.1f} s")
+        return {"usuario_id": usuario_id, "consumos": consumos, "dispositivos": len(ids)}
+
+    def pendientes(self):
+        return db.session.execute(
+            select(Usuario.id).where(Usuario.pendiente_eliminacion.is_(True)).order_by(Usuario.id)
+        ).scalars().all()
+
+    def estadisticas(self):
+        cola = self.cola.estadisticas()
+        with self._lock:
+            return {
+                "eliminaciones_directas": self.directas,
+                "purgas_completadas": self.purgadas,
+                "consumos_purgados": self.consumos_purgados,
+                "purgas_en_cola": cola["profundidad_cola"],
+                "purgas_en_proceso": cola["en_proceso"],
+                "purgas_fallidas": cola["fallidos"],
+            }
+
+
+purga_usuarios = PurgaUsuarios()
+
+
+def configurar_purga_usuarios(umbral, tamano_bloque, pausa_ms):
+    purga_usuarios.umbral = umbral
+    purga_usuarios.tamano_bloque = tamano_bloque
+    purga_usuarios.pausa = pausa_ms / 1000
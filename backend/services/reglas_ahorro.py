@@ -0,0 +1,79 @@
+"""
+Reglas de ahorro de energía, vectorizadas con NumPy.
+
+Este módulo no toca la base ni Flask: se ejecuta dentro de los procesos del
+pool de `flask sugerencias generar` y solo recibe tuplas de dispositivos.
+"""
+import numpy as np
+
+from services.tarifas import DIAS_MES, TARIFA_KWH_DEFECTO
+
+# Consumo mensual a partir del cual un dispositivo se considera de alto consumo
+UMBRAL_ALTO_KWH = 60
+# Horas diarias que se consideran uso continuo para equipos que podrían apagarse
+UMBRAL_HORAS_CONTINUAS = 18
+# Un foco de más de 20 W casi seguro no es LED
+UMBRAL_FOCO_W = 20
+# Un LED consume alrededor del 15% de un foco incandescente
+FACTOR_LED = 0.15
+# Subir el termostato 2 °C ahorra alrededor de un 10% en climatización
+FACTOR_TERMOSTATO = 0.10
+# Categorías que por naturaleza funcionan todo el día (p. ej. refrigeradores)
+CATEGORIAS_CONTINUAS = ('Electrodomésticos',)
+
+
+def evaluar_reglas(filas, tarifa_kwh=TARIFA_KWH_DEFECTO):
+    """
+    `filas`: tuplas (usuario_id, dispositivo_id, nombre, categoria, potencia_watts, horas_uso_dia).
+    Devuelve una lista de oportunidades (dicts) con su ahorro mensual estimado.
+    """
+    if not filas:
+        return []
+
+    usuario_ids, dispositivo_ids, nombres, categorias, potencias, horas = zip(*filas)
+    potencia = np.array([p or 0 for p in potencias], dtype=np.float64)
+    horas_dia = np.array([h or 0 for h in horas], dtype=np.float64)
+    categoria = np.array([c or 'Otros' for c in categorias], dtype=object)
+    # Las categorías se comparan como en el simulador: sin distinguir mayúsculas ni espacios alrededor
+    clave = np.array([(c or 'Otros').strip().casefold() for c in categorias], dtype=object)
+    kwh_mes = potencia * horas_dia * DIAS_MES / 1000
+
+    reglas = []
+
+    # 1. Alto consumo: una hora menos de uso al día
+    alto = kwh_mes >= UMBRAL_ALTO_KWH
+    reglas.append(("alto_consumo", alto & (horas_dia > 1), potencia * DIAS_MES / 1000,
+                   "Reduce en una hora diaria el uso de {nombre}"))
+
+    # 2. Uso casi continuo en equipos que no necesitan estar siempre encendidos
+    continuo = (horas_dia >= UMBRAL_HORAS_CONTINUAS) & ~np.isin(clave, [c.casefold() for c in CATEGORIAS_CONTINUAS])
+    reglas.append(("uso_continuo", continuo, potencia * (horas_dia - 12) * DIAS_MES / 1000,
+                   "{nombre} pasa encendido casi todo el día; apágalo cuando no lo uses"))
+
+    # 3. Iluminación no LED
+    foco = (clave == 'iluminación') & (potencia > UMBRAL_FOCO_W)
+    reglas.append(("cambio_led", foco, kwh_mes * (1 - FACTOR_LED),
+                   "Cambia {nombre} por una bombilla LED"))
+
+    # 4. Climatización: ajustar el termostato
+    clima = (clave == 'climatización') & (kwh_mes > 0)
+    reglas.append(("termostato", clima, kwh_mes * FACTOR_TERMOSTATO,
+                   "Sube 2 °C el termostato de {nombre}"))
+
+    oportunidades = []
+    for tipo, mascara, ahorro_kwh, plantilla in reglas:
+        for i in np.flatnonzero(mascara & (ahorro_kwh > 0)):
+            ahorro = float(ahorro_kwh[i])
+            oportunidades.append({
+                "usuario_id": usuario_ids[i],
+                "dispositivo_id": dispositivo_ids[i],
+                "nombre": nombres[i],
+                "categoria": categoria[i],
+                "potencia_watts": float(potencia[i]),
+                "horas_uso_dia": float(horas_dia[i]),
+                "tipo": tipo,
+                "ahorro_kwh": round(ahorro, 2),
+                "ahorro_lps": round(ahorro * tarifa_kwh, 2),
+                "mensaje": plantilla.format(nombre=nombres[i]),
+            })
+    return oportunidades
@@ -0,0 +1,265 @@
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import bindparam, event, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+from models.consumo import Consumo
+from models.dispositivo import Dispositivo
+from models.resumen import ConsumoDiario, ConsumoMensual
+
+# Columnas acumuladas en ambas tablas de resumen
+_METRICAS = ('horas_uso', 'consumo_kwh', 'costo_lps', 'lecturas')
+
+
+def _periodo(fecha):
+    return fecha.strftime('%Y-%m')
+
+
+def _insert_upsert(dialecto):
+    """INSERT con ON CONFLICT del motor en uso (solo SQLite y PostgreSQL lo tienen igual)"""
+    if dialecto == 'sqlite':
+        return sqlite.insert
+    if dialecto == 'postgresql':
+        return postgresql.insert
+    raise RuntimeError(f"Resúmenes de consumo no soportados en '{dialecto}' (usa SQLite o PostgreSQL)")
+
+
+def _periodo_sql(dialecto, columna):
+    """Expresión 'YYYY-MM' de una fecha en SQL"""
+    if dialecto == 'postgresql':
+        return func.to_char(columna, 'YYYY-MM')
+    return func.strftime('%Y-%m', columna)
+
+
+def _sumar(deltas, usuario_id, dispositivo_id, fecha, horas, kwh, costo, signo):
+    """Acumula en `deltas` el aporte de una lectura (signo=+1 alta, -1 baja)"""
+    acumulado = deltas[(usuario_id, dispositivo_id, fecha)]
+    acumulado[0] += signo * (horas or 0)
+    acumulado[1] += signo * (kwh or 0)
+    acumulado[2] += signo * (costo or 0)
+    acumulado[3] += signo
+
+
+def nuevos_deltas():
+    return defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+
+
+def deltas_de_filas(usuario_id, filas):
+    """Deltas para filas insertadas en bloque (dicts como los de la ingesta)"""
+    deltas = nuevos_deltas()
+    for f in filas:
+        _sumar(deltas, usuario_id, f['dispositivo_id'], f['fecha'],
+               f['horas_uso'], f['consumo_kwh'], f['costo_lps'], 1)
+    return deltas
+
+
+def aplicar_deltas(conexion, deltas):
+    """Aplica los deltas con upserts sobre las tablas diaria y mensual"""
+    if not deltas:
+        return
+
+    diarios = []
+    mensuales = defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+    for (usuario_id, dispositivo_id, fecha), valores in deltas.items():
+        diarios.append({
+            "usuario_id": usuario_id,
+            "dispositivo_id": dispositivo_id,
+            "fecha": fecha,
+            **dict(zip(_METRICAS, valores)),
+        })
+        mensual = mensuales[(usuario_id, dispositivo_id, _periodo(fecha))]
+        for i, valor in enumerate(valores):
+            mensual[i] += valor
+
+    mensuales = [
+        {
+            "usuario_id": usuario_id,
+            "dispositivo_id": dispositivo_id,
+            "periodo": periodo,
+            **dict(zip(_METRICAS, valores)),
+        }
+        for (usuario_id, dispositivo_id, periodo), valores in mensuales.items()
+    ]
+
+    upsert = _insert_upsert(conexion.dialect.name)
+    for modelo, filas in ((ConsumoDiario, diarios), (ConsumoMensual, mensuales)):
+        tabla = modelo.__table__
+        claves = [c.name for c in tabla.primary_key.columns]
+        stmt = upsert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=claves,
+            set_={m: tabla.c[m] + stmt.excluded[m] for m in _METRICAS},
+        )
+        conexion.execute(stmt, filas)
+
+        # Las filas que quedan sin lecturas ya no aportan nada. Solo una fila con
+        # delta de lecturas <= 0 puede haber llegado a cero: en una ingesta normal
+        # (todo altas) no hay nada que borrar y no se recorre la tabla
+        candidatas = [{f"k_{c}": f[c] for c in claves} for f in filas if f["lecturas"] <= 0]
+        if candidatas:
+            conexion.execute(
+                delete(tabla).where(
+                    *(tabla.c[c] == bindparam(f"k_{c}") for c in claves),
+                    tabla.c.lecturas <= 0,
+                ),
+                candidatas,
+            )
+
+
+# Funciones que reciben los deltas ya confirmados (p. ej. caches de pronóstico)
+_oyentes = []
+
+
+def escuchar_deltas(funcion):
+    """Registra `funcion(deltas)`, llamada tras cada commit que cambió los resúmenes"""
+    if funcion not in _oyentes:
+        _oyentes.append(funcion)
+
+
+def notificar_deltas(session, deltas):
+    """Guarda deltas ya aplicados para avisar a los oyentes cuando la transacción se confirme"""
+    if deltas and _oyentes:
+        session.info.setdefault('deltas_confirmar', []).append(deltas)
+
+
+def _calcular_deltas_sesion(session):
+    """Recorre los Consumo pendientes en la sesión y calcula sus deltas"""
+    nuevos = [o for o in session.new if isinstance(o, Consumo)]
+    borrados = [o for o in session.deleted if isinstance(o, Consumo)]
+    modificados = [
+        o for o in session.dirty
+        if isinstance(o, Consumo) and session.is_modified(o, include_collections=False)
+    ]
+    if not (nuevos or borrados or modificados):
+        return None
+
+    # Dispositivos borrados en esta misma sesión ya no se podrán consultar luego
+    duenos = {
+        o.id: o.usuario_id
+        for o in list(session.deleted) + list(session.new) + list(session.identity_map.values())
+        if isinstance(o, Dispositivo) and o.id is not None
+    }
+    # Sus resúmenes los borra la base por ON DELETE CASCADE: no hay nada que restar
+    dispositivos_borrados = {o.id for o in session.deleted if isinstance(o, Dispositivo)}
+
+    movimientos = []  # (dispositivo_id, fecha, horas, kwh, costo, signo)
+    for o in nuevos:
+        # El default de `fecha` se aplica hasta el INSERT, se replica aquí
+        movimientos.append((o.dispositivo_id or (o.dispositivo and o.dispositivo.id), o.fecha or date.today(),
+                            o.horas_uso, o.consumo_kwh, o.costo_lps, 1))
+    for o in borrados:
+        movimientos.append((o.dispositivo_id, o.fecha, o.horas_uso, o.consumo_kwh, o.costo_lps, -1))
+    if modificados:
+        # Los valores anteriores se leen de la base (aún sin el UPDATE): el historial
+        # del ORM no los tiene si el atributo estaba expirado al asignarlo (p. ej. tras un commit)
+        with session.no_autoflush:
+            anteriores = session.connection().execute(
+                select(Consumo.dispositivo_id, Consumo.fecha, Consumo.horas_uso, Consumo.consumo_kwh, Consumo.costo_lps)
+                .where(Consumo.id.in_([o.id for o in modificados]))
+            ).all()
+        movimientos.extend((*fila, -1) for fila in anteriores)
+        for o in modificados:
+            movimientos.append((o.dispositivo_id, o.fecha, o.horas_uso, o.consumo_kwh, o.costo_lps, 1))
+
+    faltantes = {m[0] for m in movimientos if m[0] not in duenos}
+    if faltantes:
+        with session.no_autoflush:
+            filas = session.connection().execute(
+                select(Dispositivo.id, Dispositivo.usuario_id).where(Dispositivo.id.in_(faltantes))
+            )
+            duenos.update(dict(filas.all()))
+
+    deltas = nuevos_deltas()
+    for dispositivo_id, fecha, horas, kwh, costo, signo in movimientos:
+        usuario_id = duenos.get(dispositivo_id)
+        if usuario_id is None or fecha is None or dispositivo_id in dispositivos_borrados:
+            continue
+        _sumar(deltas, usuario_id, dispositivo_id, fecha, horas, kwh, costo, signo)
+    return deltas
+
+
+def registrar_eventos(session_objetivo):
+    """Mantiene los resúmenes al día con cada flush de objetos Consumo"""
+    if event.contains(session_objetivo, 'before_flush', _antes_de_flush):
+        return
+    event.listen(session_objetivo, 'before_flush', _antes_de_flush)
+    event.listen(session_objetivo, 'after_flush', _despues_de_flush)
+    event.listen(session_objetivo, 'after_rollback', _despues_de_rollback)
+    event.listen(session_objetivo, 'after_commit', _despues_de_commit)
+
+
+def _antes_de_flush(session, flush_context, instances):
+    deltas = _calcular_deltas_sesion(session)
+    if deltas:
+        session.info.setdefault('deltas_resumen', []).append(deltas)
+
+
+def _despues_de_flush(session, flush_context):
+    for deltas in session.info.pop('deltas_resumen', []):
+        aplicar_deltas(session.connection(), deltas)
+        notificar_deltas(session, deltas)
+
+
+def _despues_de_rollback(session):
+    session.info.pop('deltas_resumen', None)
+    session.info.pop('deltas_confirmar', None)
+
+
+def _despues_de_commit(session):
+    for deltas in session.info.pop('deltas_confirmar', []):
+        for oyente in _oyentes:
+            try:
+                oyente(deltas)
+            except Exception as e:
+                # Un oyente con problemas no debe tumbar la petición que ya se confirmó
+                print(f"⚠️ Error notificando deltas de resumen: {str(e)}")
+
+
+def reconstruir_resumenes():
+    """Recalcula ambas tablas de resumen desde cero a partir de `consumos`"""
+    conexion = db.session.connection()
+    conexion.execute(delete(ConsumoDiario))
+    conexion.execute(delete(ConsumoMensual))
+
+    base = (
+        select(
+            Dispositivo.usuario_id,
+            Consumo.dispositivo_id,
+            Consumo.fecha,
+            func.sum(Consumo.horas_uso),
+            func.sum(Consumo.consumo_kwh),
+            func.sum(Consumo.costo_lps),
+            func.count(Consumo.id),
+        )
+        .join(Dispositivo, Dispositivo.id == Consumo.dispositivo_id)
+        .group_by(Dispositivo.usuario_id, Consumo.dispositivo_id, Consumo.fecha)
+    )
+    conexion.execute(
+        insert(ConsumoDiario).from_select(
+            ['usuario_id', 'dispositivo_id', 'fecha', *_METRICAS], base
+        )
+    )
+
+    periodo = _periodo_sql(conexion.dialect.name, ConsumoDiario.fecha)
+    mensual = select(
+        ConsumoDiario.usuario_id,
+        ConsumoDiario.dispositivo_id,
+        periodo,
+        func.sum(ConsumoDiario.horas_uso),
+        func.sum(ConsumoDiario.consumo_kwh),
+        func.sum(ConsumoDiario.costo_lps),
+        func.sum(ConsumoDiario.lecturas),
+    ).group_by(ConsumoDiario.usuario_id, ConsumoDiario.dispositivo_id, periodo)
+    conexion.execute(
+        insert(ConsumoMensual).from_select(
+            ['usuario_id', 'dispositivo_id', 'periodo', *_METRICAS], mensual
+        )
+    )
+    db.session.commit()
+
+    return {
+        "diarios": db.session.query(func.count()).select_from(ConsumoDiario).scalar(),
+        "mensuales": db.session.query(func.count()).select_from(ConsumoMensual).scalar(),
+    }
@@ -0,0 +1,185 @@
+"""
+Simulador de escenarios de ahorro ("¿y si uso el aire 2 horas menos y cambio a LED?").
+
+Cada escenario es una lista de cambios sobre los dispositivos del usuario,
+por id o por categoría, a las horas de uso y/o a la potencia. Todos los
+escenarios se evalúan juntos: potencias y horas forman matrices
+(escenarios × dispositivos) y kWh y costo salen de una sola pasada de NumPy
+con la fórmula de Dispositivo.calcular_consumo_mensual y el motor de
+tarifas. No se escribe nada en la base.
+"""
+import numpy as np
+
+from services.tarifas import DIAS_MES, consumo_mensual_kwh, cotizar_consumos, perfiles_de_uso
+
+MAX_ESCENARIOS = 500
+MAX_CAMBIOS = 50  # por escenario
+HORAS_DIA = 24
+CATEGORIA_DEFECTO = "Otros"
+
+# Operaciones de un cambio: (valor absoluto, ajuste relativo) para cada magnitud
+OPERACIONES = {
+    "horas": ("horas_uso_dia", "horas_delta"),
+    "potencia": ("potencia_watts", "potencia_factor"),
+}
+
+
+class EscenarioInvalido(ValueError):
+    """Escenario o cambio mal formado; el mensaje indica cuál"""
+
+
+def _numero(cambio, campo, prefijo):
+    valor = cambio[campo]
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not np.isfinite(valor):
+        raise EscenarioInvalido(f"{prefijo}: '{campo}' debe ser numérico")
+    return float(valor)
+
+
+class _Dispositivos:
+    """Columnas de los dispositivos y máscaras de selección reutilizables"""
+
+    def __init__(self, filas):
+        self.ids, self.nombres, self.categorias, potencias, horas = zip(*filas)
+        self.potencias = np.array([np.nan if p is None else p for p in potencias], dtype=float)
+        self.horas = np.array([np.nan if h is None else h for h in horas], dtype=float)
+        self._posicion = {id_: i for i, id_ in enumerate(self.ids)}
+        claves = [(c or CATEGORIA_DEFECTO).strip().casefold() for c in self.categorias]
+        self._categorias, self._indice_categoria = np.unique(claves, return_inverse=True)
+        self._mascaras = {}
+
+    def mascara(self, cambio, prefijo):
+        if "dispositivo_id" in cambio:
+            dispositivo_id = cambio["dispositivo_id"]
+            if isinstance(dispositivo_id, bool) or not isinstance(dispositivo_id, int):
+                raise EscenarioInvalido(f"{prefijo}: 'dispositivo_id' debe ser un entero")
+            posicion = self._posicion.get(dispositivo_id)
+            if posicion is None:
+                raise EscenarioInvalido(f"{prefijo}: el dispositivo {cambio['dispositivo_id']} no es tuyo o no existe")
+            return posicion  # un índice entero selecciona un solo elemento
+
+        categoria = cambio.get("categoria")
+        if not isinstance(categoria, str) or not categoria.strip():
+            raise EscenarioInvalido(f"{prefijo}: indica 'dispositivo_id' o 'categoria'")
+        clave = categoria.strip().casefold()
+        if clave not in self._mascaras:
+            encontrada = np.searchsorted(self._categorias, clave)
+            if encontrada == len(self._categorias) or self._categorias[encontrada] != clave:
+                raise EscenarioInvalido(f"{prefijo}: no tienes dispositivos en la categoría '{categoria}'")
+            self._mascaras[clave] = self._indice_categoria == encontrada
+        return self._mascaras[clave]
+
+
+def _aplicar_escenario(escenario, numero, dispositivos, potencias, horas):
+    """Aplica en orden los cambios del escenario sobre sus filas de `potencias` y `horas`"""
+    if not isinstance(escenario, dict):
+        raise EscenarioInvalido(f"Escenario {numero}: debe ser un objeto")
+    cambios = escenario.get("cambios")
+    if not isinstance(cambios, list) or not cambios:
+        raise EscenarioInvalido(f"Escenario {numero}: 'cambios' debe ser una lista no vacía")
+    if len(cambios) > MAX_CAMBIOS:
+        raise EscenarioInvalido(f"Escenario {numero}: máximo {MAX_CAMBIOS} cambios")
+
+    for j, cambio in enumerate(cambios, start=1):
+        prefijo = f"Escenario {numero}, cambio {j}"
+        if not isinstance(cambio, dict):
+            raise EscenarioInvalido(f"{prefijo}: debe ser un objeto")
+        seleccion = dispositivos.mascara(cambio, prefijo)
+
+        aplicado = False
+        for fila, (absoluto, relativo) in ((horas, OPERACIONES["horas"]), (potencias, OPERACIONES["potencia"])):
+            if absoluto in cambio and relativo in cambio:
+                raise EscenarioInvalido(f"{prefijo}: usa '{absoluto}' o '{relativo}', no ambos")
+            if absoluto in cambio:
+                valor = _numero(cambio, absoluto, prefijo)
+                if valor < 0:
+                    raise EscenarioInvalido(f"{prefijo}: '{absoluto}' no puede ser negativo")
+                fila[seleccion] = valor
+                aplicado = True
+            elif relativo in cambio:
+                valor = _numero(cambio, relativo, prefijo)
+                if relativo == "potencia_factor":
+                    if valor < 0:
+                        raise EscenarioInvalido(f"{prefijo}: 'potencia_factor' no puede ser negativo")
+                    fila[seleccion] *= valor
+                else:
+                    fila[seleccion] += valor
+                aplicado = True
+        if not aplicado:
+            raise EscenarioInvalido(
+                f"{prefijo}: indica al menos uno de horas_uso_dia, horas_delta, potencia_watts o potencia_factor"
+            )
+
+    nombre = escenario.get("nombre")
+    return str(nombre) if nombre else f"Escenario {numero}"
+
+
+def simular_escenarios(filas, escenarios, tarifa=None, dias=DIAS_MES, detalle=False):
+    """
+    `filas`: (id, nombre, categoria, potencia_watts, horas_uso_dia) de los
+    dispositivos del usuario. Devuelve el caso base y los escenarios
+    ordenados de mayor a menor ahorro en Lempiras.
+    """
+    if not isinstance(escenarios, list) or not escenarios:
+        raise EscenarioInvalido("El campo 'escenarios' debe ser una lista no vacía")
+    if len(escenarios) > MAX_ESCENARIOS:
+        raise EscenarioInvalido(f"Máximo {MAX_ESCENARIOS} escenarios por simulación")
+    if not filas:
+        raise EscenarioInvalido("No tienes dispositivos registrados para simular")
+
+    dispositivos = _Dispositivos(filas)
+    total = len(escenarios) + 1  # la fila 0 es el caso base
+    potencias = np.tile(dispositivos.potencias, (total, 1))
+    horas = np.tile(dispositivos.horas, (total, 1))
+
+    nombres = [
+        _aplicar_escenario(escenario, i, dispositivos, potencias[i], horas[i])
+        for i, escenario in enumerate(escenarios, start=1)
+    ]
+    np.clip(horas, 0, HORAS_DIA, out=horas)
+
+    # (escenarios × dispositivos) en una sola pasada; cada escenario se cotiza como un hogar
+    kwh = consumo_mensual_kwh(potencias, horas, dias)
+    perfiles = None
+    if tarifa is not None and tarifa.necesita_perfiles:
+        # Con la tarifa horaria, recortar horas también mueve el uso respecto a la punta
+        perfiles = perfiles_de_uso(dispositivos.categorias * total, horas.ravel())
+    cotizacion = cotizar_consumos(np.repeat(np.arange(total), kwh.shape[1]), kwh.ravel(), tarifa, perfiles)
+    costo = cotizacion["costo_lps"].reshape(kwh.shape)
+    kwh_total, costo_total = cotizacion["kwh_usuario"], cotizacion["costo_usuario"]
+
+    delta_kwh = kwh_total[1:] - kwh_total[0]
+    delta_lps = costo_total[1:] - costo_total[0]
+    ahorro_pct = np.divide(-delta_lps, costo_total[0], out=np.zeros_like(delta_lps), where=costo_total[0] > 0) * 100
+    afectados = ~np.isclose(kwh[1:], kwh[0])
+    orden = np.argsort(delta_lps, kind="stable")
+
+    resultado = []
+    for i in orden.tolist():
+        item = {
+            "indice": i + 1,
+            "nombre": nombres[i],
+            "consumo_kwh": round(float(kwh_total[i + 1]), 3),
+            "costo_lps": round(float(costo_total[i + 1]), 2),
+            "delta_kwh": round(float(delta_kwh[i]), 3),
+            "delta_lps": round(float(delta_lps[i]), 2),
+            "ahorro_lps": round(float(-delta_lps[i]), 2),
+            "ahorro_pct": round(float(ahorro_pct[i]), 1),
+            "dispositivos_afectados": int(afectados[i].sum()),
+        }
+        if detalle:
+            columnas = np.flatnonzero(afectados[i])
+            item["detalle"] = [
+                {
+                    "id": dispositivos.ids[c],
+                    "nombre": dispositivos.nombres[c],
+                    "delta_kwh": round(float(kwh[i + 1, c] - kwh[0, c]), 3),
+                    "delta_lps": round(float(costo[i + 1, c] - costo[0, c]), 2),
+                }
+                for c in columnas.tolist()
+            ]
+        resultado.append(item)
+
+    return {
+        "base": {"consumo_kwh": round(float(kwh_total[0]), 3), "costo_lps": round(float(costo_total[0]), 2)},
+        "escenarios": resultado,
+    }
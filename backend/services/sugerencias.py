@@ -0,0 +1,191 @@
+"""
+Generación nocturna de sugerencias de ahorro (`flask sugerencias generar`).
+
+Recorre los usuarios por bloques de ids, evalúa las reglas de ahorro en un
+pool de procesos, pide al LLM que redacte solo los casos de mayor ahorro de
+cada bloque y guarda todo con inserts en bloque. Tras cada bloque confirmado
+se escribe un checkpoint, así una corrida interrumpida (o cortada por el
+límite de tiempo) continúa donde quedó.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import defaultdict, deque
+from datetime import datetime
+import json
+import multiprocessing
+import os
+import time
+
+from sqlalchemy import delete, insert, select
+
+from extensions import db
+from models.dispositivo import Dispositivo
+from models.sugerencia import SugerencIA
+from models.usuario import Usuario
+from services.reglas_ahorro import evaluar_reglas
+
+TAMANO_BLOQUE = 500
+MAX_POR_USUARIO = 3
+
+
+def mensaje_regla(oportunidad):
+    return (
+        f"{oportunidad['mensaje']}: ahorrarías unos {oportunidad['ahorro_kwh']} kWh "
+        f"(L {oportunidad['ahorro_lps']:.2f}) al mes."
+    )
+
+
+def leer_checkpoint(ruta):
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def guardar_checkpoint(ruta, estado):
+    """Escritura atómica: un corte a medio escribir nunca deja un checkpoint corrupto"""
+    if not ruta:
+        return
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo)
+    os.replace(temporal, ruta)
+
+
+def bloques_de_usuarios(despues_de, tamano):
+    """Ids de usuarios por bloques, con paginación por keyset (sin OFFSET)"""
+    while True:
+        ids = db.session.execute(
+            select(Usuario.id)
+            .where(Usuario.id > despues_de, Usuario.pendiente_eliminacion.is_(False))
+            .order_by(Usuario.id)
+            .limit(tamano)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        despues_de = ids[-1]
+
+
+def dispositivos_de(usuario_ids):
+    return [tuple(f) for f in db.session.execute(
+        select(
+            Dispositivo.usuario_id, Dispositivo.id, Dispositivo.nombre, Dispositivo.categoria,
+            Dispositivo.potencia_watts, Dispositivo.horas_uso_dia,
+        )
+        .where(Dispositivo.usuario_id.in_(usuario_ids))
+        .order_by(Dispositivo.usuario_id, Dispositivo.id)
+    ).all()]
+
+
+def seleccionar(oportunidades, max_por_usuario):
+    """Las mejores oportunidades de cada usuario (un consejo por dispositivo)"""
+    por_usuario = defaultdict(list)
+    for oportunidad in sorted(oportunidades, key=lambda o: o["ahorro_lps"], reverse=True):
+        elegidas = por_usuario[oportunidad["usuario_id"]]
+        if len(elegidas) < max_por_usuario and all(o["dispositivo_id"] != oportunidad["dispositivo_id"] for o in elegidas):
+            elegidas.append(oportunidad)
+    return [o for elegidas in por_usuario.values() for o in elegidas]
+
+
+def generar_sugerencias(checkpoint=None, tamano_bloque=TAMANO_BLOQUE, procesos=2, top_llm=20,
+                        concurrencia_llm=4, max_por_usuario=MAX_POR_USUARIO, limite_segundos=None,
+                        reiniciar=False, redactor=None, informar=print):
+    """
+    Ejecuta (o continúa) una corrida completa. `redactor(oportunidad)` devuelve el
+    texto del LLM o None; por defecto se usa Groq. Devuelve el estado final.
+    """
+    estado = None if reiniciar else leer_checkpoint(checkpoint)
+    if not estado or estado.get("completado"):
+        estado = {
+            "inicio": datetime.utcnow().isoformat(),
+            "ultimo_usuario_id": 0,
+            "usuarios": 0,
+            "sugerencias": 0,
+            "llamadas_llm": 0,
+            "completado": False,
+        }
+    else:
+        informar(f"🔁 Continuando corrida de {estado['inicio']} desde el usuario {estado['ultimo_usuario_id']}")
+
+    if redactor is None:
+        from services.groq_cliente import redactar_consejo_con_groq
+        redactor = redactar_consejo_con_groq
+
+    inicio_corrida = datetime.fromisoformat(estado["inicio"])
+    fin_ventana = time.monotonic() + limite_segundos if limite_segundos else None
+
+    # Procesos nuevos (spawn) para no heredar la conexión SQLite ni los hilos de este proceso
+    pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) if procesos > 0 else None
+    llm = ThreadPoolExecutor(max_workers=concurrencia_llm, thread_name_prefix='consejo') if top_llm > 0 else None
+    # Bloques en vuelo: mientras el pool evalúa unos, este proceso lee y guarda otros
+    en_vuelo = deque()
+    bloques = bloques_de_usuarios(estado["ultimo_usuario_id"], tamano_bloque)
+
+    def encolar_siguiente():
+        usuario_ids = next(bloques, None)
+        if usuario_ids is None:
+            return False
+        filas = dispositivos_de(usuario_ids)
+        if pool:
+            en_vuelo.append((usuario_ids, pool.submit(evaluar_reglas, filas)))
+        else:
+            en_vuelo.append((usuario_ids, evaluar_reglas(filas)))
+        return True
+
+    try:
+        for _ in range(max(procesos, 1) * 2):
+            if not encolar_siguiente():
+                break
+
+        while en_vuelo:
+            if fin_ventana and time.monotonic() > fin_ventana:
+                informar(f"⏱️ Límite de tiempo alcanzado; se continuará desde el usuario {estado['ultimo_usuario_id']}")
+                break
+
+            usuario_ids, resultado = en_vuelo.popleft()
+            oportunidades = resultado.result() if pool else resultado
+            encolar_siguiente()
+
+            elegidas = seleccionar(oportunidades, max_por_usuario)
+            mensajes = [mensaje_regla(o) for o in elegidas]
+
+            # Solo los casos de mayor ahorro del bloque pasan por el LLM
+            if llm and elegidas:
+                top = sorted(range(len(elegidas)), key=lambda i: elegidas[i]["ahorro_lps"], reverse=True)[:top_llm]
+                for i, texto in zip(top, llm.map(redactor, [elegidas[i] for i in top])):
+                    if texto:
+                        mensajes[i] = texto
+                estado["llamadas_llm"] += len(top)
+
+            filas = [
+                {"usuario_id": o["usuario_id"], "mensaje": m, "fecha_generacion": datetime.utcnow()}
+                for o, m in zip(elegidas, mensajes)
+            ]
+
+            # Si el bloque ya se había guardado antes de un corte, se reemplaza (idempotente)
+            db.session.execute(
+                delete(SugerencIA).where(
+                    SugerencIA.usuario_id.in_(usuario_ids),
+                    SugerencIA.fecha_generacion >= inicio_corrida,
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            if filas:
+                db.session.execute(insert(SugerencIA), filas)
+            db.session.commit()
+
+            estado["ultimo_usuario_id"] = usuario_ids[-1]
+            estado["usuarios"] += len(usuario_ids)
+            estado["sugerencias"] += len(filas)
+            guardar_checkpoint(checkpoint, estado)
+            informar(f"✅ Usuarios hasta {usuario_ids[-1]}: {len(filas)} sugerencias")
+        else:
+            estado["completado"] = True
+            guardar_checkpoint(checkpoint, estado)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        if llm:
+            llm.shutdown()
+
+    return estado
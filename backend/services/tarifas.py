@@ -0,0 +1,207 @@
+"""
+Motor de tarifas vectorizado.
+
+Trabaja sobre arreglos columnares (un elemento por dispositivo o por lectura)
+y calcula kWh y costo en Lempiras en una sola pasada de NumPy, sin bucles
+por fila. Las tarifas por bloques se aplican sobre el total de cada hogar
+y el costo se reparte entre sus dispositivos en proporción a su consumo.
+"""
+import numpy as np
+
+from services.constantes import DIAS_MES, TARIFA_KWH_DEFECTO
+
+# Bloques residenciales (límite superior en kWh/mes, precio L/kWh); None = sin límite
+BLOQUES_RESIDENCIALES = ((50, 2.60), (150, 3.70), (500, 4.40), (None, 5.10))
+
+# Horario: precio por hora del día (punta de 18:00 a 22:00)
+PRECIO_BASE_HORARIO = 3.20
+PRECIO_PUNTA_HORARIO = 5.20
+HORAS_PUNTA = range(18, 22)
+
+# Hora alrededor de la cual se concentra el uso diario de cada categoría (ver
+# perfiles_de_uso). Las que no aparecen (refrigeradores, "Otros"...) se
+# reparten en todo el día.
+HORA_CENTRAL_CATEGORIA = {
+    "iluminación": 20.5,
+    "electrónica": 20.0,
+    "climatización": 16.0,
+}
+
+
+class TarifaPlana:
+    tipo = "plana"
+    necesita_perfiles = False
+
+    def __init__(self, precio_kwh=TARIFA_KWH_DEFECTO):
+        self.precio_kwh = float(precio_kwh)
+
+    def costo(self, kwh, grupos=None, perfiles=None):
+        return kwh * self.precio_kwh
+
+
+class TarifaBloques:
+    tipo = "bloques"
+    necesita_perfiles = False
+
+    def __init__(self, bloques=BLOQUES_RESIDENCIALES):
+        limites = [np.inf if limite is None else float(limite) for limite, _ in bloques]
+        if any(b <= a for a, b in zip(limites, limites[1:])):
+            raise ValueError("Los límites de los bloques deben ser crecientes")
+        # El último bloque cobra todo lo que exceda a los anteriores, aunque traiga límite
+        limites[-1] = np.inf
+        self.superiores = np.array(limites)
+        self.inferiores = np.concatenate(([0.0], self.superiores[:-1]))
+        self.precios = np.array([float(precio) for _, precio in bloques])
+
+    def costo_total(self, kwh_total):
+        """Costo de consumos totales (uno por hogar) escalonado por bloques"""
+        kwh_total = np.asarray(kwh_total, dtype=float)[:, None]
+        en_bloque = np.clip(kwh_total - self.inferiores, 0, self.superiores - self.inferiores)
+        return en_bloque @ self.precios
+
+    def costo(self, kwh, grupos=None, perfiles=None):
+        if grupos is None:
+            grupos = np.zeros(len(kwh), dtype=np.int64)
+        _, inverso = np.unique(grupos, return_inverse=True)
+        total_grupo = np.bincount(inverso, weights=kwh)
+        costo_grupo = self.costo_total(total_grupo)
+        # Precio medio del hogar aplicado a cada dispositivo
+        precio_medio = np.divide(costo_grupo, total_grupo, out=np.zeros_like(costo_grupo), where=total_grupo > 0)
+        return kwh * precio_medio[inverso]
+
+
+class TarifaHoraria:
+    tipo = "horaria"
+    necesita_perfiles = True
+
+    def __init__(self, precios_hora=None):
+        if precios_hora is None:
+            precios_hora = [
+                PRECIO_PUNTA_HORARIO if hora in HORAS_PUNTA else PRECIO_BASE_HORARIO
+                for hora in range(24)
+            ]
+        self.precios_hora = np.asarray(precios_hora, dtype=float)
+        if self.precios_hora.shape != (24,):
+            raise ValueError("La tarifa horaria necesita 24 precios")
+
+    def costo(self, kwh, grupos=None, perfiles=None):
+        """
+        `perfiles` es una matriz (n, 24) con la fracción del uso de cada fila en
+        cada hora. Sin perfil se asume uso repartido en todo el día.
+        """
+        if perfiles is None:
+            return kwh * self.precios_hora.mean()
+        perfiles = np.asarray(perfiles, dtype=float)
+        sumas = perfiles.sum(axis=1, keepdims=True)
+        perfiles = np.divide(perfiles, sumas, out=np.full_like(perfiles, 1 / 24), where=sumas > 0)
+        return kwh * (perfiles @ self.precios_hora)
+
+
+def _precio(valor, campo):
+    """Número no negativo (los bool de JSON no cuentan como número)"""
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not np.isfinite(valor) or valor < 0:
+        raise ValueError(f"'{campo}' debe ser un número mayor o igual a 0")
+    return float(valor)
+
+
+def _leer_bloques(bloques):
+    if not isinstance(bloques, (list, tuple)) or not bloques:
+        raise ValueError("'bloques' debe ser una lista de pares [límite kWh, precio]")
+    leidos = []
+    for bloque in bloques:
+        if not isinstance(bloque, (list, tuple)) or len(bloque) != 2:
+            raise ValueError("Cada bloque debe ser un par [límite kWh, precio]")
+        limite, precio = bloque
+        leidos.append((None if limite is None else _precio(limite, "límite del bloque"), _precio(precio, "precio del bloque")))
+    return leidos
+
+
+def tarifa_desde_config(config=None):
+    """
+    Construye una tarifa a partir de un dict o de su nombre ('plana', 'bloques', 'horaria').
+    La configuración viene del cliente: cualquier valor mal formado es ValueError.
+    """
+    if config is None:
+        return TarifaPlana()
+    if isinstance(config, str):
+        config = {"tipo": config}
+    if not isinstance(config, dict):
+        raise ValueError("La tarifa debe ser un nombre o un objeto")
+
+    tipo = config.get("tipo", "plana")
+    if tipo == "plana":
+        return TarifaPlana(_precio(config.get("precio_kwh", TARIFA_KWH_DEFECTO), "precio_kwh"))
+    if tipo == "bloques":
+        return TarifaBloques(_leer_bloques(config.get("bloques", BLOQUES_RESIDENCIALES)))
+    if tipo == "horaria":
+        precios = config.get("precios_hora")
+        if precios is not None:
+            if not isinstance(precios, (list, tuple)):
+                raise ValueError("'precios_hora' debe ser una lista de 24 precios")
+            precios = [_precio(p, "precios_hora") for p in precios]
+        return TarifaHoraria(precios)
+    raise ValueError(f"Tipo de tarifa desconocido: {tipo}")
+
+
+def _columna(valores):
+    """Convierte a float64 tratando None/NaN como 0"""
+    arreglo = np.asarray(valores, dtype=float)
+    return np.nan_to_num(arreglo, nan=0.0)
+
+
+def consumo_mensual_kwh(potencia_watts, horas_uso_dia, dias=DIAS_MES):
+    """Misma fórmula que Dispositivo.calcular_consumo_mensual, sobre arreglos"""
+    return _columna(potencia_watts) * _columna(horas_uso_dia) * dias / 1000
+
+
+def perfiles_de_uso(categorias, horas_uso_dia):
+    """
+    Perfiles horarios (n, 24) para la tarifa horaria a partir de la categoría y
+    las horas de uso diarias de cada fila: las horas se agrupan en una ventana
+    continua centrada en la hora típica de la categoría (una ventana de 24 h
+    cubre todo el día). Sin hora típica el uso se reparte en las 24 horas.
+    """
+    horas = np.clip(_columna(horas_uso_dia), 0, 24)
+    centros = np.array([
+        HORA_CENTRAL_CATEGORIA.get((c or "").strip().casefold(), np.nan) for c in categorias
+    ], dtype=float)
+    inicio = (centros - horas / 2)[:, None, None]
+    fin = inicio + horas[:, None, None]
+    # Fracción de cada hora del día cubierta por la ventana, que puede cruzar la medianoche
+    hora = np.arange(24, dtype=float)[None, None, :]
+    vuelta = np.array([-24.0, 0.0, 24.0])[None, :, None]
+    cubierto = np.clip(np.minimum(hora + 1, fin + vuelta) - np.maximum(hora, inicio + vuelta), 0, 1).sum(axis=1)
+    return np.where(np.isnan(centros)[:, None], 1.0, cubierto)
+
+
+def cotizar_consumos(usuario_ids, kwh, tarifa=None, perfiles=None):
+    """
+    Cotiza consumos ya conocidos (p. ej. lecturas de `consumos`).
+    Devuelve arreglos por fila y totales por usuario.
+    """
+    tarifa = tarifa or TarifaPlana()
+    usuario_ids = np.asarray(usuario_ids, dtype=np.int64)
+    kwh = _columna(kwh)
+
+    costo = tarifa.costo(kwh, grupos=usuario_ids, perfiles=perfiles)
+    usuarios, inverso = np.unique(usuario_ids, return_inverse=True)
+
+    return {
+        "kwh": kwh,
+        "costo_lps": costo,
+        "usuarios": usuarios,
+        "kwh_usuario": np.bincount(inverso, weights=kwh, minlength=len(usuarios)),
+        "costo_usuario": np.bincount(inverso, weights=costo, minlength=len(usuarios)),
+    }
+
+
+def cotizar_dispositivos(usuario_ids, potencia_watts, horas_uso_dia, tarifa=None, dias=DIAS_MES,
+                         perfiles=None, categorias=None):
+    """
+    Cotiza el mes estimado de muchos dispositivos (de uno o de todos los usuarios) a la vez.
+    Con `categorias` y una tarifa horaria, los perfiles salen de perfiles_de_uso.
+    """
+    kwh = consumo_mensual_kwh(potencia_watts, horas_uso_dia, dias)
+    if perfiles is None and categorias is not None and tarifa is not None and tarifa.necesita_perfiles:
+        perfiles = perfiles_de_uso(categorias, horas_uso_dia)
+    return cotizar_consumos(usuario_ids, kwh, tarifa, perfiles)
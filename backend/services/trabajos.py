@@ -0,0 +1,146 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import uuid
+
+# Los resultados se guardan un rato para que el cliente los recoja
+TTL_RESULTADOS = 10 * 60
+# Muestras de latencia que se conservan para las métricas
+MUESTRAS_LATENCIA = 1000
+
+
+class ColaLlena(Exception):
+    """No hay espacio para más trabajos pendientes"""
+
+
+class Trabajo:
+    def __init__(self, usuario_id):
+        self.id = uuid.uuid4().hex
+        self.usuario_id = usuario_id
+        self.estado = "pendiente"
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self.listo = threading.Event()
+
+    def a_dict(self):
+        datos = {"trabajo_id": self.id, "estado": self.estado}
+        if self.estado == "completado":
+            datos["resultado"] = self.resultado
+        elif self.estado == "error":
+            datos["error"] = self.error
+        return datos
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+class ColaTrabajos:
+    """Ejecutor acotado en segundo plano con registro de trabajos y métricas"""
+
+    def __init__(self, max_hilos=4, max_pendientes=200, mensaje_error="No se pudo completar la estimación",
+                 prefijo_hilos='trabajo'):
+        self.max_hilos = max_hilos
+        self.max_pendientes = max_pendientes
+        self.mensaje_error = mensaje_error
+        self.prefijo_hilos = prefijo_hilos
+        self._ejecutor = None
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._en_proceso = 0
+        self._espera = deque(maxlen=MUESTRAS_LATENCIA)
+        self._ejecucion = deque(maxlen=MUESTRAS_LATENCIA)
+        self.completados = 0
+        self.fallidos = 0
+        self.rechazados = 0
+
+    def _ejecutor_activo(self):
+        # Los hilos se crean en el primer uso, no al importar
+        if self._ejecutor is None:
+            self._ejecutor = ThreadPoolExecutor(max_workers=self.max_hilos, thread_name_prefix=self.prefijo_hilos)
+        return self._ejecutor
+
+    def encolar(self, usuario_id, funcion, *args):
+        trabajo = Trabajo(usuario_id)
+        with self._lock:
+            self._purgar()
+            if self._pendientes >= self.max_pendientes:
+                self.rechazados += 1
+                raise ColaLlena()
+            self._pendientes += 1
+            self._trabajos[trabajo.id] = trabajo
+            ejecutor = self._ejecutor_activo()
+        ejecutor.submit(self._ejecutar, trabajo, funcion, args)
+        return trabajo
+
+    def _ejecutar(self, trabajo, funcion, args):
+        with self._lock:
+            self._pendientes -= 1
+            self._en_proceso += 1
+        trabajo.iniciado = time.time()
+        trabajo.estado = "en_proceso"
+        try:
+            trabajo.resultado = funcion(*args)
+            trabajo.estado = "completado"
+        except Exception as e:
+            print(f"❌ Error en trabajo {trabajo.id}: {str(e)}")
+            trabajo.error = self.mensaje_error
+            trabajo.estado = "error"
+        trabajo.terminado = time.time()
+        with self._lock:
+            self._en_proceso -= 1
+            self._espera.append(trabajo.iniciado - trabajo.creado)
+            self._ejecucion.append(trabajo.terminado - trabajo.iniciado)
+            if trabajo.estado == "completado":
+                self.completados += 1
+            else:
+                self.fallidos += 1
+        trabajo.listo.set()
+
+    def _purgar(self):
+        limite = time.time() - TTL_RESULTADOS
+        vencidos = [i for i, t in self._trabajos.items() if t.terminado and t.terminado < limite]
+        for trabajo_id in vencidos:
+            del self._trabajos[trabajo_id]
+
+    def obtener(self, trabajo_id, esperar=0):
+        """Devuelve el trabajo; con `esperar` > 0 hace long-poll hasta que termine"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is not None and esperar > 0:
+            trabajo.listo.wait(esperar)
+        return trabajo
+
+    def estadisticas(self):
+        with self._lock:
+            espera = list(self._espera)
+            ejecucion = list(self._ejecucion)
+            return {
+                "profundidad_cola": self._pendientes,
+                "en_proceso": self._en_proceso,
+                "max_hilos": self.max_hilos,
+                "max_pendientes": self.max_pendientes,
+                "completados": self.completados,
+                "fallidos": self.fallidos,
+                "rechazados": self.rechazados,
+                "espera_p50_ms": round(_percentil(espera, 0.5) * 1000, 1),
+                "espera_p95_ms": round(_percentil(espera, 0.95) * 1000, 1),
+                "ejecucion_p50_ms": round(_percentil(ejecucion, 0.5) * 1000, 1),
+                "ejecucion_p95_ms": round(_percentil(ejecucion, 0.95) * 1000, 1),
+            }
+
+
+cola_sugerencias = ColaTrabajos()
+
+
+def configurar_cola_sugerencias(max_hilos, max_pendientes):
+    cola_sugerencias.max_hilos = max_hilos
+    cola_sugerencias.max_pendientes = max_pendientes
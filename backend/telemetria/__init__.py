@@ -0,0 +1 @@
+# Servicio de ingesta de telemetría (asyncio) y su generador de carga
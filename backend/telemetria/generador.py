@@ -0,0 +1,145 @@
+"""
+Generador de carga local para el servicio de telemetría.
+
+Abre varias conexiones TCP (o envía datagramas UDP) y manda lecturas lo más
+rápido posible para dispositivos reales de la base. Con --verificar espera
+a que todas aparezcan en `consumos` y reporta el throughput de punta a punta.
+
+Uso (desde backend/, con el servicio corriendo y el mismo TELEMETRIA_SECRETO):
+    python -m telemetria.generador --sembrar 1000 --lecturas 500000 --conexiones 8 --verificar
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from telemetria.protocolo import TELEMETRIA_SECRETO, formatear_lectura, token_dispositivo
+
+CORREO_GENERADOR = "telemetria@powerflow.local"
+LINEAS_POR_ENVIO = 1000
+
+
+def sembrar_dispositivos(app, cantidad):
+    """Crea (o reutiliza) un usuario de prueba con `cantidad` dispositivos; devuelve sus ids"""
+    from extensions import db
+    from models.dispositivo import Dispositivo
+    from models.usuario import Usuario
+
+    with app.app_context():
+        usuario = Usuario.query.filter_by(correo=CORREO_GENERADOR).first()
+        if usuario is None:
+            usuario = Usuario(nombre="Generador de telemetría", correo=CORREO_GENERADOR, password="!")
+            db.session.add(usuario)
+            db.session.commit()
+        existentes = db.session.query(Dispositivo.id).filter(Dispositivo.usuario_id == usuario.id).count()
+        if existentes < cantidad:
+            db.session.execute(Dispositivo.__table__.insert(), [
+                {"usuario_id": usuario.id, "nombre": f"Enchufe {i}", "categoria": "Otros",
+                 "potencia_watts": random.choice([10, 60, 100, 180, 1500]), "horas_uso_dia": 6}
+                for i in range(existentes, cantidad)
+            ])
+            db.session.commit()
+        return [i for (i,) in db.session.query(Dispositivo.id)
+                .filter(Dispositivo.usuario_id == usuario.id).order_by(Dispositivo.id).limit(cantidad)]
+
+
+def contar_consumos(app):
+    from extensions import db
+    from models.consumo import Consumo
+
+    with app.app_context():
+        total = db.session.query(Consumo.id).count()
+        db.session.remove()
+        return total
+
+
+def bloques_de_lineas(dispositivos, total, secreto):
+    """Texto listo para enviar, en bloques de LINEAS_POR_ENVIO lecturas"""
+    tokens = {d: token_dispositivo(d, secreto) for d in dispositivos}
+    rnd = random.Random(7)
+    bloques = []
+    for inicio in range(0, total, LINEAS_POR_ENVIO):
+        lineas = []
+        for _ in range(min(LINEAS_POR_ENVIO, total - inicio)):
+            d = rnd.choice(dispositivos)
+            # Una lectura por minuto de uso
+            lineas.append(formatear_lectura(d, tokens[d], 1 / 60))
+        bloques.append(''.join(lineas).encode('ascii'))
+    return bloques
+
+
+async def enviar_tcp(host, puerto, bloques):
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    for bloque in bloques:
+        escritor.write(bloque)
+        await escritor.drain()
+    escritor.close()
+    await escritor.wait_closed()
+
+
+def enviar_udp(host, puerto, bloques):
+    enchufe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for bloque in bloques:
+        # Datagramas pequeños para no fragmentar
+        lineas = bloque.split(b'\n')
+        for inicio in range(0, len(lineas), 20):
+            enchufe.sendto(b'\n'.join(lineas[inicio:inicio + 20]), (host, puerto))
+    enchufe.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de carga de telemetría")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=9100)
+    parser.add_argument('--protocolo', choices=('tcp', 'udp'), default='tcp')
+    parser.add_argument('--conexiones', type=int, default=8)
+    parser.add_argument('--lecturas', type=int, default=200000)
+    parser.add_argument('--sembrar', type=int, default=1000, help="Dispositivos de prueba a usar")
+    parser.add_argument('--secreto', default=TELEMETRIA_SECRETO, help="Por defecto, TELEMETRIA_SECRETO")
+    parser.add_argument('--verificar', action='store_true', help="Esperar a que las lecturas lleguen a la base")
+    args = parser.parse_args(argv)
+    if not args.secreto:
+        parser.error("indica --secreto o define la variable de entorno TELEMETRIA_SECRETO")
+
+    from telemetria.servidor import crear_app_telemetria
+    app = crear_app_telemetria()
+    dispositivos = sembrar_dispositivos(app, args.sembrar)
+    print(f"✅ {len(dispositivos)} dispositivos de prueba (reinicia el servicio si se acaban de crear)")
+
+    bloques = bloques_de_lineas(dispositivos, args.lecturas, args.secreto)
+    inicial = contar_consumos(app) if args.verificar else 0
+
+    inicio = time.perf_counter()
+    if args.protocolo == 'tcp':
+        async def todas():
+            await asyncio.gather(*[
+                enviar_tcp(args.host, args.puerto, bloques[i::args.conexiones]) for i in range(args.conexiones)
+            ])
+        asyncio.run(todas())
+    else:
+        enviar_udp(args.host, args.puerto, bloques)
+    envio = time.perf_counter() - inicio
+    print(f"📤 {args.lecturas} lecturas enviadas en {envio:.2f} s ({args.lecturas / envio:.0f}/s)")
+
+    if args.verificar:
+        ultimo, quieto = -1, 0
+        while quieto < 4:
+            time.sleep(0.5)
+            total = contar_consumos(app) - inicial
+            quieto = quieto + 1 if total == ultimo else 0
+            ultimo = total
+            if total >= args.lecturas:
+                break
+        duracion = time.perf_counter() - inicio
+        print(f"✅ {ultimo} de {args.lecturas} lecturas en la base en {duracion:.2f} s ({ultimo / duracion:.0f}/s de punta a punta)")
+
+
+if __name__ == '__main__':
+    main()
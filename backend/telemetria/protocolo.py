@@ -0,0 +1,72 @@
+"""
+Protocolo de líneas de la telemetría de enchufes inteligentes.
+
+Una lectura por línea, campos separados por espacios:
+
+    <dispositivo_id> <token> <horas_uso> [consumo_kwh] [timestamp_unix]
+
+`token` es el HMAC-SHA256 (hex, 32 caracteres) del dispositivo_id con el
+secreto TELEMETRIA_SECRETO, que se toma del entorno y no tiene valor por
+defecto (con uno conocido cualquiera podría firmar lecturas ajenas). Sin consumo_kwh se estima con la potencia
+registrada del dispositivo; sin timestamp la lectura es de hoy.
+"""
+from datetime import date
+import hashlib
+import hmac
+import math
+import os
+
+TELEMETRIA_SECRETO = os.getenv('TELEMETRIA_SECRETO')
+LARGO_TOKEN = 32
+
+
+def token_dispositivo(dispositivo_id, secreto):
+    firma = hmac.new(secreto.encode('utf-8'), str(dispositivo_id).encode('ascii'), hashlib.sha256)
+    return firma.hexdigest()[:LARGO_TOKEN]
+
+
+def formatear_lectura(dispositivo_id, token, horas_uso, consumo_kwh=None, timestamp=None):
+    campos = [str(dispositivo_id), token, repr(float(horas_uso))]
+    if consumo_kwh is not None or timestamp is not None:
+        campos.append('-' if consumo_kwh is None else repr(float(consumo_kwh)))
+    if timestamp is not None:
+        campos.append(str(int(timestamp)))
+    return ' '.join(campos) + '\n'
+
+
+class LecturaInvalida(ValueError):
+    pass
+
+
+def interpretar_linea(linea, dispositivos, tarifa_kwh):
+    """
+    Valida una línea (bytes) contra `dispositivos` (id -> (usuario_id, potencia, token))
+    y devuelve (dispositivo_id, usuario_id, fecha, horas_uso, consumo_kwh, costo_lps).
+    """
+    campos = linea.split()
+    if not 3 <= len(campos) <= 5:
+        raise LecturaInvalida("campos")
+
+    try:
+        dispositivo_id = int(campos[0])
+        horas_uso = float(campos[2])
+        consumo_kwh = float(campos[3]) if len(campos) > 3 and campos[3] != b'-' else None
+        fecha = date.fromtimestamp(int(campos[4])) if len(campos) > 4 else date.today()
+    except (ValueError, OverflowError, OSError):
+        raise LecturaInvalida("formato")
+
+    dispositivo = dispositivos.get(dispositivo_id)
+    if dispositivo is None:
+        raise LecturaInvalida("dispositivo")
+    usuario_id, potencia, token = dispositivo
+    if not hmac.compare_digest(campos[1], token):
+        raise LecturaInvalida("token")
+
+    if not 0 <= horas_uso <= 24:
+        raise LecturaInvalida("horas")
+    if consumo_kwh is None:
+        consumo_kwh = (potencia or 0) * horas_uso / 1000
+    elif not math.isfinite(consumo_kwh) or consumo_kwh < 0:
+        raise LecturaInvalida("consumo")
+
+    return dispositivo_id, usuario_id, fecha, horas_uso, consumo_kwh, consumo_kwh * tarifa_kwh
@@ -0,0 +1,339 @@
+"""
+Servicio de ingesta de telemetría, independiente de la API Flask.
+
+Recibe lecturas en protocolo de líneas (ver telemetria/protocolo.py) por
+TCP y/o UDP, las valida contra `dispositivos` y las acumula en un buffer
+circular acotado. Un ciclo de volcado las inserta en `consumos` por lotes,
+en una transacción que también actualiza los resúmenes diarios/mensuales.
+
+Cuando el buffer se llena, las conexiones TCP dejan de leerse hasta que
+haya espacio (el control de flujo de TCP frena a los enchufes); por UDP no
+hay forma de frenar al emisor y las lecturas se descartan y se cuentan.
+
+La API corre en otro proceso y sus caches no ven estas escrituras: cada
+volcado sube `usuarios.version_telemetria` de los usuarios afectados y la
+API la compara en cada consulta de pronóstico. Las lecturas confirmadas se
+publican además al servicio de eventos (ver services/eventos.py), igual que
+las de la ingesta de la API.
+
+Uso (desde backend/, con TELEMETRIA_SECRETO definido):
+    python -m telemetria.servidor --tcp 9100 --udp 9101
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from telemetria.protocolo import LecturaInvalida, TELEMETRIA_SECRETO, interpretar_linea, token_dispositivo
+
+CAPACIDAD_DEFECTO = 200000
+LOTE_DEFECTO = 20000
+INTERVALO_DEFECTO = 0.5
+REFRESCO_DISPOSITIVOS = 30
+REINTENTOS_VOLCADO = 3
+BUFFER_UDP_BYTES = 4 * 1024 * 1024
+# Una lectura ocupa menos de 100 bytes; una conexión que no manda '\n' en este
+# largo no habla el protocolo y se cierra
+MAX_LINEA_BYTES = 1024
+
+
+class AnilloLecturas:
+    """
+    Buffer circular de capacidad fija. Solo se usa desde el hilo del event
+    loop, así que no necesita locks.
+    """
+
+    def __init__(self, capacidad, umbral_lote):
+        self.capacidad = capacidad
+        self.umbral_lote = umbral_lote
+        self._datos = [None] * capacidad
+        self._inicio = 0
+        self._cantidad = 0
+        self.hay_espacio = asyncio.Event()
+        self.hay_espacio.set()
+        self.hay_lote = asyncio.Event()
+
+    def __len__(self):
+        return self._cantidad
+
+    def agregar(self, lectura):
+        if self._cantidad >= self.capacidad:
+            self.hay_espacio.clear()
+            return False
+        self._datos[(self._inicio + self._cantidad) % self.capacidad] = lectura
+        self._cantidad += 1
+        if self._cantidad >= self.umbral_lote:
+            self.hay_lote.set()
+        return True
+
+    def drenar(self, maximo):
+        n = min(self._cantidad, maximo)
+        fin = self._inicio + n
+        if fin <= self.capacidad:
+            lote = self._datos[self._inicio:fin]
+            self._datos[self._inicio:fin] = [None] * n
+        else:
+            fin -= self.capacidad
+            lote = self._datos[self._inicio:] + self._datos[:fin]
+            self._datos[self._inicio:] = [None] * (self.capacidad - self._inicio)
+            self._datos[:fin] = [None] * fin
+        self._inicio = fin % self.capacidad
+        self._cantidad -= n
+        if self._cantidad < self.umbral_lote:
+            self.hay_lote.clear()
+        if n:
+            self.hay_espacio.set()
+        return lote
+
+
+class ServicioTelemetria:
+
+    def __init__(self, app, capacidad=CAPACIDAD_DEFECTO, lote=LOTE_DEFECTO, intervalo=INTERVALO_DEFECTO,
+                 secreto=TELEMETRIA_SECRETO, refresco=REFRESCO_DISPOSITIVOS):
+        from services.constantes import TARIFA_KWH_DEFECTO
+
+        if not secreto:
+            raise ValueError("Falta el secreto de telemetría: define TELEMETRIA_SECRETO")
+        self.app = app
+        self.anillo = AnilloLecturas(capacidad, lote)
+        self.lote = lote
+        self.intervalo = intervalo
+        self.secreto = secreto
+        self.refresco = refresco
+        self.tarifa_kwh = TARIFA_KWH_DEFECTO
+        self.dispositivos = {}
+        self.contadores = Counter()
+        self._detener = asyncio.Event()
+
+    # ------------------------------------------------------------ Base de datos (en hilos)
+
+    def _cargar_dispositivos(self):
+        from extensions import db
+        from models.dispositivo import Dispositivo
+
+        with self.app.app_context():
+            filas = db.session.query(Dispositivo.id, Dispositivo.usuario_id, Dispositivo.potencia_watts).all()
+            db.session.remove()
+        return {
+            id_: (usuario_id, potencia, token_dispositivo(id_, self.secreto).encode('ascii'))
+            for id_, usuario_id, potencia in filas
+        }
+
+    def _guardar(self, lote):
+        """Inserta el lote y aplica los deltas de resumen en una sola transacción"""
+        from collections import defaultdict
+        from sqlalchemy import insert, select
+        from extensions import db
+        from models.consumo import Consumo
+        from models.dispositivo import Dispositivo
+        from models.usuario import Usuario
+        from services.eventos import relay_eventos
+        from services.resumenes import aplicar_deltas, deltas_de_filas, nuevos_deltas
+
+        with self.app.app_context(), db.engine.begin() as conexion:
+            # Dispositivos borrados desde el último refresco de la cache no reciben lecturas
+            ids = {lectura[0] for lectura in lote}
+            vigentes = set(conexion.execute(select(Dispositivo.id).where(Dispositivo.id.in_(ids))).scalars())
+            if len(vigentes) < len(ids):
+                lote = [lectura for lectura in lote if lectura[0] in vigentes]
+
+            por_usuario = defaultdict(list)
+            for dispositivo_id, usuario_id, fecha, horas, kwh, costo in lote:
+                por_usuario[usuario_id].append({
+                    "dispositivo_id": dispositivo_id, "fecha": fecha,
+                    "horas_uso": horas, "consumo_kwh": kwh, "costo_lps": costo,
+                })
+
+            # Mismos deltas que la ingesta de la API; las claves empiezan por usuario_id y no se pisan
+            filas = []
+            deltas = nuevos_deltas()
+            for usuario_id, filas_usuario in por_usuario.items():
+                filas.extend(filas_usuario)
+                deltas.update(deltas_de_filas(usuario_id, filas_usuario))
+
+            if filas:
+                conexion.execute(insert(Consumo), filas)
+                aplicar_deltas(conexion, deltas)
+                conexion.execute(Usuario.tocar_telemetria(list(por_usuario)))
+        # Ya confirmadas: los dashboards abiertos las ven sin esperar al próximo refresco
+        if filas:
+            relay_eventos.publicar_deltas(deltas)
+        return len(filas)
+
+    # ------------------------------------------------------------ Tareas del event loop
+
+    async def refrescar_dispositivos(self):
+        while not self._detener.is_set():
+            try:
+                self.dispositivos = await asyncio.to_thread(self._cargar_dispositivos)
+            except Exception as e:
+                print(f"⚠️ No se pudo refrescar la lista de dispositivos: {str(e)}")
+            try:
+                await asyncio.wait_for(self._detener.wait(), self.refresco)
+            except asyncio.TimeoutError:
+                pass
+
+    async def volcar(self):
+        """Vuelca cada `intervalo` segundos, o antes si ya hay un lote completo"""
+        while True:
+            if not self._detener.is_set() and len(self.anillo) < self.lote:
+                try:
+                    await asyncio.wait_for(self.anillo.hay_lote.wait(), self.intervalo)
+                except asyncio.TimeoutError:
+                    pass
+            lote = self.anillo.drenar(self.lote)
+            if not lote:
+                # Al detenerse se sigue volcando hasta vaciar el buffer
+                if self._detener.is_set():
+                    return
+                continue
+
+            for intento in range(1, REINTENTOS_VOLCADO + 1):
+                try:
+                    insertadas = await asyncio.to_thread(self._guardar, lote)
+                    self.contadores["insertadas"] += insertadas
+                    self.contadores["descartadas_bd"] += len(lote) - insertadas
+                    break
+                except Exception as e:
+                    print(f"⚠️ Error volcando {len(lote)} lecturas (intento {intento}): {str(e)}")
+                    await asyncio.sleep(0.2 * intento)
+            else:
+                self.contadores["perdidas"] += len(lote)
+                print(f"❌ Se perdieron {len(lote)} lecturas tras {REINTENTOS_VOLCADO} intentos")
+
+    async def informar(self, cada=10):
+        anterior, momento = 0, time.monotonic()
+        while not self._detener.is_set():
+            try:
+                await asyncio.wait_for(self._detener.wait(), cada)
+            except asyncio.TimeoutError:
+                pass
+            ahora = time.monotonic()
+            insertadas = self.contadores["insertadas"]
+            print(
+                f"📊 {insertadas - anterior} lecturas en {ahora - momento:.1f} s "
+                f"({(insertadas - anterior) / (ahora - momento):.0f}/s), en buffer {len(self.anillo)}, "
+                f"totales {dict(self.contadores)}"
+            )
+            anterior, momento = insertadas, ahora
+
+    def _procesar(self, lineas):
+        """Interpreta líneas y devuelve las lecturas válidas"""
+        validas = []
+        dispositivos, tarifa_kwh = self.dispositivos, self.tarifa_kwh
+        for linea in lineas:
+            if not linea.strip():
+                continue
+            try:
+                validas.append(interpretar_linea(linea, dispositivos, tarifa_kwh))
+            except LecturaInvalida as e:
+                self.contadores[f"rechazadas_{e}"] += 1
+        self.contadores["recibidas"] += len(validas)
+        return validas
+
+    async def atender_tcp(self, lector, escritor):
+        pendiente = b''
+        try:
+            while True:
+                bloque = await lector.read(65536)
+                if not bloque:
+                    break
+                *lineas, pendiente = (pendiente + bloque).split(b'\n')
+                if len(pendiente) > MAX_LINEA_BYTES:
+                    self.contadores["conexiones_cortadas"] += 1
+                    break
+                for lectura in self._procesar(lineas):
+                    # Backpressure: mientras el buffer está lleno no se lee más de este socket
+                    while not self.anillo.agregar(lectura):
+                        self.contadores["esperas_tcp"] += 1
+                        await self.anillo.hay_espacio.wait()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    def recibir_udp(self, datagrama):
+        for lectura in self._procesar(datagrama.split(b'\n')):
+            if not self.anillo.agregar(lectura):
+                self.contadores["descartadas_udp"] += 1
+
+    def detener(self):
+        self._detener.set()
+
+    async def ejecutar(self, host, puerto_tcp=None, puerto_udp=None):
+        self.dispositivos = await asyncio.to_thread(self._cargar_dispositivos)
+        print(f"✅ {len(self.dispositivos)} dispositivos autorizados")
+
+        bucle = asyncio.get_running_loop()
+        servidores, transporte_udp = [], None
+        if puerto_tcp:
+            servidores.append(await asyncio.start_server(self.atender_tcp, host, puerto_tcp))
+            print(f"📥 Telemetría TCP en {host}:{puerto_tcp}")
+        if puerto_udp:
+            servicio = self
+
+            class ProtocoloUDP(asyncio.DatagramProtocol):
+                def datagram_received(self, datos, direccion):
+                    servicio.recibir_udp(datos)
+
+            transporte_udp, _ = await bucle.create_datagram_endpoint(ProtocoloUDP, local_addr=(host, puerto_udp))
+            # Un buffer de kernel amplio absorbe ráfagas mientras el loop está volcando
+            transporte_udp.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_UDP_BYTES)
+            print(f"📥 Telemetría UDP en {host}:{puerto_udp}")
+
+        tareas = [
+            asyncio.create_task(self.volcar()),
+            asyncio.create_task(self.refrescar_dispositivos()),
+            asyncio.create_task(self.informar()),
+        ]
+        await self._detener.wait()
+
+        # Apagado ordenado: se deja de recibir y se vuelca lo que quede en el buffer
+        for servidor in servidores:
+            servidor.close()
+        if transporte_udp:
+            transporte_udp.close()
+        await asyncio.gather(*tareas)
+        print(f"✅ Telemetría detenida: {dict(self.contadores)}")
+
+
+def crear_app_telemetria():
+    from app import create_app
+
+    # Sin esquema ni migraciones: la API (o `flask db upgrade`) es quien los prepara
+    return create_app({'ESQUEMA_AL_INICIAR': False, 'REGISTRAR_MIGRACIONES': False})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de ingesta de telemetría")
+    parser.add_argument('--host', default=os.getenv('TELEMETRIA_HOST', '0.0.0.0'))
+    parser.add_argument('--tcp', type=int, default=int(os.getenv('TELEMETRIA_TCP', 9100)), help="Puerto TCP (0 = desactivado)")
+    parser.add_argument('--udp', type=int, default=int(os.getenv('TELEMETRIA_UDP', 0)), help="Puerto UDP (0 = desactivado)")
+    parser.add_argument('--capacidad', type=int, default=CAPACIDAD_DEFECTO, help="Lecturas máximas en el buffer")
+    parser.add_argument('--lote', type=int, default=LOTE_DEFECTO, help="Lecturas máximas por transacción")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_DEFECTO, help="Segundos entre volcados")
+    args = parser.parse_args(argv)
+    if not TELEMETRIA_SECRETO:
+        parser.error("define la variable de entorno TELEMETRIA_SECRETO")
+
+    servicio = ServicioTelemetria(crear_app_telemetria(), args.capacidad, args.lote, args.intervalo)
+
+    async def correr():
+        bucle = asyncio.get_running_loop()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            bucle.add_signal_handler(senal, servicio.detener)
+        await servicio.ejecutar(args.host, args.tcp, args.udp)
+
+    asyncio.run(correr())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app import create_app
+from routes.auth_middleware import cache_identidad
+from services.cache_pronostico import cache_pronostico
+from services.dashboard import cache_dashboard
+
+
+def estimador_prueba(nombre):
+    """Sustituye al LLM: las pruebas nunca salen a la red"""
+    return {"potencia_watts": 100, "categoria": "Otros"}
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Cada prueba con su propia base: nunca se toca database/powerflow.db
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'powerflow.db'),
+        'REGISTRAR_MIGRACIONES': False,
+        'JWT_SECRET': 'clave-de-pruebas-con-al-menos-32-bytes',
+        'ESTIMACIONES_CACHE_RUTA': '',
+        'ESTIMADOR_LLM': estimador_prueba,
+        'HASH_PROCESOS': 0,
+        'HASH_METODO': 'pbkdf2:sha256:1000',
+        'PURGA_PAUSA_MS': 0,
+        # Sin servicio de eventos: las pruebas de eventos levantan el suyo
+        'EVENTOS_RELAY': '',
+    })
+    # Las caches son del proceso y sobreviven entre apps
+    for cache in (cache_identidad, cache_dashboard, cache_pronostico):
+        cache.limpiar()
+    yield app
+    with app.app_context():
+        from extensions import db
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+def registrar(cliente, correo='ana@powerflow.hn', password='secreto1'):
+    """Crea la cuenta, inicia sesión y devuelve las cabeceras con el token"""
+    cliente.post('/api/usuarios', json={'nombre': 'Ana', 'correo': correo, 'password': password})
+    respuesta = cliente.post('/api/login', json={'correo': correo, 'password': password})
+    return {'Authorization': 'Bearer ' + respuesta.get_json()['token']}
+
+
+@pytest.fixture
+def auth(cliente):
+    return registrar(cliente)
+
+
+def crear_dispositivo(cliente, auth, nombre, potencia_watts, horas_uso_dia, categoria='Otros'):
+    respuesta = cliente.post('/api/dispositivos', headers=auth, json={
+        'nombre': nombre, 'potencia_watts': potencia_watts, 'horas_uso_dia': horas_uso_dia, 'categoria': categoria,
+    })
+    assert respuesta.status_code == 201, respuesta.get_json()
+    return respuesta.get_json()['dispositivo']['id']
+
+
+def ingerir(cliente, auth, lecturas):
+    """Envía lecturas {dispositivo_id, fecha, horas_uso[, consumo_kwh]} por la ingesta NDJSON"""
+    import json
+    cuerpo = ''.join(json.dumps(lectura) + '\n' for lectura in lecturas)
+    respuesta = cliente.post('/api/consumos/ingesta', headers=auth, data=cuerpo, content_type='application/x-ndjson')
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return respuesta.get_json()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from services.cache_estimaciones import BackendMemoria, BackendSQLite, CacheEstimaciones
+
+
+def test_estimaciones_comparten_una_llamada():
+    llamadas = []
+    liberar = threading.Event()
+
+    def estimador(nombre):
+        llamadas.append(nombre)
+        liberar.wait(2)
+        return {"potencia_watts": 100, "categoria": "Otros"}
+
+    cache = CacheEstimaciones(estimador, BackendMemoria())
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener("Televisor Samsung"))) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.1)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(llamadas) == 1
+    assert resultados == [{"potencia_watts": 100, "categoria": "Otros"}] * 5
+    assert cache.obtener("televisor  samsung") == resultados[0]  # misma clave normalizada
+
+
+def test_espera_compartida_acotada():
+    liberar = threading.Event()
+
+    def colgado(nombre):
+        liberar.wait(5)
+        return {"potencia_watts": 100, "categoria": "Otros"}
+
+    cache = CacheEstimaciones(colgado, BackendMemoria(), espera_compartida=0.1)
+    lider = threading.Thread(target=cache.obtener, args=("Refrigerador",))
+    lider.start()
+    time.sleep(0.05)
+
+    inicio = time.monotonic()
+    assert cache.obtener("Refrigerador") is None
+    assert time.monotonic() - inicio < 1
+    assert cache.estadisticas()["esperas_agotadas"] == 1
+
+    liberar.set()
+    lider.join()
+    assert cache.estadisticas()["en_vuelo"] == 0
+
+
+def test_aciertos_sqlite_no_escriben_en_cada_lectura(tmp_path):
+    backend = BackendSQLite(str(tmp_path / 'estimaciones.db'), intervalo_usos=3600, max_usos_pendientes=3)
+    for nombre in ('a', 'b', 'c'):
+        backend.guardar(nombre, {"potencia_watts": 1}, time.time() + 60)
+
+    def usado(clave):
+        return backend._conexion().execute("SELECT usado FROM estimaciones WHERE clave = ?", (clave,)).fetchone()[0]
+
+    antes = usado('a')
+    time.sleep(0.01)
+    assert backend.obtener('a')[0] == {"potencia_watts": 1}
+    backend.obtener('b')
+    assert usado('a') == antes  # aún en memoria
+
+    backend.obtener('c')  # tercer uso pendiente: se escriben juntos
+    assert usado('a') > antes
+    assert backend._usos == {}
+
+
+def test_desalojo_ve_los_usos_pendientes(tmp_path):
+    backend = BackendSQLite(str(tmp_path / 'estimaciones.db'), intervalo_usos=3600)
+    for nombre in ('viejo', 'nuevo'):
+        backend.guardar(nombre, {"potencia_watts": 1}, time.time() + 60)
+        time.sleep(0.01)
+    backend.obtener('viejo')
+    backend.desalojar(1)
+    assert backend.obtener('viejo') is not None
+    assert backend.obtener('nuevo') is None
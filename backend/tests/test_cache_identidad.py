@@ -0,0 +1,37 @@
+import time
+
+from routes.auth_middleware import CacheIdentidad, UsuarioIdentidad, cache_identidad
+
+
+def test_ttl_no_supera_la_expiracion_del_token():
+    cache = CacheIdentidad(ttl_segundos=60)
+    identidad = UsuarioIdentidad(1, 'Ana', 'ana@powerflow.hn')
+    cache.guardar('vence-pronto', identidad, exp=time.time() + 0.05)
+    cache.guardar('vence-tarde', identidad, exp=time.time() + 3600)
+    assert cache.obtener(1, 'vence-pronto') == identidad
+    time.sleep(0.1)
+    assert cache.obtener(1, 'vence-pronto') is None
+    assert cache.obtener(1, 'vence-tarde') == identidad
+
+
+def test_desaloja_la_menos_usada():
+    cache = CacheIdentidad(max_entradas=2)
+    for usuario_id in (1, 2):
+        cache.guardar('t', UsuarioIdentidad(usuario_id, 'U', 'u@powerflow.hn'))
+    # Leer la 1 la deja como la más reciente: sale la 2
+    assert cache.obtener(1, 't') is not None
+    cache.guardar('t', UsuarioIdentidad(3, 'U', 'u@powerflow.hn'))
+    assert cache.obtener(2, 't') is None
+    assert cache.obtener(1, 't') is not None
+    assert cache.obtener(3, 't') is not None
+    assert cache.estadisticas()["entradas"] == 2
+
+
+def test_token_deja_de_valer_al_eliminar_la_cuenta(cliente, auth):
+    assert cliente.get('/api/dispositivos', headers=auth).status_code == 200
+    assert cache_identidad.estadisticas()["entradas"] == 1
+
+    # Sin invalidar, la entrada en cache seguiría aceptando el token
+    assert cliente.delete('/api/usuarios/1').status_code == 200
+    assert cache_identidad.estadisticas()["entradas"] == 0
+    assert cliente.get('/api/dispositivos', headers=auth).status_code == 401
@@ -0,0 +1,54 @@
+import pytest
+
+from services.catalogo import buscar_en_catalogo
+
+
+@pytest.mark.parametrize("nombre, clave", [
+    # "aire acondicionado" (dos tokens) gana a "ac" y a cualquier token suelto
+    ("Aire acondicionado del cuarto", "aire acondicionado"),
+    ("AC split", "ac"),
+    # A igual número de tokens, gana la clave con más caracteres
+    ("Foco LED de la sala", "foco"),
+    # El recorrido lineal devolvía "led", la primera clave en orden del dict
+    ("Televisor LED", "televisor"),
+])
+def test_coincidencia_mas_larga(nombre, clave):
+    coincidencia = buscar_en_catalogo(nombre)
+    assert (coincidencia.clave, coincidencia.metodo) == (clave, 'bd_estatica')
+
+
+@pytest.mark.parametrize("nombre", ["Lavadora", "Tractor", "Acuario"])
+def test_subcadena_no_coincide(nombre):
+    # "ac" aparece dentro de estos nombres, pero no como palabra
+    coincidencia = buscar_en_catalogo(nombre)
+    assert coincidencia is None or coincidencia.clave != 'ac'
+
+
+def test_lavadora_no_es_aire_acondicionado():
+    assert buscar_en_catalogo("Lavadora").clave == 'lavadora'
+
+
+@pytest.mark.parametrize("nombre, clave", [
+    ("Lámpara de noche", "lampara"),
+    ("Televisores", "televisor"),
+    ("Bombillas", "bombilla"),
+    ("TELEVISIÓN", "television"),
+])
+def test_acentos_y_plurales(nombre, clave):
+    coincidencia = buscar_en_catalogo(nombre)
+    assert (coincidencia.clave, coincidencia.metodo) == (clave, 'bd_estatica')
+
+
+@pytest.mark.parametrize("nombre, clave", [
+    ("Refrigerdor", "refrigerador"),   # falta una letra
+    ("Microndas", "microondas"),
+    ("Licaudora", "licuadora"),       # dos letras transpuestas
+])
+def test_un_error_de_escritura(nombre, clave):
+    coincidencia = buscar_en_catalogo(nombre)
+    assert (coincidencia.clave, coincidencia.metodo) == (clave, 'bd_estatica_aproximada')
+
+
+def test_tokens_cortos_solo_exactos():
+    # "tc" está a distancia 1 de "tv" y "ac", pero los tokens cortos no se corrigen
+    assert buscar_en_catalogo("tc") is None
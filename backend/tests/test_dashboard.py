@@ -0,0 +1,33 @@
+import threading
+
+from services.dashboard import CacheDashboard
+
+
+def test_dashboard_no_guarda_versiones_de_mas():
+    cache = CacheDashboard()
+    for usuario_id in range(100):
+        cache.obtener(usuario_id, 5, lambda: {"total": 1})
+        cache.invalidar_usuario(usuario_id)
+    assert cache._en_curso == {}
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_dashboard_descarta_calculo_invalidado():
+    cache = CacheDashboard()
+    empezado, seguir = threading.Event(), threading.Event()
+
+    def calcular():
+        empezado.set()
+        seguir.wait(2)
+        return {"total": "viejo"}
+
+    hilo = threading.Thread(target=cache.obtener, args=(1, 5, calcular))
+    hilo.start()
+    empezado.wait(2)
+    cache.invalidar_usuario(1)
+    seguir.set()
+    hilo.join()
+
+    # El resultado viejo no quedó en cache y la versión se descartó
+    assert cache.obtener(1, 5, lambda: {"total": "nuevo"}) == {"total": "nuevo"}
+    assert cache._en_curso == {}
@@ -0,0 +1,66 @@
+import time
+
+from sqlalchemy import func, select
+
+from conftest import crear_dispositivo, ingerir, registrar
+from extensions import db
+from models.consumo import Consumo
+from models.dispositivo import Dispositivo
+from models.resumen import ConsumoDiario, ConsumoMensual
+from models.usuario import Usuario
+from services.purga_usuarios import purga_usuarios
+
+
+def conteos(app):
+    with app.app_context():
+        return {
+            modelo.__tablename__: db.session.scalar(select(func.count()).select_from(modelo))
+            for modelo in (Usuario, Dispositivo, Consumo, ConsumoDiario, ConsumoMensual)
+        }
+
+
+def cuenta_con_lecturas(cliente, auth, dias=10):
+    aire = crear_dispositivo(cliente, auth, 'Aire', 1000, 8)
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    ingerir(cliente, auth, [
+        {'dispositivo_id': d, 'fecha': f'2026-01-{dia:02d}', 'horas_uso': 2}
+        for d in (aire, foco) for dia in range(1, dias + 1)
+    ])
+
+
+def test_borrado_en_cascada(app, cliente, auth):
+    cuenta_con_lecturas(cliente, auth)
+    # Otra cuenta que no debe verse afectada
+    otro = registrar(cliente, 'otro@powerflow.hn')
+    crear_dispositivo(cliente, otro, 'Radio', 20, 3)
+
+    respuesta = cliente.delete('/api/usuarios/1')
+    assert respuesta.status_code == 200
+    assert conteos(app) == {
+        'usuarios': 1, 'dispositivos': 1, 'consumos': 0, 'consumos_diarios': 0, 'consumos_mensuales': 0,
+    }
+    # El token de la cuenta borrada deja de servir
+    assert cliente.get('/api/dispositivos', headers=auth).status_code == 401
+
+
+def test_cuenta_grande_se_purga_en_segundo_plano(app, cliente, auth, monkeypatch):
+    monkeypatch.setattr(purga_usuarios, 'umbral', 5)
+    monkeypatch.setattr(purga_usuarios, 'tamano_bloque', 7)  # varios bloques
+    cuenta_con_lecturas(cliente, auth)
+
+    respuesta = cliente.delete('/api/usuarios/1')
+    assert respuesta.status_code == 202
+    # Mientras se purga la cuenta no puede iniciar sesión
+    login = cliente.post('/api/login', json={'correo': 'ana@powerflow.hn', 'password': 'secreto1'})
+    assert login.status_code == 401
+
+    limite = time.monotonic() + 10
+    while conteos(app)['usuarios'] and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert conteos(app) == {
+        'usuarios': 0, 'dispositivos': 0, 'consumos': 0, 'consumos_diarios': 0, 'consumos_mensuales': 0,
+    }
+
+
+def test_usuario_inexistente(cliente):
+    assert cliente.delete('/api/usuarios/99').status_code == 404
@@ -0,0 +1,159 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from eventos.servidor import ServicioEventos
+from services.eventos import clave_eventos, emitir_ticket, leer_ticket, relay_eventos
+
+SECRETO = 'clave-de-pruebas-con-al-menos-32-bytes'
+
+
+@pytest.fixture
+def servicio(monkeypatch):
+    """Servicio de eventos en su propio event loop, con el relay de la API apuntándole"""
+    servicio = ServicioEventos(clave_eventos(SECRETO), latido=0.2, reintento_ms=3000)
+    bucle = asyncio.new_event_loop()
+    hilo = threading.Thread(
+        target=bucle.run_until_complete, args=(servicio.ejecutar('127.0.0.1', 0, '127.0.0.1', 0),), daemon=True,
+    )
+    hilo.start()
+    limite = time.monotonic() + 5
+    while servicio.puertos is None and time.monotonic() < limite:
+        time.sleep(0.01)
+    monkeypatch.setattr(relay_eventos, 'destino', ('127.0.0.1', servicio.puertos[1]))
+    monkeypatch.setattr(relay_eventos, 'clave', clave_eventos(SECRETO))
+    yield servicio
+    bucle.call_soon_threadsafe(servicio.detener)
+    hilo.join(5)
+    bucle.close()
+
+
+def pedir_ticket(cliente, auth):
+    respuesta = cliente.post('/api/eventos/ticket', headers=auth)
+    assert respuesta.status_code == 200
+    return respuesta.get_json()['ticket']
+
+
+def abrir(servicio, ticket, ruta='/api/eventos'):
+    conexion = socket.create_connection(('127.0.0.1', servicio.puertos[0]), timeout=5)
+    conexion.sendall(f"GET {ruta}?ticket={ticket} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('ascii'))
+    return conexion
+
+
+def leer_hasta(conexion, marca, leido=b''):
+    while marca not in leido:
+        bloque = conexion.recv(65536)
+        if not bloque:
+            break
+        leido += bloque
+    return leido
+
+
+def esperar(condicion):
+    limite = time.monotonic() + 5
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_ticket_firmado_por_la_api(cliente, auth):
+    ticket = pedir_ticket(cliente, auth)
+    usuario_id, expira, _ = leer_ticket(clave_eventos(SECRETO), ticket)
+    assert usuario_id == 1
+    assert 0 < expira - time.time() <= 30
+
+    # Otra clave, una firma alterada o un ticket vencido no sirven
+    assert leer_ticket(clave_eventos('otra-clave'), ticket) is None
+    assert leer_ticket(clave_eventos(SECRETO), ticket[:-2] + 'xx') is None
+    assert leer_ticket(clave_eventos(SECRETO), emitir_ticket(clave_eventos(SECRETO), 1, -1)) is None
+    assert cliente.post('/api/eventos/ticket').status_code == 401
+
+
+def test_ticket_de_un_solo_uso(cliente, auth, servicio):
+    ticket = pedir_ticket(cliente, auth)
+    conexion = abrir(servicio, ticket)
+    try:
+        recibido = leer_hasta(conexion, b'event: conectado')
+        assert recibido.startswith(b'HTTP/1.1 200 OK')
+        assert b'Content-Type: text/event-stream' in recibido
+        assert b'retry: 3000' in recibido
+
+        otra = abrir(servicio, ticket)
+        assert leer_hasta(otra, b'\r\n\r\n').startswith(b'HTTP/1.1 401')
+        otra.close()
+    finally:
+        conexion.close()
+    assert esperar(lambda: servicio.total == 0)
+
+
+def test_jwt_no_abre_el_flujo(auth, servicio):
+    conexion = abrir(servicio, auth['Authorization'].split(' ')[1])
+    assert leer_hasta(conexion, b'\r\n\r\n').startswith(b'HTTP/1.1 401')
+    conexion.close()
+
+
+def test_eventos_de_la_api_llegan_al_flujo(cliente, auth, servicio):
+    conexion = abrir(servicio, pedir_ticket(cliente, auth))
+    try:
+        leer_hasta(conexion, b'event: conectado')
+        respuesta = cliente.post('/api/dispositivos', headers=auth, json={
+            'nombre': 'Foco', 'potencia_watts': 60, 'horas_uso_dia': 5, 'categoria': 'Iluminación',
+        })
+        assert respuesta.status_code == 201
+        recibido = leer_hasta(conexion, b'"nombre": "Foco"')
+        assert b'event: dispositivo_creado' in recibido
+
+        # Sin eventos, un latido mantiene viva la conexión
+        assert b': latido' in leer_hasta(conexion, b': latido')
+
+        # Al borrar la cuenta, su flujo se cierra
+        assert cliente.delete('/api/usuarios/1').status_code == 200
+        assert esperar(lambda: servicio.total == 0)
+    finally:
+        conexion.close()
+
+
+def test_tope_de_conexiones_responde_503(cliente, auth, servicio):
+    servicio.max_conexiones = 1
+    abierta = abrir(servicio, pedir_ticket(cliente, auth))
+    try:
+        leer_hasta(abierta, b'event: conectado')
+        rechazada = abrir(servicio, pedir_ticket(cliente, auth))
+        respuesta = leer_hasta(rechazada, b'\r\n\r\n')
+        assert respuesta.startswith(b'HTTP/1.1 503')
+        assert b'Retry-After: 3' in respuesta
+        rechazada.close()
+    finally:
+        abierta.close()
+
+
+def test_conexiones_inactivas_no_ocupan_hilos(cliente, auth, servicio):
+    servicio.max_por_usuario = 500
+    hilos = threading.active_count()
+    conexiones = [abrir(servicio, pedir_ticket(cliente, auth)) for _ in range(300)]
+    try:
+        for conexion in conexiones:
+            leer_hasta(conexion, b'event: conectado')
+        assert servicio.total == 300
+        assert threading.active_count() <= hilos + 1  # a lo sumo el hilo del relay
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+    assert esperar(lambda: servicio.total == 0)
+
+
+def test_relay_sin_saludo_valido_se_rechaza(servicio):
+    conexion = socket.create_connection(('127.0.0.1', servicio.puertos[1]), timeout=5)
+    conexion.sendall(b'no-soy-la-api\n{"usuario_id": 1, "tipo": "x", "datos": {}}\n')
+    assert conexion.recv(1) == b''
+    conexion.close()
+    assert servicio.contadores["relays_rechazados"] == 1
+
+
+def test_ruta_desconocida(servicio):
+    conexion = abrir(servicio, 'x', ruta='/api/otra')
+    assert leer_hasta(conexion, b'\r\n\r\n').startswith(b'HTTP/1.1 404')
+    conexion.close()
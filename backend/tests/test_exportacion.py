@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from conftest import crear_dispositivo, ingerir
+
+ENCABEZADO = ['id', 'dispositivo_id', 'dispositivo', 'fecha', 'horas_uso', 'consumo_kwh', 'costo_lps']
+
+
+def preparar(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 100, 5)
+    ingerir(cliente, auth, [
+        {'dispositivo_id': foco, 'fecha': f'2026-01-{dia:02d}', 'horas_uso': 2} for dia in range(1, 6)
+    ])
+
+
+def leer_csv(respuesta):
+    return list(csv.reader(io.StringIO(respuesta.get_data(as_text=True))))
+
+
+def test_csv_completo(cliente, auth):
+    preparar(cliente, auth)
+    filas = leer_csv(cliente.get('/api/consumos/exportar', headers=auth))
+    assert filas[0] == ENCABEZADO
+    assert [f[0] for f in filas[1:]] == ['1', '2', '3', '4', '5']
+    assert filas[1][2:5] == ['Foco', '2026-01-01', '2.0']
+    assert float(filas[1][6]) == pytest.approx(0.2 * 3.7)
+
+
+def test_csv_reanudado_sin_encabezado(cliente, auth):
+    preparar(cliente, auth)
+    completo = cliente.get('/api/consumos/exportar', headers=auth).get_data(as_text=True)
+    cortado = completo[:completo.index('\n3,') + 1]
+
+    resto = cliente.get('/api/consumos/exportar?despues_de=2', headers=auth).get_data(as_text=True)
+    assert not resto.startswith('id,')
+    assert cortado + resto == completo
+
+
+def test_ndjson_y_gzip(cliente, auth):
+    preparar(cliente, auth)
+    respuesta = cliente.get('/api/consumos/exportar?formato=ndjson&despues_de=3', headers={
+        **auth, 'Accept-Encoding': 'gzip',
+    })
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    lineas = gzip.decompress(respuesta.get_data()).decode('utf-8').splitlines()
+    assert [json.loads(linea)['id'] for linea in lineas] == [4, 5]
+
+
+def test_parametros_invalidos(cliente, auth):
+    assert cliente.get('/api/consumos/exportar?formato=xml', headers=auth).status_code == 400
+    assert cliente.get('/api/consumos/exportar?despues_de=x', headers=auth).status_code == 400
+    assert cliente.get('/api/consumos/exportar?desde=2026-13-01', headers=auth).status_code == 400
+    assert cliente.get('/api/consumos/exportar?dispositivo_id=99', headers=auth).status_code == 404
@@ -0,0 +1,44 @@
+import pytest
+
+from services import groq_cliente
+
+
+@pytest.fixture
+def concurrencia_uno(monkeypatch):
+    monkeypatch.setattr(groq_cliente, 'GROQ_ESPERA_CONCURRENCIA', 0.05)
+    groq_cliente.configurar_concurrencia(1)
+    yield groq_cliente._limite_llamadas
+    groq_cliente.configurar_concurrencia(groq_cliente.GROQ_CONCURRENCIA)
+
+
+def test_sin_lugar_cae_al_defecto_sin_llamar(concurrencia_uno, monkeypatch):
+    def no_llamar():
+        raise AssertionError("no debía salir a la red")
+    monkeypatch.setattr(groq_cliente, '_requests', no_llamar)
+
+    # Otra llamada ocupa el único lugar y el LLM no responde
+    concurrencia_uno.acquire()
+    try:
+        assert groq_cliente.estimar_con_groq('Refrigerador') is None
+        assert groq_cliente.estimar_lote_con_groq(['a', 'b']) == [None, None]
+    finally:
+        concurrencia_uno.release()
+
+
+@pytest.mark.parametrize("respuesta", [
+    'no es json',
+    '{"potencia_watts": 40, "categoria": "Otros"}',
+    '[{"potencia_watts": 40, "categoria": "Otros"}]',
+    '[{"potencia_watts": 40, "categoria": "Otros"}, {"potencia_watts": 40, "categoria": "Otros"}',
+])
+def test_lote_con_respuesta_mal_formada(monkeypatch, respuesta):
+    monkeypatch.setattr(groq_cliente, '_consultar_groq', lambda *args, **kwargs: respuesta)
+    assert groq_cliente.estimar_lote_con_groq(['Deshumidificador', 'Bomba de agua']) == [None, None]
+
+
+def test_lote_descarta_solo_los_elementos_invalidos(monkeypatch):
+    respuesta = '```json\n[{"potencia_watts": 300, "categoria": "Otros"}, {"potencia_watts": 750}]\n```'
+    monkeypatch.setattr(groq_cliente, '_consultar_groq', lambda *args, **kwargs: respuesta)
+    assert groq_cliente.estimar_lote_con_groq(['Deshumidificador', 'Bomba de agua']) == [
+        {"potencia_watts": 300, "categoria": "Otros"}, None,
+    ]
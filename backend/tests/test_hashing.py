@@ -0,0 +1,87 @@
+import pytest
+
+from conftest import registrar
+from models.usuario import Usuario
+from services import hashing
+from services.hashing import PoolHash, SobrecargaHash, pool_hash
+
+
+def hash_guardado(app, correo='ana@powerflow.hn'):
+    with app.app_context():
+        return Usuario.query.filter_by(correo=correo).first().password
+
+
+def login(cliente, correo='ana@powerflow.hn', password='secreto1'):
+    return cliente.post('/api/login', json={'correo': correo, 'password': password})
+
+
+def test_login_actualiza_hash_viejo(app, cliente, monkeypatch):
+    registrar(cliente)
+    assert hash_guardado(app).startswith('pbkdf2:sha256:1000$')
+
+    monkeypatch.setattr(pool_hash, 'metodo', 'pbkdf2:sha256:2000')
+    assert login(cliente).status_code == 200
+    assert hash_guardado(app).startswith('pbkdf2:sha256:2000$')
+    # La contraseña sigue sirviendo con el hash nuevo
+    assert login(cliente).status_code == 200
+
+
+def test_correo_desconocido_igual_que_password_incorrecta(cliente):
+    registrar(cliente)
+    desconocido = login(cliente, correo='nadie@powerflow.hn')
+    incorrecta = login(cliente, password='otra-clave')
+    assert desconocido.status_code == incorrecta.status_code == 401
+    assert desconocido.get_json() == incorrecta.get_json()
+
+
+def test_rehash_con_pool_ocupado_no_impide_el_login(app, cliente, monkeypatch):
+    registrar(cliente)
+    antes = hash_guardado(app)
+
+    def ocupado(password):
+        raise SobrecargaHash()
+    monkeypatch.setattr(pool_hash, 'metodo', 'pbkdf2:sha256:2000')
+    monkeypatch.setattr(pool_hash, 'generar', ocupado)
+
+    respuesta = login(cliente)
+    assert respuesta.status_code == 200
+    assert 'token' in respuesta.get_json()
+    assert hash_guardado(app) == antes
+
+
+def test_verificacion_con_pool_ocupado_responde_503(cliente, monkeypatch):
+    registrar(cliente)
+
+    def ocupado(password_hash, password):
+        raise SobrecargaHash()
+    monkeypatch.setattr(pool_hash, 'verificar', ocupado)
+    assert login(cliente).status_code == 503
+
+
+def test_pool_sin_cupos_lanza_sobrecarga():
+    pool = PoolHash(procesos=1, max_pendientes=1, espera_maxima=0.01)
+    pool._cupos.acquire()
+    # Sin cupo libre no se llega a crear el pool de procesos
+    with pytest.raises(SobrecargaHash):
+        pool.generar('secreto1')
+    assert pool._pool is None
+
+
+def test_simular_verificacion_espera_la_media(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(hashing.time, 'sleep', esperas.append)
+    pool = PoolHash(procesos=0, metodo='pbkdf2:sha256:1000')
+
+    pool.simular_verificacion()
+    assert esperas == [hashing.ESPERA_INICIAL]
+
+    pool.verificar(pool.generar('secreto1'), 'secreto1')
+    pool.simular_verificacion()
+    assert esperas[-1] == pool._media_verificacion
+
+
+def test_necesita_rehash():
+    pool = PoolHash(procesos=0, metodo='pbkdf2:sha256:2000')
+    assert pool.necesita_rehash('pbkdf2:sha256:1000$sal$hash')
+    assert pool.necesita_rehash('scrypt:32768:8:1$sal$hash')
+    assert not pool.necesita_rehash('pbkdf2:sha256:2000$sal$hash')
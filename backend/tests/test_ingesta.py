@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import crear_dispositivo
+from services.ingesta import MAX_LINEA_BYTES, normalizar_fila
+
+
+@pytest.mark.parametrize("campos", [
+    {"horas_uso": float('nan')},
+    {"horas_uso": 'inf'},
+    {"horas_uso": 2, "consumo_kwh": float('inf')},
+    {"horas_uso": 2, "consumo_kwh": 'nan'},
+    {"horas_uso": 2, "consumo_kwh": -1},
+    {"horas_uso": 2, "costo_lps": float('-inf')},
+    {"horas_uso": 2, "costo_lps": -5},
+])
+def test_valores_no_finitos_o_negativos(campos):
+    with pytest.raises(ValueError):
+        normalizar_fila({"dispositivo_id": 1, "fecha": "2026-01-01", **campos}, {1: 100})
+
+
+def test_dispositivo_id_infinito():
+    with pytest.raises(ValueError):
+        normalizar_fila({"dispositivo_id": float('inf'), "horas_uso": 1}, {1: 100})
+
+
+def test_fila_no_finita_no_tumba_el_lote(cliente, auth):
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    cuerpo = (
+        f'{{"dispositivo_id": {dispositivo}, "fecha": "2026-01-01", "horas_uso": 2}}\n'
+        f'{{"dispositivo_id": {dispositivo}, "fecha": "2026-01-02", "horas_uso": NaN}}\n'
+        f'{{"dispositivo_id": {dispositivo}, "fecha": "2026-01-03", "horas_uso": 1, "consumo_kwh": Infinity}}\n'
+    )
+    respuesta = cliente.post('/api/consumos/ingesta', headers=auth, data=cuerpo, content_type='application/x-ndjson')
+    resultado = respuesta.get_json()
+    assert resultado["aceptados"] == 1
+    assert resultado["rechazados"] == 2
+    assert [e["linea"] for e in resultado["lotes"][0]["errores"]] == [2, 3]
+
+
+def test_csv_rechaza_nan(cliente, auth):
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    cuerpo = f"dispositivo_id,fecha,horas_uso,costo_lps\n{dispositivo},2026-01-01,2,nan\n{dispositivo},2026-01-02,2,\n"
+    respuesta = cliente.post('/api/consumos/ingesta', headers=auth, data=cuerpo, content_type='text/csv')
+    resultado = respuesta.get_json()
+    assert (resultado["aceptados"], resultado["rechazados"]) == (1, 1)
+
+
+@pytest.mark.parametrize("valor", [True, 1.9, 1.0, '1.9', ' ', '-1', None])
+def test_dispositivo_id_no_entero(valor):
+    with pytest.raises(ValueError):
+        normalizar_fila({"dispositivo_id": valor, "horas_uso": 1}, {1: 100})
+
+
+def test_dispositivo_id_texto_de_csv():
+    assert normalizar_fila({"dispositivo_id": '1', "horas_uso": 1}, {1: 100})["dispositivo_id"] == 1
+
+
+def test_ndjson_rechaza_bool_y_decimales(cliente, auth):
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    cuerpo = (
+        '{"dispositivo_id": true, "fecha": "2026-01-01", "horas_uso": 2}\n'
+        f'{{"dispositivo_id": {dispositivo}.9, "fecha": "2026-01-02", "horas_uso": 2}}\n'
+        f'{{"dispositivo_id": {dispositivo}, "fecha": "2026-01-03", "horas_uso": 2}}\n'
+    )
+    respuesta = cliente.post('/api/consumos/ingesta', headers=auth, data=cuerpo, content_type='application/x-ndjson')
+    resultado = respuesta.get_json()
+    assert (resultado["aceptados"], resultado["rechazados"]) == (1, 2)
+
+
+@pytest.mark.parametrize("content_type, linea_larga", [
+    ('application/x-ndjson', '{"dispositivo_id": 1, "nota": "' + 'x' * MAX_LINEA_BYTES + '"}\n'),
+    ('text/csv', '1,2026-01-02,' + '9' * MAX_LINEA_BYTES + '\n'),
+])
+def test_linea_demasiado_larga_corta_el_cuerpo(cliente, auth, content_type, linea_larga):
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    if content_type == 'text/csv':
+        cuerpo = f"dispositivo_id,fecha,horas_uso\n{dispositivo},2026-01-01,2\n" + linea_larga
+    else:
+        cuerpo = f'{{"dispositivo_id": {dispositivo}, "fecha": "2026-01-01", "horas_uso": 2}}\n' + linea_larga
+    respuesta = cliente.post('/api/consumos/ingesta', headers=auth, data=cuerpo, content_type=content_type)
+    resultado = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert resultado["aceptados"] == 1
+    assert "supera" in resultado["error"]
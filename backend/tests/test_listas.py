@@ -0,0 +1,67 @@
+from conftest import crear_dispositivo, registrar
+from extensions import db
+
+
+def registrar_selects(app):
+    """Lista que acumula las sentencias SELECT que ejecuta la base"""
+    from sqlalchemy import event
+    sentencias = []
+
+    def antes(conexion, cursor, sql, parametros, contexto, executemany):
+        if sql.lstrip().upper().startswith('SELECT'):
+            sentencias.append(sql)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', antes)
+    return sentencias
+
+
+def test_304_no_consulta_las_filas(app, cliente, auth):
+    crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    respuesta = cliente.get('/api/dispositivos', headers=auth)
+    etag = respuesta.headers['ETag']
+
+    sentencias = registrar_selects(app)
+    respuesta = cliente.get('/api/dispositivos', headers={**auth, 'If-None-Match': etag})
+    assert respuesta.status_code == 304
+    assert not any('FROM dispositivos' in sql for sql in sentencias)
+
+
+def test_etag_cambia_con_cada_escritura(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    etags = [cliente.get('/api/dispositivos', headers=auth).headers['ETag']]
+
+    cliente.put(f'/api/dispositivos/{foco}', headers=auth, json={'nombre': 'Foco LED'})
+    etags.append(cliente.get('/api/dispositivos', headers=auth).headers['ETag'])
+    cliente.post('/api/dispositivos/lote', headers=auth, json={
+        'operaciones': [{'op': 'editar', 'id': foco, 'potencia_watts': 9}],
+    })
+    etags.append(cliente.get('/api/dispositivos', headers=auth).headers['ETag'])
+    cliente.delete(f'/api/dispositivos/{foco}', headers=auth)
+    etags.append(cliente.get('/api/dispositivos', headers=auth).headers['ETag'])
+
+    assert len(set(etags)) == 4
+    respuesta = cliente.get('/api/dispositivos', headers={**auth, 'If-None-Match': etags[1]})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json() == []
+
+
+def test_etag_de_usuarios_cambia_con_altas_y_bajas(cliente):
+    auth = registrar(cliente)
+    etag = cliente.get('/api/usuarios').headers['ETag']
+    assert cliente.get('/api/usuarios', headers={'If-None-Match': etag}).status_code == 304
+
+    registrar(cliente, correo='beto@powerflow.hn')
+    respuesta = cliente.get('/api/usuarios', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert len(respuesta.get_json()) == 2
+
+
+def test_paginas_con_cursor(cliente, auth):
+    ids = [crear_dispositivo(cliente, auth, f'Foco {i}', 60, 5) for i in range(3)]
+    primera = cliente.get('/api/dispositivos?limite=2&fields=nombre', headers=auth)
+    assert [d['id'] for d in primera.get_json()] == ids[:2]
+    assert primera.headers['X-Siguiente-Cursor'] == str(ids[1])
+    segunda = cliente.get(f'/api/dispositivos?limite=2&despues_de={ids[1]}', headers=auth)
+    assert [d['id'] for d in segunda.get_json()] == ids[2:]
+    assert primera.headers['ETag'] != segunda.headers['ETag']
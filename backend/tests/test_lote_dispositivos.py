@@ -0,0 +1,86 @@
+from conftest import crear_dispositivo, registrar
+
+
+def lote(cliente, auth, operaciones, atomico=False):
+    respuesta = cliente.post('/api/dispositivos/lote', headers=auth, json={'operaciones': operaciones, 'atomico': atomico})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return respuesta.get_json()
+
+
+def nombres(cliente, auth):
+    return sorted(d['nombre'] for d in cliente.get('/api/dispositivos', headers=auth).get_json())
+
+
+def test_crear_editar_eliminar(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    radio = crear_dispositivo(cliente, auth, 'Radio', 20, 3)
+    resultado = lote(cliente, auth, [
+        {'op': 'crear', 'nombre': 'Aire', 'categoria': 'Climatización', 'potencia_watts': 1200},
+        {'op': 'editar', 'id': foco, 'nombre': 'Foco LED', 'potencia_watts': 9},
+        {'op': 'eliminar', 'id': radio},
+    ])
+    assert (resultado['aplicadas'], resultado['fallidas']) == (3, 0)
+    assert isinstance(resultado['resultados'][0]['id'], int)
+    assert nombres(cliente, auth) == ['Aire', 'Foco LED']
+
+
+def test_id_repetido_se_rechaza(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    resultado = lote(cliente, auth, [
+        {'op': 'eliminar', 'id': foco},
+        {'op': 'editar', 'id': foco, 'nombre': 'Foco LED'},
+    ])
+    assert [r['ok'] for r in resultado['resultados']] == [True, False]
+    assert resultado['resultados'][1]['error'] == "El dispositivo ya aparece en otra operación del lote"
+    assert nombres(cliente, auth) == []
+
+
+def test_atomico_cancela_todo(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    resultado = lote(cliente, auth, [
+        {'op': 'editar', 'id': foco, 'nombre': 'Foco LED'},
+        {'op': 'editar', 'id': foco, 'potencia_watts': 9},
+    ], atomico=True)
+    assert resultado['aplicadas'] == 0
+    assert nombres(cliente, auth) == ['Foco']
+
+
+def test_dispositivos_ajenos(cliente, auth):
+    ajeno = crear_dispositivo(cliente, registrar(cliente, 'otro@powerflow.hn'), 'Aire', 1200, 8)
+    resultado = lote(cliente, auth, [{'op': 'eliminar', 'id': ajeno}, {'op': 'editar', 'id': 'x', 'nombre': 'y'}])
+    assert [r['error'] for r in resultado['resultados']] == ["Dispositivo no encontrado", "El campo 'id' es obligatorio"]
+
+
+def test_lote_vacio(cliente, auth):
+    respuesta = cliente.post('/api/dispositivos/lote', headers=auth, json={'operaciones': []})
+    assert respuesta.status_code == 400
+
+
+def test_valores_invalidos_fallan_solo_su_operacion(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    resultado = lote(cliente, auth, [
+        {'op': 'editar', 'id': foco, 'horas_uso_dia': None},
+        {'op': 'crear', 'nombre': 'Aire', 'categoria': 'Climatización', 'horas_uso_dia': 30},
+        {'op': 'crear', 'nombre': 'Radio', 'categoria': 'Otros', 'potencia_watts': 'mucha'},
+        {'op': 'crear', 'nombre': 'Tele', 'categoria': 'Electrónica', 'potencia_watts': 120},
+    ])
+    assert [r['ok'] for r in resultado['resultados']] == [False, False, False, True]
+    assert nombres(cliente, auth) == ['Foco', 'Tele']
+
+
+def test_id_booleano_no_es_el_dispositivo_1(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    assert foco == 1
+    resultado = lote(cliente, auth, [{'op': 'eliminar', 'id': True}])
+    assert resultado['resultados'][0]['ok'] is False
+    assert nombres(cliente, auth) == ['Foco']
+
+
+def test_endpoints_individuales_validan_igual(cliente, auth):
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    respuesta = cliente.put(f'/api/dispositivos/{foco}', headers=auth, json={'horas_uso_dia': None})
+    assert respuesta.status_code == 400
+    respuesta = cliente.post('/api/dispositivos', headers=auth, json={
+        'nombre': 'Aire', 'categoria': 'Otros', 'potencia_watts': -5,
+    })
+    assert respuesta.status_code == 400
@@ -0,0 +1,55 @@
+import re
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from conftest import crear_dispositivo
+from services.metricas import metricas
+
+
+def valor(exportado, serie):
+    coincidencia = re.search('^' + re.escape(serie) + r' (\S+)$', exportado, re.M)
+    return float(coincidencia.group(1)) if coincidencia else 0.0
+
+
+def test_metrics_expone_histogramas_por_endpoint(cliente, auth):
+    crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    antes = cliente.get('/metrics').get_data(as_text=True)
+    for _ in range(3):
+        assert cliente.get('/api/dispositivos', headers=auth).status_code == 200
+
+    respuesta = cliente.get('/metrics')
+    assert respuesta.mimetype == 'text/plain'
+    exportado = respuesta.get_data(as_text=True)
+
+    endpoint = 'endpoint="dispositivos.listar_dispositivos"'
+    for serie in (
+        f'powerflow_peticion_duracion_segundos_count{{{endpoint}}}',
+        f'powerflow_peticion_duracion_segundos_bucket{{{endpoint},le="+Inf"}}',
+        f'powerflow_peticion_sentencias_sql_count{{{endpoint}}}',
+        f'powerflow_peticiones_total{{{endpoint},metodo="GET",status="200"}}',
+    ):
+        assert valor(exportado, serie) - valor(antes, serie) == 3
+    # Cada petición autenticada lee al menos la versión de la lista
+    sentencias = 'powerflow_peticion_sentencias_sql_sum{' + endpoint + '}'
+    assert valor(exportado, sentencias) > valor(antes, sentencias)
+    assert '# TYPE powerflow_cache_identidad gauge' in exportado
+
+
+def test_sentencia_fallida_no_altera_las_siguientes(app):
+    from extensions import db
+    with app.test_request_context():
+        with db.engine.connect() as conexion:
+            g.metricas = {"sql": 0, "sql_tiempo": 0.0, "externa": 0.0, "sentencias": None}
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conexion.execute(text('SELECT * FROM tabla_que_no_existe'))
+                conexion.rollback()
+            assert conexion.execute(text('SELECT 1')).scalar() == 1
+
+            # Solo cuenta la sentencia que terminó, y la conexión no arrastra inicios pendientes
+            assert g.metricas["sql"] == 1
+            assert g.metricas["sql_tiempo"] < 1
+            assert not conexion.info.get('inicio_sql')
@@ -0,0 +1,27 @@
+from datetime import date
+
+from conftest import crear_dispositivo, ingerir
+from services.cache_pronostico import cache_pronostico
+
+
+def test_lecturas_nuevas_se_suman_a_la_serie(app, cliente, auth):
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 100, 5)
+    hoy = date.today().isoformat()
+    ingerir(cliente, auth, [{'dispositivo_id': dispositivo, 'fecha': hoy, 'horas_uso': 1, 'consumo_kwh': 2}])
+
+    primero = cliente.get('/api/consumos/pronostico', headers=auth).get_json()
+    assert primero['consumo_mes_kwh'] == 2
+
+    ingerir(cliente, auth, [{'dispositivo_id': dispositivo, 'fecha': hoy, 'horas_uso': 1, 'consumo_kwh': 3}])
+    segundo = cliente.get('/api/consumos/pronostico', headers=auth).get_json()
+    assert segundo['consumo_mes_kwh'] == 5
+
+    # La segunda consulta no volvió a leer la base
+    estadisticas = cache_pronostico.estadisticas()
+    assert (estadisticas['fallos'], estadisticas['incrementales']) == (1, 1)
+    assert cache_pronostico._en_curso == {}
+
+
+def test_tarifa_invalida(cliente, auth):
+    respuesta = cliente.get('/api/consumos/pronostico?tarifa=solar', headers=auth)
+    assert respuesta.status_code == 400
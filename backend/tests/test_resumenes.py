@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from conftest import crear_dispositivo, ingerir
+from extensions import db
+from models.consumo import Consumo
+from models.resumen import ConsumoDiario, ConsumoMensual
+from services.resumenes import aplicar_deltas, nuevos_deltas, reconstruir_resumenes
+
+
+def instantanea():
+    """Filas de ambas tablas de resumen, comparables entre sí"""
+    filas = {}
+    for modelo in (ConsumoDiario, ConsumoMensual):
+        tabla = modelo.__table__
+        filas[modelo.__tablename__] = {
+            tuple(fila[:3]): (pytest.approx(fila[3]), pytest.approx(fila[4]), pytest.approx(fila[5]), fila[6])
+            for fila in db.session.execute(select(*tabla.c)).all()
+        }
+    return filas
+
+
+def assert_igual_a_reconstruir():
+    incremental = instantanea()
+    reconstruir_resumenes()
+    assert incremental == instantanea()
+
+
+@pytest.fixture
+def lecturas(cliente, auth):
+    aire = crear_dispositivo(cliente, auth, 'Aire', 1000, 8)
+    foco = crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    ingerir(cliente, auth, [
+        {'dispositivo_id': aire, 'fecha': '2026-01-30', 'horas_uso': 4},
+        {'dispositivo_id': aire, 'fecha': '2026-01-30', 'horas_uso': 2},
+        {'dispositivo_id': aire, 'fecha': '2026-02-01', 'horas_uso': 3},
+        {'dispositivo_id': foco, 'fecha': '2026-02-01', 'horas_uso': 5},
+    ])
+    return aire, foco
+
+
+def test_ingesta_actualiza_resumenes(app, lecturas):
+    aire, foco = lecturas
+    with app.app_context():
+        diario = db.session.get(ConsumoDiario, (1, aire, date(2026, 1, 30)))
+        assert (diario.horas_uso, diario.consumo_kwh, diario.lecturas) == (6, 6, 2)
+        febrero = db.session.get(ConsumoMensual, (1, foco, '2026-02'))
+        assert febrero.consumo_kwh == pytest.approx(0.3)
+        assert_igual_a_reconstruir()
+
+
+def test_editar_y_borrar_consumos(app, lecturas):
+    aire, _ = lecturas
+    with app.app_context():
+        consumos = db.session.scalars(select(Consumo).order_by(Consumo.id)).all()
+        # Cambia de día (y de mes) y de horas en la misma lectura
+        consumos[0].fecha = date(2026, 2, 1)
+        consumos[0].horas_uso = 1
+        consumos[0].consumo_kwh = 1
+        db.session.commit()
+        assert_igual_a_reconstruir()
+
+        # El commit expiró los atributos: se asignan sin que el ORM conozca el valor anterior
+        consumos[2].fecha = date(2026, 2, 2)
+        consumos[2].consumo_kwh = 10
+        db.session.commit()
+        assert_igual_a_reconstruir()
+
+        db.session.delete(db.session.get(Consumo, consumos[1].id))
+        db.session.commit()
+        # El 30 de enero se quedó sin lecturas: la fila desaparece
+        assert db.session.get(ConsumoDiario, (1, aire, date(2026, 1, 30))) is None
+        assert db.session.get(ConsumoMensual, (1, aire, '2026-01')) is None
+        assert_igual_a_reconstruir()
+
+
+def test_limpieza_solo_toca_claves_del_delta(app, lecturas):
+    aire, foco = lecturas
+    with app.app_context():
+        # Una fila en cero que no es parte del delta no se borra
+        db.session.add(ConsumoDiario(usuario_id=1, dispositivo_id=foco, fecha=date(2026, 3, 1), lecturas=0))
+        db.session.commit()
+
+        deltas = nuevos_deltas()
+        deltas[(1, aire, date(2026, 2, 1))] = [-3.0, -3.0, -3 * 3.7, -1]
+        with db.engine.begin() as conexion:
+            aplicar_deltas(conexion, deltas)
+
+        assert db.session.get(ConsumoDiario, (1, aire, date(2026, 2, 1))) is None
+        assert db.session.get(ConsumoMensual, (1, aire, '2026-02')) is None
+        assert db.session.get(ConsumoDiario, (1, foco, date(2026, 3, 1))) is not None
+
+
+def test_borrar_dispositivo_borra_sus_resumenes(app, cliente, auth, lecturas):
+    aire, foco = lecturas
+    assert cliente.delete(f'/api/dispositivos/{aire}', headers=auth).status_code == 200
+    with app.app_context():
+        restantes = db.session.execute(select(ConsumoDiario.dispositivo_id).distinct()).scalars().all()
+        assert restantes == [foco]
+        assert_igual_a_reconstruir()
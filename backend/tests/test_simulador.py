@@ -0,0 +1,117 @@
+import pytest
+
+from conftest import crear_dispositivo
+from services.simulador import EscenarioInvalido, simular_escenarios
+from services.tarifas import TarifaHoraria
+
+# (id, nombre, categoria, potencia_watts, horas_uso_dia)
+FILAS = [
+    (1, 'Aire', 'Climatización', 1200, 8),
+    (2, 'Foco sala', 'Iluminación', 60, 6),
+    (3, 'Foco cocina', 'iluminación ', 60, 4),
+    (4, 'Radio', None, None, 3),
+]
+
+
+def test_escenarios_ordenados_por_ahorro():
+    resultado = simular_escenarios(FILAS, [
+        {'nombre': 'LED', 'cambios': [{'categoria': 'Iluminación', 'potencia_watts': 9}]},
+        {'nombre': 'Aire 2 h menos', 'cambios': [{'dispositivo_id': 1, 'horas_delta': -2}]},
+        {'nombre': 'Más aire', 'cambios': [{'dispositivo_id': 1, 'horas_delta': 2}]},
+    ])
+    # Base: 1200 W * 8 h + 60 W * 10 h, 30 días a L 3.70
+    assert resultado["base"]["consumo_kwh"] == pytest.approx(306)
+    nombres = [e["nombre"] for e in resultado["escenarios"]]
+    assert nombres == ['Aire 2 h menos', 'LED', 'Más aire']
+
+    aire, led, mas = resultado["escenarios"]
+    assert aire["delta_kwh"] == pytest.approx(-72)
+    assert aire["ahorro_lps"] == pytest.approx(72 * 3.7)
+    assert led["dispositivos_afectados"] == 2  # la categoría no distingue mayúsculas ni espacios
+    assert mas["ahorro_lps"] < 0
+
+
+def test_horas_se_recortan_a_un_dia():
+    resultado = simular_escenarios(FILAS, [{'cambios': [{'dispositivo_id': 1, 'horas_delta': 30}]}])
+    assert resultado["escenarios"][0]["delta_kwh"] == pytest.approx(1.2 * 16 * 30)
+
+
+def test_detalle_por_dispositivo():
+    resultado = simular_escenarios(FILAS, [{'cambios': [{'dispositivo_id': 2, 'potencia_factor': 0.5}]}], detalle=True)
+    assert resultado["escenarios"][0]["detalle"] == [
+        {"id": 2, "nombre": "Foco sala", "delta_kwh": pytest.approx(-5.4), "delta_lps": pytest.approx(-19.98)},
+    ]
+
+
+def test_tarifa_horaria_usa_el_perfil_de_cada_dispositivo():
+    # Foco sala: 6 h alrededor de las 20:30 -> 0.5 h base, 4 h de punta y 1.5 h base
+    resultado = simular_escenarios(FILAS[1:2], [{'cambios': [{'dispositivo_id': 2, 'horas_uso_dia': 24}]}],
+                                   tarifa=TarifaHoraria())
+    assert resultado["base"]["costo_lps"] == pytest.approx(0.06 * 30 * (2 * 3.2 + 4 * 5.2), abs=0.01)
+    # Todo el día: precio medio de las 24 horas
+    escenario = resultado["escenarios"][0]
+    assert escenario["costo_lps"] == pytest.approx(0.06 * 30 * (20 * 3.2 + 4 * 5.2), abs=0.01)
+
+
+@pytest.mark.parametrize("escenarios", [
+    [],
+    {"cambios": []},
+    [{"cambios": []}],
+    [{"cambios": [{"dispositivo_id": 99, "horas_delta": 1}]}],
+    [{"cambios": [{"dispositivo_id": [1], "horas_delta": 1}]}],
+    [{"cambios": [{"dispositivo_id": {"id": 1}, "horas_delta": 1}]}],
+    [{"cambios": [{"dispositivo_id": True, "horas_delta": 1}]}],
+    [{"cambios": [{"categoria": "Cocina", "horas_delta": 1}]}],
+    [{"cambios": [{"dispositivo_id": 1}]}],
+    [{"cambios": [{"dispositivo_id": 1, "horas_delta": "1"}]}],
+    [{"cambios": [{"dispositivo_id": 1, "horas_delta": float("nan")}]}],
+    [{"cambios": [{"dispositivo_id": 1, "horas_uso_dia": 2, "horas_delta": 1}]}],
+    [{"cambios": [{"dispositivo_id": 1, "potencia_factor": -1}]}],
+])
+def test_escenarios_invalidos(escenarios):
+    with pytest.raises(EscenarioInvalido):
+        simular_escenarios(FILAS, escenarios)
+
+
+def test_endpoint_rechaza_dispositivo_id_no_entero(cliente, auth):
+    crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    respuesta = cliente.post('/api/dispositivos/simular', headers=auth, json={
+        'escenarios': [{'cambios': [{'dispositivo_id': [1, 2], 'horas_delta': -1}]}],
+    })
+    assert respuesta.status_code == 400
+    assert "'dispositivo_id' debe ser un entero" in respuesta.get_json()["error"]
+
+
+def test_endpoint_no_ve_dispositivos_ajenos(cliente, auth):
+    from conftest import registrar
+
+    ajeno = crear_dispositivo(cliente, registrar(cliente, 'otro@powerflow.hn'), 'Aire', 1200, 8)
+    crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    respuesta = cliente.post('/api/dispositivos/simular', headers=auth, json={
+        'escenarios': [{'cambios': [{'dispositivo_id': ajeno, 'horas_delta': -1}]}],
+    })
+    assert respuesta.status_code == 400
+
+
+def test_endpoint_dias(cliente, auth):
+    crear_dispositivo(cliente, auth, 'Foco', 100, 10)
+    escenarios = [{'cambios': [{'categoria': 'Otros', 'horas_delta': -5}]}]
+    respuesta = cliente.post('/api/dispositivos/simular', headers=auth, json={'dias': 10, 'escenarios': escenarios})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["base"]["consumo_kwh"] == pytest.approx(10)
+
+    respuesta = cliente.post('/api/dispositivos/simular', headers=auth, json={'dias': "diez", 'escenarios': escenarios})
+    assert respuesta.status_code == 400
+
+
+@pytest.mark.parametrize("tarifa", [
+    {"tipo": "bloques", "bloques": [[50]]},
+    {"tipo": "horaria", "precios_hora": [None] * 24},
+])
+def test_simular_con_tarifa_mal_formada_responde_400(cliente, auth, tarifa):
+    crear_dispositivo(cliente, auth, 'Foco', 60, 5)
+    respuesta = cliente.post('/api/dispositivos/simular', headers=auth, json={
+        'tarifa': tarifa, 'escenarios': [{'cambios': [{'categoria': 'Otros', 'horas_delta': -1}]}],
+    })
+    assert respuesta.status_code == 400
+    assert "error" in respuesta.get_json()
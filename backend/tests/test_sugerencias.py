@@ -0,0 +1,136 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import registrar, crear_dispositivo
+from extensions import db
+from models.sugerencia import SugerencIA
+from services import groq_cliente, sugerencias
+from services.reglas_ahorro import evaluar_reglas
+from services.sugerencias import generar_sugerencias
+
+
+@pytest.fixture
+def usuarios(app, cliente):
+    """Tres cuentas con un foco incandescente cada una (una sugerencia por usuario)"""
+    for correo in ('ana@powerflow.hn', 'beto@powerflow.hn', 'carla@powerflow.hn'):
+        crear_dispositivo(cliente, registrar(cliente, correo), 'Foco', 60, 5, categoria='Iluminación')
+    return app
+
+
+def sugerencias_por_usuario(app):
+    with app.app_context():
+        return dict(db.session.execute(
+            select(SugerencIA.usuario_id, func.count()).group_by(SugerencIA.usuario_id)
+        ).all())
+
+
+def test_corrida_interrumpida_continua_sin_duplicados(usuarios, tmp_path, monkeypatch):
+    checkpoint = tmp_path / 'checkpoint.json'
+    argumentos = ['sugerencias', 'generar', '--checkpoint', str(checkpoint), '--bloque', '1',
+                  '--procesos', '0', '--concurrencia-llm', '1']
+    llamadas = []
+
+    def redactor_que_se_corta(oportunidad):
+        llamadas.append(oportunidad["usuario_id"])
+        if len(llamadas) == 2:
+            raise RuntimeError("corte de prueba")
+        return f"Consejo para {oportunidad['nombre']}"
+
+    monkeypatch.setattr(groq_cliente, 'redactar_consejo_con_groq', redactor_que_se_corta)
+    resultado = usuarios.test_cli_runner().invoke(args=argumentos)
+    assert resultado.exit_code != 0
+
+    # Solo el primer bloque quedó confirmado, y el checkpoint apunta a él
+    estado = json.loads(checkpoint.read_text())
+    assert estado["completado"] is False
+    assert estado["ultimo_usuario_id"] == llamadas[0]
+    assert sugerencias_por_usuario(usuarios) == {llamadas[0]: 1}
+
+    monkeypatch.setattr(groq_cliente, 'redactar_consejo_con_groq', lambda o: f"Consejo para {o['nombre']}")
+    resultado = usuarios.test_cli_runner().invoke(args=argumentos)
+    assert resultado.exit_code == 0, resultado.output
+    assert 'Continuando corrida' in resultado.output
+
+    assert sugerencias_por_usuario(usuarios) == {1: 1, 2: 1, 3: 1}
+    estado = json.loads(checkpoint.read_text())
+    assert estado["completado"] is True
+    assert estado["usuarios"] == 3 and estado["sugerencias"] == 3
+
+
+def test_bloque_repetido_tras_un_corte_se_reemplaza(usuarios, tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    with usuarios.app_context():
+        estado = generar_sugerencias(checkpoint=checkpoint, tamano_bloque=2, procesos=0,
+                                     redactor=lambda o: None, informar=lambda m: None)
+    assert estado["completado"] is True
+
+    # Corte entre el commit de un bloque y su checkpoint: la corrida repite bloques ya guardados
+    estado.update(completado=False, ultimo_usuario_id=0)
+    with open(checkpoint, 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo)
+    with usuarios.app_context():
+        generar_sugerencias(checkpoint=checkpoint, tamano_bloque=2, procesos=0,
+                            redactor=lambda o: None, informar=lambda m: None)
+
+    assert sugerencias_por_usuario(usuarios) == {1: 1, 2: 1, 3: 1}
+
+
+def test_limite_de_tiempo_pausa_la_corrida(usuarios, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    reloj = [0.0]
+    monkeypatch.setattr(sugerencias, 'time', SimpleNamespace(monotonic=lambda: reloj[0]))
+
+    def redactor_lento(oportunidad):
+        reloj[0] += 120
+        return None
+
+    mensajes = []
+    with usuarios.app_context():
+        estado = generar_sugerencias(checkpoint=checkpoint, tamano_bloque=1, procesos=0, limite_segundos=60,
+                                     redactor=redactor_lento, informar=mensajes.append)
+    assert estado["completado"] is False
+    assert estado["usuarios"] == 1
+    assert any('Límite de tiempo' in m for m in mensajes)
+    assert sugerencias_por_usuario(usuarios) == {1: 1}
+
+    with usuarios.app_context():
+        estado = generar_sugerencias(checkpoint=checkpoint, tamano_bloque=1, procesos=0,
+                                     redactor=lambda o: None, informar=lambda m: None)
+    assert estado["completado"] is True
+    assert sugerencias_por_usuario(usuarios) == {1: 1, 2: 1, 3: 1}
+
+
+def test_solo_los_casos_de_mayor_ahorro_pasan_por_el_llm(app, cliente, auth):
+    crear_dispositivo(cliente, auth, 'Foco', 60, 5, categoria='Iluminación')
+    crear_dispositivo(cliente, auth, 'Aire', 1500, 8, categoria='Climatización')
+    crear_dispositivo(cliente, auth, 'Lámpara', 40, 3, categoria='Iluminación')
+    redactadas = []
+
+    def redactor(oportunidad):
+        redactadas.append(oportunidad["nombre"])
+        return "Consejo del LLM"
+
+    with app.app_context():
+        estado = generar_sugerencias(procesos=0, top_llm=1, redactor=redactor, informar=lambda m: None)
+        mensajes = db.session.execute(select(SugerencIA.mensaje)).scalars().all()
+
+    assert redactadas == ['Aire']
+    assert estado["llamadas_llm"] == 1
+    assert len(mensajes) == 3
+    assert mensajes.count("Consejo del LLM") == 1
+
+
+def test_reglas_normalizan_la_categoria():
+    filas = [
+        (1, 1, 'Foco', ' iluminación ', 60, 5),
+        (1, 2, 'Aire', 'CLIMATIZACIÓN', 1500, 8),
+        (1, 3, 'Refri', 'electrodomésticos', 150, 24),
+    ]
+    tipos = {(o["dispositivo_id"], o["tipo"]) for o in evaluar_reglas(filas)}
+
+    assert (1, 'cambio_led') in tipos
+    assert (2, 'termostato') in tipos
+    assert (3, 'uso_continuo') not in tipos
@@ -0,0 +1,48 @@
+import pytest
+
+from routes import dispositivo_routes
+from services import cache_estimaciones
+
+
+@pytest.fixture
+def llm_lote(app, monkeypatch):
+    """Sustituye la llamada por lote y registra los nombres de cada prompt"""
+    llamadas = []
+
+    def estimar(nombres):
+        llamadas.append(list(nombres))
+        return [{"potencia_watts": 40, "categoria": "Otros"} if 'wplk' in n else None for n in nombres]
+
+    monkeypatch.setattr(dispositivo_routes, 'estimar_lote_con_groq', estimar)
+    monkeypatch.setattr(cache_estimaciones, '_cache', None)
+    return llamadas
+
+
+def test_metodo_por_nombre(cliente, auth, llm_lote):
+    cache_estimaciones.obtener_cache_estimaciones().guardar('Deshumidificador', {"potencia_watts": 300, "categoria": "Otros"})
+    nombres = ['Refrigerador', 'ab', 'Deshumidificador', 'xqzv wplk', 'zzyx qqq', 'XQZV  wplk']
+
+    respuesta = cliente.post('/api/dispositivos/sugerir/lote', headers=auth, json={'nombres': nombres})
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert [r["metodo"] for r in datos["resultados"]] == [
+        'bd_estatica', None, 'groq_ia', 'groq_ia', 'defecto', 'groq_ia',
+    ]
+    assert datos["resultados"][1]["error"] == "Nombre muy corto"
+    assert datos["resultados"][4]["sugerencia"] == dispositivo_routes.SUGERENCIA_DEFECTO
+    # Solo lo que no resolvieron catálogo ni cache, sin repetidos, en un solo prompt
+    assert llm_lote == [['xqzv wplk', 'zzyx qqq']]
+    assert datos["llamadas_ia"] == 1
+
+
+def test_todo_resuelto_sin_llamar_al_llm(cliente, auth, llm_lote):
+    respuesta = cliente.post('/api/dispositivos/sugerir/lote', headers=auth, json={'nombres': ['Foco', 'Laptop']})
+    assert respuesta.get_json()["llamadas_ia"] == 0
+    assert llm_lote == []
+
+
+def test_limite_de_un_prompt(cliente, auth, llm_lote):
+    nombres = [f'aparato {i}' for i in range(dispositivo_routes.MAX_NOMBRES_LOTE + 1)]
+    respuesta = cliente.post('/api/dispositivos/sugerir/lote', headers=auth, json={'nombres': nombres})
+    assert respuesta.status_code == 400
+    assert llm_lote == []
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from conftest import crear_dispositivo
+from services.tarifas import (
+    TarifaBloques, TarifaHoraria, TarifaPlana, cotizar_consumos, cotizar_dispositivos, perfiles_de_uso,
+    tarifa_desde_config,
+)
+
+
+def test_bloques_escalonados():
+    tarifa = TarifaBloques(((50, 2.0), (150, 3.0), (None, 4.0)))
+    # 40 kWh: todo en el primer bloque; 200 kWh: 50*2 + 100*3 + 50*4
+    assert tarifa.costo_total([0, 40, 50, 200]).tolist() == pytest.approx([0, 80, 100, 600])
+
+
+def test_bloques_se_aplican_por_hogar():
+    tarifa = TarifaBloques(((50, 2.0), (None, 4.0)))
+    # Dos hogares con 30 + 30 kWh: uno supera el primer bloque y el otro no
+    cotizacion = cotizar_consumos([1, 1, 2], np.array([30.0, 30.0, 30.0]), tarifa)
+    assert cotizacion["costo_usuario"].tolist() == pytest.approx([50 * 2 + 10 * 4, 30 * 2])
+    # El costo del hogar se reparte en proporción al consumo
+    assert cotizacion["costo_lps"].tolist() == pytest.approx([70, 70, 60])
+
+
+def test_ultimo_bloque_cobra_el_exceso():
+    # Un límite en el último bloque no deja gratis lo que lo supera
+    tarifa = TarifaBloques(((50, 2.0), (150, 3.0)))
+    assert tarifa.costo_total([100, 300]).tolist() == pytest.approx([250, 100 + 250 * 3])
+
+
+def test_limites_no_crecientes():
+    with pytest.raises(ValueError):
+        TarifaBloques(((100, 2.0), (50, 3.0)))
+
+
+def test_tarifa_por_nombre_y_por_objeto():
+    assert isinstance(tarifa_desde_config(None), TarifaPlana)
+    assert tarifa_desde_config("bloques").tipo == "bloques"
+    assert tarifa_desde_config({"tipo": "plana", "precio_kwh": 5}).precio_kwh == 5.0
+    assert tarifa_desde_config({"tipo": "horaria", "precios_hora": [1] * 24}).tipo == "horaria"
+
+
+def test_perfiles_por_categoria_y_horas():
+    perfiles = perfiles_de_uso(['Iluminación', 'Otros', 'climatización', None], [4, 3, 24, None])
+    assert perfiles.sum(axis=1).tolist() == pytest.approx([4, 24, 24, 24])
+    # Iluminación: 4 horas alrededor de las 20:30
+    assert np.flatnonzero(perfiles[0]).tolist() == [18, 19, 20, 21, 22]
+    assert perfiles[0, 18] == pytest.approx(0.5)
+
+
+def test_horaria_cobra_la_punta_segun_el_perfil():
+    tarifa = TarifaHoraria()
+    cotizacion = cotizar_dispositivos([1, 1], [100, 100], [4, 4], tarifa=tarifa, categorias=['Iluminación', 'Otros'])
+    kwh = 100 * 4 * 30 / 1000
+    # La iluminación cae casi toda en la punta; "Otros" se reparte en el día
+    assert cotizacion["costo_lps"][0] > cotizacion["costo_lps"][1]
+    assert cotizacion["costo_lps"][1] == pytest.approx(kwh * tarifa.precios_hora.mean())
+
+
+@pytest.mark.parametrize("config", [
+    ["plana"],
+    {"tipo": "plana", "precio_kwh": "caro"},
+    {"tipo": "plana", "precio_kwh": True},
+    {"tipo": "plana", "precio_kwh": -1},
+    {"tipo": "bloques", "bloques": 50},
+    {"tipo": "bloques", "bloques": [[50]]},
+    {"tipo": "bloques", "bloques": [[50, "x"], [None, 4]]},
+    {"tipo": "bloques", "bloques": [{"limite": 50}]},
+    {"tipo": "horaria", "precios_hora": 3},
+    {"tipo": "horaria", "precios_hora": [1] * 23},
+    {"tipo": "horaria", "precios_hora": [None] * 24},
+    {"tipo": "solar"},
+])
+def test_config_mal_formada_es_value_error(config):
+    with pytest.raises(ValueError):
+        tarifa_desde_config(config)
+
+
+def test_costos_con_bloques(cliente, auth):
+    crear_dispositivo(cliente, auth, 'Aire', 1000, 5)  # 150 kWh al mes
+    respuesta = cliente.get('/api/dispositivos/costos?tarifa=bloques', headers=auth)
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos["total_kwh"] == pytest.approx(150)
+    assert datos["total_lps"] == pytest.approx(50 * 2.60 + 100 * 3.70)
+
+
+def test_simular_con_bloques_cobra_sobre_el_ultimo_limite(cliente, auth):
+    crear_dispositivo(cliente, auth, 'Aire', 1250, 8, categoria='Climatización')  # 300 kWh al mes
+    respuesta = cliente.post('/api/dispositivos/simular', headers=auth, json={
+        'tarifa': {'tipo': 'bloques', 'bloques': [[100, 3.0]]},
+        'escenarios': [{'cambios': [{'categoria': 'Climatización', 'horas_delta': -4}]}],
+    })
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos["base"]["consumo_kwh"] == pytest.approx(300)
+    assert datos["base"]["costo_lps"] == pytest.approx(900)
+    assert datos["escenarios"][0]["ahorro_lps"] == pytest.approx(450)
+
+
+@pytest.mark.parametrize("dias", ["0", "-3", "abc", "1.5"])
+def test_costos_dias_invalidos(cliente, auth, dias):
+    respuesta = cliente.get(f'/api/dispositivos/costos?dias={dias}', headers=auth)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json() == {"error": "El campo 'dias' debe ser un entero positivo"}
+
+
+def test_costos_horarios_usan_la_categoria(cliente, auth):
+    crear_dispositivo(cliente, auth, 'Foco', 100, 4, categoria='Iluminación')
+    crear_dispositivo(cliente, auth, 'Bomba', 100, 4, categoria='Otros')
+    costos = cliente.get('/api/dispositivos/costos?tarifa=horaria', headers=auth).get_json()
+    foco, bomba = costos["dispositivos"]
+    assert foco["consumo_kwh"] == bomba["consumo_kwh"]
+    assert foco["costo_lps"] > bomba["costo_lps"]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from conftest import crear_dispositivo
+from telemetria.protocolo import LecturaInvalida, formatear_lectura, interpretar_linea, token_dispositivo
+from telemetria.servidor import MAX_LINEA_BYTES, ServicioTelemetria
+
+SECRETO = 'secreto-de-pruebas'
+
+
+def test_servicio_exige_secreto(app):
+    with pytest.raises(ValueError):
+        ServicioTelemetria(app, secreto=None)
+
+
+def test_linea_valida_y_token_falso():
+    token = token_dispositivo(7, SECRETO)
+    dispositivos = {7: (1, 100, token.encode('ascii'))}
+    linea = formatear_lectura(7, token, 2).encode('ascii')
+    assert interpretar_linea(linea, dispositivos, 3.7)
+
+    falsa = formatear_lectura(7, token_dispositivo(7, 'otro-secreto'), 2).encode('ascii')
+    with pytest.raises(LecturaInvalida):
+        interpretar_linea(falsa, dispositivos, 3.7)
+
+
+@pytest.mark.parametrize("consumo", [b'nan', b'inf', b'-1'])
+def test_consumo_no_finito_o_negativo(consumo):
+    token = token_dispositivo(7, SECRETO)
+    with pytest.raises(LecturaInvalida):
+        interpretar_linea(b'7 ' + token.encode('ascii') + b' 2 ' + consumo, {7: (1, 100, token.encode('ascii'))}, 3.7)
+
+
+def test_volcado_invalida_el_pronostico_de_la_api(app, cliente, auth):
+    from datetime import date
+
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 100, 5)
+    assert cliente.get('/api/consumos/pronostico', headers=auth).get_json()['consumo_mes_kwh'] == 0
+
+    # El servicio escribe como otro proceso: sin pasar por los oyentes de la API
+    servicio = ServicioTelemetria(app, secreto=SECRETO)
+    assert servicio._guardar([(dispositivo, 1, date.today(), 2.0, 1.5, 1.5 * 3.7)]) == 1
+
+    pronostico = cliente.get('/api/consumos/pronostico', headers=auth).get_json()
+    assert pronostico['consumo_mes_kwh'] == 1.5
+    with app.app_context():
+        from extensions import db
+        from models.resumen import ConsumoDiario
+        diario = db.session.query(ConsumoDiario.consumo_kwh, ConsumoDiario.lecturas).one()
+    assert tuple(diario) == (1.5, 1)
+
+
+def test_volcado_publica_las_lecturas_al_servicio_de_eventos(app, cliente, auth, monkeypatch):
+    from datetime import date
+    from services.eventos import relay_eventos
+
+    dispositivo = crear_dispositivo(cliente, auth, 'Foco', 100, 5)
+    publicados = []
+    monkeypatch.setattr(relay_eventos, 'publicar', lambda *evento: publicados.append(evento))
+
+    servicio = ServicioTelemetria(app, secreto=SECRETO)
+    servicio._guardar([(dispositivo, 1, date.today(), 2.0, 1.5, 1.5 * 3.7)] * 2)
+    assert publicados == [(1, 'consumos', [{
+        "dispositivo_id": dispositivo, "fecha": date.today().isoformat(),
+        "consumo_kwh": 3.0, "costo_lps": 11.1, "lecturas": 2,
+    }])]
+
+
+def recibir_por_tcp(servicio, datos, espera=2):
+    """Manda `datos` al servicio y devuelve si la conexión la cerró el servidor"""
+    async def correr():
+        servidor = await asyncio.start_server(servicio.atender_tcp, '127.0.0.1', 0)
+        puerto = servidor.sockets[0].getsockname()[1]
+        lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+        escritor.write(datos)
+        await escritor.drain()
+        try:
+            return await asyncio.wait_for(lector.read(), espera) == b''
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            escritor.close()
+            servidor.close()
+
+    return asyncio.run(correr())
+
+
+def test_linea_sin_fin_cierra_la_conexion(app):
+    servicio = ServicioTelemetria(app, secreto=SECRETO)
+    assert recibir_por_tcp(servicio, b'1' * (MAX_LINEA_BYTES + 1))
+    assert servicio.contadores['conexiones_cortadas'] == 1
+
+
+def test_lineas_cortas_no_cierran_la_conexion(app):
+    servicio = ServicioTelemetria(app, secreto=SECRETO)
+    # Líneas inválidas se cuentan como rechazadas, pero la conexión sigue abierta
+    assert not recibir_por_tcp(servicio, b'basura\n' * 2000, espera=0.3)
+    assert servicio.contadores['conexiones_cortadas'] == 0
@@ -0,0 +1,31 @@
+import threading
+
+from conftest import registrar
+
+
+def test_trabajo_pendiente_responde_202(app, cliente, monkeypatch):
+    auth = registrar(cliente)
+    liberar = threading.Event()
+
+    def lento(nombre):
+        liberar.wait(5)
+        return {"potencia_watts": 5, "categoria": "Otros"}
+
+    from services import cache_estimaciones
+    monkeypatch.setitem(cache_estimaciones._config, 'ESTIMADOR_LLM', lento)
+    monkeypatch.setattr(cache_estimaciones, '_cache', None)
+
+    respuesta = cliente.post('/api/dispositivos/sugerir', headers=auth, json={'nombre': 'xqzv wplk', 'asincrono': True})
+    assert respuesta.status_code == 202
+    assert respuesta.headers['Retry-After'] == '1'
+    ruta = respuesta.headers['Location']
+
+    respuesta = cliente.get(ruta + '?esperar=0.05', headers=auth)
+    assert respuesta.status_code == 202
+    assert respuesta.headers['Retry-After'] == '1'
+
+    liberar.set()
+    respuesta = cliente.get(ruta + '?esperar=120', headers=auth)
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["estado"] == "completado"
+    assert 'Retry-After' not in respuesta.headers
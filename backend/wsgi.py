@@ -0,0 +1,28 @@
+"""
+Punto de entrada de producción:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Con `preload_app` este módulo se importa una sola vez en el master de
+gunicorn: la verificación del esquema corre ahí y los workers nacen por fork
+con todo ya importado. La configuración sale de variables de entorno
+(DATABASE_URL, SECRET_KEY, JWT_SECRET, ...).
+"""
+import os
+import time
+
+inicio = time.perf_counter()
+
+from app import create_app, preparar_esquema
+
+app = create_app({
+    # El esquema se verifica aquí abajo, una vez, y no en cada create_app
+    'ESQUEMA_AL_INICIAR': False,
+    # Alembic solo se necesita para `flask db`
+    'REGISTRAR_MIGRACIONES': False,
+})
+
+if os.getenv('ESQUEMA_AL_INICIAR', '1') == '1':
+    preparar_esquema(app)
+
+print(f"⚡ wsgi cargado en {(time.perf_counter() - inicio) * 1000:.1f} ms (pid {os.getpid()})")